@@ -0,0 +1,77 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""
+Cold import cost of the app's entry points.
+
+Run from the graph_tutorial directory:
+
+    python -m benchmarks.imports
+    python -m benchmarks.imports --check
+
+Every entry point is imported in a fresh interpreter after django.setup(),
+a few times, and the fastest run is reported together with the heavy
+libraries it pulled in. With --check the run fails when an entry point
+loads a library it is not allowed to (the web views must not load the
+scientific stack).
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+
+HEAVY = ('pandas', 'numpy', 'openpyxl', 'bs4')
+
+# entry point -> heavy libraries it may load
+ENTRY_POINTS = {
+    'tutorial.urls': (),
+    'tutorial.tasks': (),
+    'tutorial.graph_helper': (),
+    'tutorial.workbook_runner': (),
+    'tutorial.graph.sharepoint': (),
+    'tutorial.scheduling': (),
+    'tutorial.sheet_rules': ('pandas', 'numpy'),
+}
+
+_PROBE = """
+import os, sys, time, json
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'graph_tutorial.settings')
+import django
+django.setup()
+started = time.perf_counter()
+__import__(sys.argv[1])
+elapsed = time.perf_counter() - started
+print(json.dumps({'seconds': elapsed, 'heavy': [m for m in %r if m in sys.modules]}))
+""" % (HEAVY,)
+
+def measure(module, repeat):
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', _PROBE, module],
+                                capture_output=True, text=True, check=True).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    return min(run['seconds'] for run in runs), runs[-1]['heavy']
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--check', action='store_true', help='Fail when an entry point loads a disallowed library')
+    args = parser.parse_args(argv)
+
+    failures = []
+    print(f"{'entry point':28} {'seconds':>9}  heavy libraries")
+    for module, allowed in ENTRY_POINTS.items():
+        seconds, heavy = measure(module, args.repeat)
+        print(f"{module:28} {seconds:9.3f}  {', '.join(heavy) or '-'}")
+        unexpected = set(heavy) - set(allowed)
+        if unexpected:
+            failures.append(f"{module} loads {', '.join(sorted(unexpected))}")
+
+    if args.check and failures:
+        print('\n'.join(failures), file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,218 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""
+Offline benchmarks against the Graph simulator.
+
+Run from the graph_tutorial directory:
+
+    python -m benchmarks.run
+    python -m benchmarks.run --chats 1000 --messages 50000 --rows 20000 --latency-ms 20 --throttle-rate 0.01
+    python -m benchmarks.run --only get_chat_ids polling_task_pool webhook_ingest
+    python -m benchmarks.run --check-budgets
+
+Each benchmark reports wall time, the number of Graph requests and the
+number of simulated round trips (retries included). Jobs queued by a
+benchmark are worked off before its clock stops. Data lives in a test
+database created for the run and removed afterwards. With --check-budgets the
+benchmarks listed in BUDGETS fail when they make more Graph calls than
+their budget (see tutorial.call_budget).
+"""
+
+import argparse
+import math
+import os
+import sys
+import time
+from unittest import mock
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'graph_tutorial.settings')
+django.setup()
+
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, override_settings
+from tutorial import jobs, metrics
+from tutorial.call_budget import BudgetExceeded, call_budget
+from tutorial.graph import core as graph_core
+from tutorial.graph.calendar import SCHEDULE_BATCH_SIZE
+from tutorial.graph.core import USER_LOOKUP_BATCH_SIZE
+from tutorial.graph.teams import get_chat_ids
+from tutorial.graph.sharepoint import GraphSharePointClient
+from tutorial.models import TaskNotification
+from tutorial.subscriptions import SubscriptionManager, drain_inbox
+from benchmarks.simulator import GraphSimulator
+
+TOKEN = 'simulated-token'
+
+def _graph_request_count():
+    return sum(metrics.graph_requests.values.values())
+
+def bench_get_chat_ids(sim, args):
+    user_ids = [f'user-{i}' for i in range(min(args.attendees, len(sim.users)))]
+    chat_ids = get_chat_ids(TOKEN, user_ids)
+    return f'{sum(1 for c in chat_ids if c)}/{len(user_ids)} chats found'
+
+def bench_schedule_meeting(sim, args):
+    client = Client()
+    session = client.session
+    session['user'] = {'is_authenticated': True, 'name': 'Host User',
+                       'email': 'host@contoso.com', 'timeZone': 'UTC'}
+    session.save()
+    attendees = [f'user{i}@contoso.com' for i in range(args.attendees)]
+    # The session has no MSAL token cache, hand out the simulator token instead
+    with mock.patch('tutorial.views.get_token', return_value=TOKEN):
+        response = client.post('/auto-schedule-meeting', {
+            'title': 'Sprint planning',
+            'description': 'benchmark',
+            'duration': '60',
+            'start_time': '2025-01-06T09:00:00',
+            'end_time': '2025-01-10T18:00:00',
+            'attendees': attendees,
+        })
+    return f'HTTP {response.status_code}, {args.attendees} attendees'
+
+def bench_scan_routine(sim, args):
+    client = GraphSharePointClient(TOKEN)
+    client.scan_routine(sheet_name=sim.sheet_name)
+    jobs.work('bench', until_empty=True)
+    return f'{TaskNotification.objects.count()} notifications from {sim.rows} rows'
+
+def bench_scan_routine_ranged(sim, args):
+    # Same scan, forced onto the workbook range API path
+    with override_settings(WORKBOOK_RANGE_THRESHOLD=0):
+        return bench_scan_routine(sim, args)
+
+def bench_polling_task_pool(sim, args):
+    if not TaskNotification.objects.exists():
+        bench_scan_routine(sim, args)
+    client = GraphSharePointClient(TOKEN)
+    before = len(sim.patched_ranges)
+    client.polling_task_pool()
+    jobs.work('bench', until_empty=True)
+    return f'{len(sim.patched_ranges) - before} replies written back'
+
+def bench_webhook_ingest(sim, args):
+    # Same workload as polling_task_pool, but replies arrive as change notifications
+    TaskNotification.objects.all().delete()
+    client = GraphSharePointClient(TOKEN)
+    manager = SubscriptionManager(client, 'https://bench.invalid/webhook/notifications/')
+    manager.sync(['19:group%d@thread.v2' % k for k in range(sim.group_chats)])
+    client.scan_routine(sheet_name=sim.sheet_name)
+    jobs.work('bench', until_empty=True)
+
+    web = Client()
+    before = len(sim.patched_ranges)
+    for body in sim.notification_batches():
+        web.post('/webhook/notifications/', body, content_type='application/json')
+    drain_inbox(client)
+    jobs.work('bench', until_empty=True)
+    return f'{len(sim.patched_ranges) - before} replies written back'
+
+def bench_paged_walk(sim, args):
+    # Read every group chat's messages, parsing each body as the reply search does,
+    # once with the next page prefetched and once fetching page after page
+    from bs4 import BeautifulSoup
+    BeautifulSoup('<p>warm up</p>', 'html.parser').get_text()
+    headers = {'Authorization': f'Bearer {TOKEN}'}
+    timings = {}
+    for prefetch in (False, True):
+        started = time.perf_counter()
+        for k in range(sim.group_chats):
+            url = f'{graph_core.GRAPH_URL}/chats/19:group{k}@thread.v2/messages'
+            for message in graph_core.GraphPages(url, headers, top=50, what='messages', prefetch=prefetch):
+                BeautifulSoup(message['body']['content'], 'html.parser').get_text()
+        timings[prefetch] = time.perf_counter() - started
+    return f'prefetch {timings[True]:.2f}s, sequential {timings[False]:.2f}s'
+
+def bench_lookup_burst(sim, args):
+    # A burst of schedule_meeting submissions resolving the same attendees at once
+    from concurrent.futures import ThreadPoolExecutor
+    from tutorial.graph.core import get_user_info
+    emails = [f'user{i}@contoso.com' for i in range(args.attendees)]
+    coalesced = sum(metrics.graph_coalesced.values.values())
+    def submission(_):
+        return [get_user_info(TOKEN, email) for email in emails]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(submission, range(8)))
+    coalesced = sum(metrics.graph_coalesced.values.values()) - coalesced
+    return f'{len(emails) * 8} lookups, {coalesced} shared an in-flight request'
+
+BENCHMARKS = {
+    'get_chat_ids': bench_get_chat_ids,
+    'schedule_meeting': bench_schedule_meeting,
+    'scan_routine': bench_scan_routine,
+    'scan_routine_ranged': bench_scan_routine_ranged,
+    'polling_task_pool': bench_polling_task_pool,
+    'webhook_ingest': bench_webhook_ingest,
+    'paged_walk': bench_paged_walk,
+    'lookup_burst': bench_lookup_burst,
+}
+
+def _chat_pages(args):
+    return math.ceil(args.chats / args.page_size)
+
+# Graph calls allowed for the workload, so N+1 patterns don't creep back in
+BUDGETS = {
+    # one walk of /me/chats with members expanded, nothing per chat
+    'get_chat_ids': lambda args: {'graph': _chat_pages(args)},
+    # /me, the chats walk, batched user lookups and getSchedule, and one card
+    # per attendee sent by the jobs
+    'schedule_meeting': lambda args: {'graph': args.attendees + _chat_pages(args) + 1
+                                      + math.ceil(args.attendees / USER_LOOKUP_BATCH_SIZE)
+                                      + math.ceil((args.attendees + 1) / SCHEDULE_BATCH_SIZE)},
+}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--chats', type=int, default=1000)
+    parser.add_argument('--messages', type=int, default=50000)
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--attendees', type=int, default=10)
+    parser.add_argument('--page-size', type=int, default=50)
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--throttle-rate', type=float, default=0.0)
+    parser.add_argument('--only', nargs='*', choices=sorted(BENCHMARKS))
+    parser.add_argument('--check-budgets', action='store_true', help='fail when a benchmark exceeds its Graph call budget')
+    args = parser.parse_args(argv)
+
+    setup_test_environment()
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0)
+    try:
+        return _run(args)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+def _run(args):
+
+    sim = GraphSimulator(
+        users=args.users, chats=args.chats, messages=args.messages, rows=args.rows,
+        page_size=args.page_size, latency=args.latency_ms / 1000, throttle_rate=args.throttle_rate)
+    sim.install(graph_core._session)
+    sim.workbook_bytes()
+
+    print(f"{'benchmark':20} {'seconds':>9} {'graph calls':>12} {'round trips':>12}  result")
+    over_budget = []
+    for name in args.only or BENCHMARKS:
+        calls_before = _graph_request_count()
+        trips_before = len(sim.calls)
+        budget = BUDGETS[name](args) if args.check_budgets and name in BUDGETS else {}
+        started = time.perf_counter()
+        try:
+            with call_budget(name=f'bench:{name}', **budget):
+                result = BENCHMARKS[name](sim, args)
+                jobs.work('bench', until_empty=True)
+        except BudgetExceeded as e:
+            result = f'OVER BUDGET: {e}'
+            over_budget.append(name)
+        elapsed = time.perf_counter() - started
+        print(f'{name:20} {elapsed:9.3f} {_graph_request_count() - calls_before:12} '
+              f'{len(sim.calls) - trips_before:12}  {result}')
+    return 1 if over_budget else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,440 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""
+An in-process stand-in for the parts of Microsoft Graph this app uses.
+
+GraphSimulator is a requests transport adapter: mount it on the session
+tutorial.graph.core sends through and every call to graph.microsoft.com is served
+from generated data instead of a tenant. Latency, page size and 429
+injection are configurable so benchmarks can model a slow or throttling
+Graph as well as a fast one. openpyxl is only imported by the workbook
+endpoints, so the tests can use the simulator without the sheet libraries.
+"""
+
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+from io import BytesIO
+from urllib.parse import urlsplit, parse_qs, unquote
+import requests
+from requests.adapters import BaseAdapter
+
+GRAPH_HOST = 'https://graph.microsoft.com/'
+
+# Header row of the template sheet, in the column order of sheet_rules.DEFAULT_COLUMNS
+SHEET_HEADERS = [
+    'Feature', 'Epic', 'ID', 'Priority', 'Task', 'Owner', 'EST_start_BE', 'EST_start_FE',
+    'EST_days_BE', 'EST_days_FE', 'spent_days_BE', 'spent_days_FE', 'due_date_BE',
+    'due_date_FE', 'Note', 'MR', 'teams_group_name',
+]
+
+class GraphSimulator(BaseAdapter):
+    """
+    Args:
+        users (int): directory size; user i has a oneOnOne chat with "me".
+        chats (int): total chats, the first `group_chats` are group chats with topic "Team {k}".
+        messages (int): pre-existing chat messages, spread over the group chats.
+        rows (int): data rows of the generated workbook.
+        missing_rate (float): share of rows with an empty EST_start_BE cell.
+        reply_rate (float): share of posted messages that get an automatic reply.
+        page_size (int): items per page on paged collections.
+        latency (float): seconds added to every request.
+        throttle_rate (float): probability of answering 429 with Retry-After: 0.
+    """
+
+    def __init__(self, users=200, chats=1000, group_chats=20, messages=50000, rows=20000,
+                 missing_rate=0.05, reply_rate=0.5, page_size=50, latency=0.0, throttle_rate=0.0,
+                 sheet_name='automation_test', seed=0):
+        super().__init__()
+        self.page_size = page_size
+        self.latency = latency
+        self.throttle_rate = throttle_rate
+        self.reply_rate = reply_rate
+        self.sheet_name = sheet_name
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = []
+
+        self.me = {
+            'id': 'user-me',
+            'displayName': 'Host User',
+            'mail': 'host@contoso.com',
+            'userPrincipalName': 'host@contoso.com',
+            'mailboxSettings': {'timeZone': 'UTC'},
+        }
+        self.users = {}
+        for i in range(users):
+            email = f'user{i}@contoso.com'
+            self.users[email.lower()] = {
+                'id': f'user-{i}',
+                'displayName': f'User {i}',
+                'mail': email,
+                'userPrincipalName': email,
+            }
+        user_list = list(self.users.values())
+
+        self.chats = []
+        self.members = {}
+        for k in range(chats):
+            if k < group_chats:
+                chat = {'id': f'19:group{k}@thread.v2', 'topic': f'Team {k}', 'chatType': 'group'}
+                members = [self.me] + user_list
+            else:
+                other = user_list[(k - group_chats) % len(user_list)]
+                chat = {'id': f'19:{other["id"]}_me@unq.gbl.spaces', 'topic': None, 'chatType': 'oneOnOne'}
+                members = [self.me, other]
+            self.chats.append(chat)
+            self.members[chat['id']] = [
+                {'id': f'm-{chat["id"]}-{m["id"]}', 'userId': m['id'], 'displayName': m['displayName'],
+                 'email': m['mail'], 'tenantId': 'tenant-1'} for m in members
+            ]
+
+        self.subscriptions = {}
+        # Change notifications Graph would have delivered for subscribed chats
+        self.outbox = []
+        self.messages = {chat['id']: [] for chat in self.chats}
+        group_ids = [chat['id'] for chat in self.chats[:group_chats]] or [self.chats[0]['id']]
+        self._next_message = 0
+        for i in range(messages):
+            sender = user_list[i % len(user_list)]
+            self._add_message(group_ids[i % len(group_ids)], sender, f'<p>status update {i}</p>')
+
+        self.rows = rows
+        self.missing_rate = missing_rate
+        self.group_chats = group_chats
+        self._workbook = None
+        self._sheet = None
+        self.patched_ranges = []
+
+    # data generation
+
+    def _add_message(self, chat_id, sender, content, reference=None):
+        self._next_message += 1
+        stamp = (datetime(2025, 1, 1) + timedelta(seconds=self._next_message)).isoformat() + 'Z'
+        message = {
+            'id': str(1700000000000 + self._next_message),
+            'replyToId': None,
+            'etag': str(self._next_message),
+            'messageType': 'message',
+            'createdDateTime': stamp,
+            'lastModifiedDateTime': stamp,
+            'lastEditedDateTime': None,
+            'deletedDateTime': None,
+            'subject': None,
+            'summary': None,
+            'chatId': chat_id,
+            'importance': 'normal',
+            'locale': 'en-us',
+            'webUrl': None,
+            'channelIdentity': None,
+            'policyViolation': None,
+            'eventDetail': None,
+            'from': {'application': None, 'device': None,
+                     'user': {'id': sender['id'], 'displayName': sender['displayName'],
+                              'userIdentityType': 'aadUser', 'tenantId': 'tenant-1'}},
+            'body': {'contentType': 'html', 'content': content},
+            'attachments': [],
+            'mentions': [],
+            'reactions': [],
+        }
+        if reference:
+            message['attachments'].append({
+                'id': reference, 'contentType': 'messageReference', 'contentUrl': None,
+                'content': json.dumps({'messageId': reference, 'messagePreview': '...'}),
+                'name': None, 'thumbnailUrl': None, 'teamsAppId': None,
+            })
+        self.messages[chat_id].append(message)
+        for sub_id, sub in self.subscriptions.items():
+            if sub['resource'] == f'/chats/{chat_id}/messages':
+                self.outbox.append({
+                    'subscriptionId': sub_id,
+                    'clientState': sub['clientState'],
+                    'changeType': 'created',
+                    'resource': f"chats('{chat_id}')/messages('{message['id']}')",
+                })
+        return message
+
+    def sheet_rows(self):
+        """Header and data rows of the template sheet."""
+        if self._sheet is None:
+            user_list = list(self.users.values())
+            self._sheet = [SHEET_HEADERS]
+            for r in range(self.rows):
+                owner = user_list[r % len(user_list)]['mail']
+                missing = self.random.random() < self.missing_rate
+                self._sheet.append([
+                    f'Feature {r // 50}', 'Epic', r, 'P2', f'Task {r}', owner,
+                    None if missing else '2025-01-06', '2025-01-06', 2, 2, 1, 1,
+                    '2025-01-10', '2025-01-10', None, None, f'Team {r % max(self.group_chats, 1)}',
+                ])
+        return self._sheet
+
+    def workbook_bytes(self):
+        if self._workbook is None:
+            from openpyxl import Workbook
+            wb = Workbook(write_only=True)
+            ws = wb.create_sheet(self.sheet_name)
+            for row in self.sheet_rows():
+                ws.append(row)
+            buffer = BytesIO()
+            wb.save(buffer)
+            self._workbook = buffer.getvalue()
+        return self._workbook
+
+    # transport
+
+    def close(self):
+        pass
+
+    def send(self, request, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        parts = urlsplit(request.url)
+        path = unquote(parts.path)
+        if path.startswith('/v1.0'):
+            path = path[len('/v1.0'):]
+        query = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+        body = json.loads(request.body) if request.body else None
+
+        with self.lock:
+            self.calls.append((request.method, path))
+            throttled = self.throttle_rate and self.random.random() < self.throttle_rate
+            if throttled:
+                return self._response(request, 429, {'error': {'code': 'TooManyRequests'}}, {'Retry-After': '0'})
+            for method, pattern, handler in self.routes:
+                match = re.fullmatch(pattern, path)
+                if method == request.method and match:
+                    result = handler(self, request, query, body, *match.groups())
+                    if isinstance(result, tuple):
+                        return self._response(request, *result)
+                    return self._response(request, 200, result)
+        return self._response(request, 404, {'error': {'code': 'itemNotFound', 'message': path}})
+
+    def _response(self, request, status, payload, headers=None):
+        response = requests.Response()
+        response.status_code = status
+        response.url = request.url
+        response.request = request
+        if isinstance(payload, bytes):
+            response._content = payload
+            response.headers['Content-Type'] = 'application/octet-stream'
+        else:
+            response._content = json.dumps(payload).encode('utf8')
+            response.headers['Content-Type'] = 'application/json'
+        response.headers.update(headers or {})
+        response.encoding = 'utf-8'
+        return response
+
+    def _page(self, request, items, query):
+        skip = int(query.get('$skiptoken', 0))
+        size = min(int(query.get('$top', self.page_size)), self.page_size)
+        page = {'value': items[skip:skip + size]}
+        if skip + size < len(items):
+            parts = urlsplit(request.url)
+            params = {key: value for key, value in parse_qs(parts.query).items() if key != '$skiptoken'}
+            tail = '&'.join(f'{key}={values[-1]}' for key, values in params.items())
+            page['@odata.nextLink'] = f'{parts.scheme}://{parts.netloc}{parts.path}?{tail}&$skiptoken={skip + size}'
+        return page
+
+    # handlers
+
+    def _get_me(self, request, query, body):
+        return self.me
+
+    def _get_user(self, request, query, body, email):
+        user = self.users.get(email.lower())
+        if user is None:
+            return 404, {'error': {'code': 'Request_ResourceNotFound'}}
+        return user
+
+    def _list_users(self, request, query, body):
+        listed = re.search(r"mail in \(([^)]*)\)", query.get('$filter', ''))
+        if listed:
+            emails = {email.lower() for email in re.findall(r"'((?:[^']|'')*)'", listed.group(1))}
+            return {'value': [u for u in self.users.values() if u['mail'].lower() in emails]}
+        match = re.search(r"startswith\(displayName,'([^']*)'\)", query.get('$filter', ''))
+        prefix = (match.group(1) if match else '').lower()
+        found = [u for u in self.users.values() if u['displayName'].lower().startswith(prefix)]
+        return {'value': found[:100]}
+
+    def _list_chats(self, request, query, body):
+        chats = self.chats
+        if 'members' in query.get('$expand', ''):
+            chats = [dict(chat, members=self.members[chat['id']]) for chat in chats]
+        return self._page(request, chats, query)
+
+    def _list_members(self, request, query, body, chat_id):
+        return {'value': self.members.get(chat_id, [])}
+
+    def _list_messages(self, request, query, body, chat_id):
+        if chat_id not in self.messages:
+            return 404, {'error': {'code': 'NotFound'}}
+        # Graph returns the newest messages first
+        return self._page(request, self.messages[chat_id][::-1], query)
+
+    def _get_message(self, request, query, body, chat_id, message_id):
+        for message in self.messages.get(chat_id, []):
+            if message['id'] == message_id:
+                return message
+        return 404, {'error': {'code': 'NotFound'}}
+
+    def _post_message(self, request, query, body, chat_id):
+        if chat_id not in self.messages:
+            return 404, {'error': {'code': 'NotFound'}}
+        message = self._add_message(chat_id, self.me, body['body']['content'])
+        mentions = body.get('mentions') or []
+        if mentions and self.random.random() < self.reply_rate:
+            mentioned = mentions[0]['mentioned']['user']
+            self._add_message(chat_id, mentioned, '<p>done, starting monday</p>', reference=message['id'])
+        return 201, message
+
+    def _find_meeting_times(self, request, query, body):
+        slot = body['timeConstraint']['timeslots'][0]
+        start = datetime.fromisoformat(slot['start']['dateTime'])
+        minutes = int(body['meetingDuration'][2:-1])
+        suggestions = []
+        for i in range(5):
+            begin = start + timedelta(minutes=30 * i)
+            suggestions.append({
+                'confidence': 100.0,
+                'attendeeAvailability': [{'attendee': a, 'availability': 'free'} for a in body['attendees']],
+                'meetingTimeSlot': {
+                    'start': {'dateTime': begin.isoformat(), 'timeZone': slot['start']['timeZone']},
+                    'end': {'dateTime': (begin + timedelta(minutes=minutes)).isoformat(), 'timeZone': slot['start']['timeZone']},
+                },
+            })
+        return {'meetingTimeSuggestions': suggestions}
+
+    def _get_schedule(self, request, query, body):
+        start = datetime.fromisoformat(body['startTime']['dateTime'])
+        end = datetime.fromisoformat(body['endTime']['dateTime'])
+        interval = body.get('availabilityViewInterval', 30)
+        length = max(int((end - start) / timedelta(minutes=interval)), 0)
+        value = []
+        per_hour = max(60 // interval, 1)
+        for email in body['schedules']:
+            rng = random.Random(email)
+            # Meetings take whole hours, a quarter of them are booked
+            hours = ['2' if rng.random() < 0.25 else '0' for _ in range(length // per_hour + 1)]
+            view = ''.join(hours[i // per_hour] for i in range(length))
+            value.append({
+                'scheduleId': email, 'availabilityView': view, 'scheduleItems': [],
+                'workingHours': {
+                    'daysOfWeek': ['monday', 'tuesday', 'wednesday', 'thursday', 'friday'],
+                    'startTime': '08:00:00.0000000', 'endTime': '17:00:00.0000000',
+                    'timeZone': {'name': body['startTime']['timeZone']},
+                },
+            })
+        return {'value': value}
+
+    def _calendar_view(self, request, query, body):
+        events = [{
+            'id': f'event-{i}', 'changeKey': 'ck-1', 'subject': f'Event {i}',
+            'organizer': {'emailAddress': {'name': 'Host User', 'address': 'host@contoso.com'}},
+            'start': {'dateTime': f'2025-01-0{1 + i % 7}T{8 + i % 9:02d}:00:00.0000000', 'timeZone': 'UTC'},
+            'end': {'dateTime': f'2025-01-0{1 + i % 7}T{9 + i % 9:02d}:00:00.0000000', 'timeZone': 'UTC'},
+        } for i in range(120)]
+        return self._page(request, events, query)
+
+    def _calendar_delta(self, request, query, body):
+        if '$deltatoken' in query:
+            return {'value': [], '@odata.deltaLink': request.url}
+        page = self._calendar_view(request, query, body)
+        if '@odata.nextLink' not in page:
+            page['@odata.deltaLink'] = f'{GRAPH_HOST}v1.0/me/calendarView/delta?$deltatoken=1'
+        return page
+
+    def _create_event(self, request, query, body):
+        return 201, dict(body, id='event-new')
+
+    def _get_site(self, request, query, body, site_name):
+        return {'id': 'site-1', 'name': site_name}
+
+    def _list_drives(self, request, query, body, site_id):
+        return {'value': [{'id': 'drive-1', 'name': 'ScrumSprints'}]}
+
+    def _list_lists(self, request, query, body, site_id):
+        return {'value': [{'id': 'list-1', 'displayName': 'ScrumSprints'}]}
+
+    def _drive_content(self, request, query, body, site_id, drive_id, item_path):
+        return self.workbook_bytes()
+
+    def _drive_item(self, request, query, body, site_id, drive_id, item_path):
+        return {'id': 'item-1', 'name': item_path.rsplit('/', 1)[-1], 'size': len(self.workbook_bytes())}
+
+    def _list_worksheets(self, request, query, body, site_id, list_id, item_path):
+        return {'value': [{'id': '{00000000-0001}', 'name': self.sheet_name, 'position': 0}]}
+
+    def _used_range(self, request, query, body, site_id, list_id, item_path, sheet):
+        if sheet != self.sheet_name:
+            return 404, {'error': {'code': 'ItemNotFound'}}
+        rows = self.sheet_rows()
+        last_col = chr(ord('A') + len(SHEET_HEADERS) - 1)
+        return {'address': f'{sheet}!A1:{last_col}{len(rows)}'}
+
+    def _get_range(self, request, query, body, site_id, list_id, item_path, sheet, address):
+        if sheet != self.sheet_name:
+            return 404, {'error': {'code': 'ItemNotFound'}}
+        from openpyxl.utils.cell import range_boundaries
+        min_col, min_row, max_col, max_row = range_boundaries(address)
+        rows = self.sheet_rows()[min_row - 1:max_row]
+        text = [['' if cell is None else str(cell) for cell in row[min_col - 1:max_col]] for row in rows]
+        return {'address': f'{sheet}!{address}', 'text': text}
+
+    def _patch_range(self, request, query, body, site_id, list_id, item_path, sheet, address):
+        self.patched_ranges.append((sheet, address, body['values']))
+        return {'address': f'{sheet}!{address}', 'values': body['values']}
+
+    def _create_subscription(self, request, query, body):
+        sub_id = f'sub-{len(self.subscriptions) + 1}'
+        self.subscriptions[sub_id] = dict(body, id=sub_id)
+        return 201, self.subscriptions[sub_id]
+
+    def _renew_subscription(self, request, query, body, sub_id):
+        if sub_id not in self.subscriptions:
+            return 404, {'error': {'code': 'ResourceNotFound'}}
+        self.subscriptions[sub_id].update(body)
+        return self.subscriptions[sub_id]
+
+    def notification_batches(self, size=10):
+        """Pop the pending change notifications as webhook POST bodies."""
+        with self.lock:
+            pending, self.outbox = self.outbox, []
+        for i in range(0, len(pending), size):
+            yield json.dumps({'value': pending[i:i + size]})
+
+    routes = [
+        ('GET', r'/me', _get_me),
+        ('GET', r'/users', _list_users),
+        ('GET', r'/users/([^/]+)', _get_user),
+        ('GET', r'/me/chats', _list_chats),
+        ('GET', r'/chats/([^/]+)/members', _list_members),
+        ('GET', r'/chats/([^/]+)/messages', _list_messages),
+        ('GET', r'/chats/([^/]+)/messages/([^/]+)', _get_message),
+        ('POST', r'/chats/([^/]+)/messages', _post_message),
+        ('POST', r'/me/findMeetingTimes', _find_meeting_times),
+        ('POST', r'/me/calendar/getSchedule', _get_schedule),
+        ('GET', r'/me/calendarview', _calendar_view),
+        ('GET', r'/me/calendarView/delta', _calendar_delta),
+        ('POST', r'/me/events', _create_event),
+        ('POST', r'/subscriptions', _create_subscription),
+        ('PATCH', r'/subscriptions/([^/]+)', _renew_subscription),
+        ('GET', r'/sites/[^/]+:/sites/([^/]+)', _get_site),
+        ('GET', r'/sites/([^/]+)/drives', _list_drives),
+        ('GET', r'/sites/([^/]+)/lists', _list_lists),
+        ('GET', r'/sites/([^/]+)/drives/([^/]+)/root:/(.+):/content', _drive_content),
+        ('GET', r'/sites/([^/]+)/drives/([^/]+)/root:/([^:]+)', _drive_item),
+        ('GET', r'/sites/([^/]+)/lists/([^/]+)/drive/root:/(.+):/workbook/worksheets', _list_worksheets),
+        ('GET', r"/sites/([^/]+)/lists/([^/]+)/drive/root:/(.+):/workbook/worksheets\('([^']+)'\)/usedRange\(valuesOnly=true\)", _used_range),
+        ('GET', r"/sites/([^/]+)/lists/([^/]+)/drive/root:/(.+):/workbook/worksheets\('([^']+)'\)/range\(address='([^']+)'\)", _get_range),
+        ('PATCH', r"/sites/([^/]+)/lists/([^/]+)/drive/root:/(.+):/workbook/worksheets\('([^']+)'\)/range\(address='([^']+)'\)", _patch_range),
+    ]
+
+    def install(self, session):
+        """Serve every Graph request sent through `session` from this simulator."""
+        session.mount(GRAPH_HOST, self)
+        return self
@@ -10,7 +10,9 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.1/ref/settings/
 """
 
+import os
 from pathlib import Path
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -45,11 +47,13 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'tutorial.middleware.CallBudgetMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'tutorial.middleware.GraphUnavailableMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
@@ -82,14 +86,102 @@ WSGI_APPLICATION = 'graph_tutorial.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.1/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# DB_ENGINE=postgres for multi-process / multi-node installs (needs psycopg, see requirements-postgres.txt),
+# the default sqlite runs in WAL mode with the SQLITE_PRAGMAS below applied
+# to every new connection (see tutorial.db).
+
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite')
+
+if DB_ENGINE == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('POSTGRES_DB', 'graph_tutorial'),
+            'USER': os.environ.get('POSTGRES_USER', 'postgres'),
+            'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+            'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
+            'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+            # Persistent connections, re-checked before reuse
+            'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', '60')),
+            'CONN_HEALTH_CHECKS': True,
+        }
     }
+elif DB_ENGINE == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': {
+                # Seconds a writer waits for the lock before "database is locked"
+                'timeout': 20,
+            },
+            # Tests run on a file too (removed afterwards): the in-memory
+            # default locks whole tables without waiting, which breaks tests
+            # with concurrent writers
+            'TEST': {
+                'NAME': os.environ.get('SQLITE_TEST_PATH', str(BASE_DIR / 'test_db.sqlite3')),
+            },
+        }
+    }
+else:
+    raise ImproperlyConfigured(f"Unsupported DB_ENGINE '{DB_ENGINE}', use 'sqlite' or 'postgres'")
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 20000,
+    'foreign_keys': 'ON',
 }
 
 
+# Cache
+# locmem is per process; use CACHE_BACKEND=file or redis when the web server,
+# job workers and SharePoint runners should share entries.
+
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'locmem')
+
+if CACHE_BACKEND == 'redis':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379/0'),
+        }
+    }
+elif CACHE_BACKEND == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('CACHE_LOCATION', BASE_DIR / '.cache'),
+        }
+    }
+elif CACHE_BACKEND == 'locmem':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+else:
+    raise ImproperlyConfigured(f"Unsupported CACHE_BACKEND '{CACHE_BACKEND}', use 'locmem', 'file' or 'redis'")
+
+# Sessions are read from the cache and only written to the DB when modified.
+# The MSAL token cache is not kept in the session, see tutorial.auth_helper.
+
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+# Seconds a serialized MSAL token cache stays in CACHES before it is
+# re-read from the TokenCache table.
+
+TOKEN_CACHE_TIMEOUT = 60 * 60
+
+# Access tokens are refreshed in the background once they expire within
+# TOKEN_REFRESH_MARGIN seconds, and treated as expired TOKEN_EXPIRY_SKEW
+# seconds early (see tutorial.tokens).
+
+TOKEN_REFRESH_MARGIN = 5 * 60
+
+TOKEN_EXPIRY_SKEW = 30
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
 
@@ -130,3 +222,169 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/4.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Calendar page cache
+# Loads within CALENDAR_CACHE_TTL seconds are served without calling Graph,
+# older entries are refreshed with a calendarView delta round.
+# Entries (and their delta links) are dropped after CALENDAR_CACHE_TIMEOUT.
+
+CALENDAR_CACHE_TTL = 60
+
+CALENDAR_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Meeting candidates are only placed within each attendee's working hours
+# (getSchedule workingHours). Attendees Graph has none for (external or
+# unresolved mailboxes) get these, in the meeting's time zone.
+
+MEETING_WORKING_HOURS = {
+    'daysOfWeek': ['monday', 'tuesday', 'wednesday', 'thursday', 'friday'],
+    'startTime': '08:00:00',
+    'endTime': '17:00:00',
+}
+
+# Meeting progress polls
+# The /meeting-status/ payload is cached per meeting version and only served
+# while that version is still the meeting's current one (checked against the
+# database, so per-process caches are safe); the timeout bounds memory only.
+
+MEETING_STATUS_CACHE_TIMEOUT = 60
+
+# Microsoft Graph calls
+# 429 responses, and 503/504 ones to idempotent requests, are retried this
+# many times, honouring Retry-After
+
+GRAPH_MAX_RETRIES = 3
+
+# Timeouts of one Graph call in seconds; a deadline (tutorial.graph.resilience)
+# shortens them to the operation's remaining budget
+
+GRAPH_CONNECT_TIMEOUT = 5
+
+GRAPH_READ_TIMEOUT = 30
+
+# Budget of the Graph calls one page view may make
+
+GRAPH_VIEW_DEADLINE = 20
+
+# Bulk scheduling resolves many attendees and calendars in one request
+
+GRAPH_BULK_DEADLINE = 60
+
+# After this many consecutive failures of an endpoint family (chats, users,
+# sites...) its calls fail fast for GRAPH_BREAKER_COOLDOWN seconds
+
+GRAPH_BREAKER_THRESHOLD = 5
+
+GRAPH_BREAKER_COOLDOWN = 30
+
+# Identical concurrent GETs share one in-flight request
+
+GRAPH_SINGLE_FLIGHT = True
+
+# Graph call and query accounting per view and job (tutorial.call_budget)
+# Using one Graph endpoint or SQL statement more than CALL_REPEAT_THRESHOLD
+# times in one view or job is logged as a likely N+1 pattern.
+# CALL_BUDGETS maps URL names and 'job:<kind>' to {'graph': calls, 'db': queries};
+# going over is logged, or raises BudgetExceeded with CALL_BUDGETS_STRICT=1.
+
+CALL_REPEAT_THRESHOLD = 5
+
+CALL_BUDGETS = {
+    # /me, getSchedule, one user lookup per 15 attendees and the chats walk;
+    # the queries stay flat whatever the number of attendees
+    'auto_schedule_meeting': {'graph': 30, 'db': 12},
+}
+
+CALL_BUDGETS_STRICT = os.environ.get('CALL_BUDGETS_STRICT', '') == '1'
+
+# Threads fetching the next page of @odata.nextLink walks ahead of the caller
+
+GRAPH_PREFETCH_WORKERS = 4
+
+# When set, /metrics requires "Authorization: Bearer <METRICS_TOKEN>"
+
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+
+# Logging
+# Graph requests and operation spans are logged as one JSON object per line
+# on the 'tutorial.graph' logger
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'plain': {
+            'format': '%(asctime)s %(levelname)s %(name)s %(message)s',
+        },
+    },
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'plain',
+        },
+    },
+    'loggers': {
+        'tutorial': {
+            'handlers': ['console'],
+            'level': os.environ.get('TUTORIAL_LOG_LEVEL', 'INFO'),
+        },
+    },
+}
+
+# Change notifications for tracked chats
+# Public URL of the webhook/notifications/ route; when unset, replies are
+# found by polling only. With notifications on, polling_task_pool runs as a
+# reconciliation pass at most every WEBHOOK_RECONCILE_INTERVAL seconds.
+
+GRAPH_NOTIFICATION_URL = os.environ.get('GRAPH_NOTIFICATION_URL')
+
+WEBHOOK_RECONCILE_INTERVAL = 1800
+
+# Job queue (tutorial.jobs), worked by `manage.py run_jobs`
+# JOB_QUEUE_EAGER runs jobs inside the request instead (handy without a worker).
+# A running job's lease is renewed every JOB_LEASE_TIMEOUT / 3 seconds; a job
+# whose worker stopped renewing it for JOB_LEASE_TIMEOUT seconds is handed to
+# another worker. Failed jobs wait JOB_RETRY_BACKOFF * 2^(attempt-1) seconds.
+
+JOB_QUEUE_EAGER = os.environ.get('JOB_QUEUE_EAGER', '') == '1'
+
+JOB_LEASE_TIMEOUT = 300
+
+JOB_RETRY_BACKOFF = 5
+
+# Dashboard API (tutorial.dashboard)
+# Tombstones of removed notifications are kept this many seconds; change
+# feed cursors older than that get a reset and must resync.
+
+DASHBOARD_FEED_RETENTION = 60 * 60 * 24
+
+DASHBOARD_PAGE_SIZE = 100
+
+DASHBOARD_MAX_PAGE_SIZE = 500
+
+# XLSX exports are built in a temporary file before they are sent, larger
+# ones are refused (413) in favour of the streamed CSV export
+EXPORT_XLSX_MAX_ROWS = 100000
+
+# run_sharepoint_clients workers lease workbooks for WORKBOOK_LEASE_TTL
+# seconds and renew them while alive; a crashed worker's workbooks are taken
+# over once its leases expire. Keep clock skew between nodes well below it.
+
+WORKBOOK_LEASE_TTL = 60
+
+# Default notification rules for workbooks without their own
+# SharePointClientConfig.rules. Kinds: missing, overdue, over_estimate, stale
+# (see tutorial.sheet_rules).
+
+SHEET_RULES = [
+    {'kind': 'missing', 'field': 'EST_start_BE', 'reason': 'Estimate start date BE is missing'},
+]
+
+# scan_routine reads workbooks larger than WORKBOOK_RANGE_THRESHOLD bytes
+# through the workbook API, WORKBOOK_RANGE_CHUNK_ROWS rows per request,
+# instead of downloading the whole file.
+
+WORKBOOK_RANGE_THRESHOLD = 10 * 1024 * 1024
+
+WORKBOOK_RANGE_CHUNK_ROWS = 5000
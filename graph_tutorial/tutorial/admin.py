@@ -1,5 +1,12 @@
 from django.contrib import admin
-from .models import AutoScheduleMeeting
+from .models import AutoScheduleMeeting, Job
 
 # 註冊模型
-admin.site.register(AutoScheduleMeeting)
\ No newline at end of file
+admin.site.register(AutoScheduleMeeting)
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'status', 'priority', 'attempts', 'run_at', 'updated_at')
+    list_filter = ('status', 'kind')
+    search_fields = ('idempotency_key',)
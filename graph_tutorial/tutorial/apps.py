@@ -1,6 +1,11 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class TutorialConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'tutorial'
+
+    def ready(self):
+        from tutorial.db import apply_sqlite_pragmas
+        connection_created.connect(apply_sqlite_pragmas, dispatch_uid='tutorial_sqlite_pragmas')
@@ -1,31 +1,63 @@
 # Copyright (c) Microsoft Corporation.
 # Licensed under the MIT License.
 
+import secrets
 import yaml
 import msal
+from django.conf import settings as django_settings
+from django.core.cache import cache as shared_cache
+from tutorial.models import TokenCache
+from tutorial.tokens import TokenUnavailable, forget_provider, get_provider
 
 # Load the oauth_settings.yml file
 stream = open('oauth_settings.yml', 'r', encoding='utf8')
 settings = yaml.load(stream, yaml.SafeLoader)
 
+# The session only holds the key of the token cache; the serialized cache
+# lives in the TokenCache table, fronted by the Django cache, so the session
+# row stays small and is not rewritten on every request.
+
+def _cache_key(key):
+    return f'msal_token_cache:{key}'
+
+def _token_cache_key(request, create=False):
+    key = request.session.get('token_cache_key')
+    if key is None and create:
+        key = secrets.token_hex(16)
+        request.session['token_cache_key'] = key
+    return key
+
 def load_cache(request):
-    # Check for a token cache in the session
+    # Check for a token cache stored under the session's key
     cache = msal.SerializableTokenCache()
-    if request.session.get('token_cache'):
-        cache.deserialize(request.session['token_cache'])
+    key = _token_cache_key(request)
+    if key is None:
+        return cache
+
+    data = shared_cache.get(_cache_key(key))
+    if data is None:
+        data = TokenCache.objects.filter(key=key).values_list('data', flat=True).first()
+        if data is not None:
+            shared_cache.set(_cache_key(key), data, django_settings.TOKEN_CACHE_TIMEOUT)
+    if data:
+        cache.deserialize(data)
 
     return cache
 
+def store_token_cache(key, data):
+    TokenCache.objects.update_or_create(key=key, defaults={'data': data})
+    shared_cache.set(_cache_key(key), data, django_settings.TOKEN_CACHE_TIMEOUT)
+
 def save_cache(request, cache):
-    # If cache has changed, persist back to session
+    # Only write when MSAL changed the cache (sign in, token refresh)
     if cache.has_state_changed:
-        request.session['token_cache'] = cache.serialize()
+        store_token_cache(_token_cache_key(request, create=True), cache.serialize())
 
-def get_msal_app(cache=None):
+def get_msal_app(cache=None, authority=None):
     # Initialize the MSAL confidential client
     auth_app = msal.ConfidentialClientApplication(
         settings['app_id'],
-        authority=settings['authority'],
+        authority=authority or settings['authority'],
         client_credential=settings['app_secret'],
         token_cache=cache)
 
@@ -64,23 +96,27 @@ def store_user(request, user):
         'timeZone': time_zone
     }
 
-def get_token(request):
-    cache = load_cache(request)
-    auth_app = get_msal_app(cache)
-
-    accounts = auth_app.get_accounts()
-    if accounts:
-        result = auth_app.acquire_token_silent(
-            settings['scopes'],
-            account=accounts[0])
+def get_token_provider(request):
+    # Provider of the signed-in user's tokens, also usable by background jobs
+    key = _token_cache_key(request)
+    return get_provider(f'delegated:{key}') if key is not None else None
 
-        save_cache(request, cache)
-
-        return result['access_token'] if result is not None else None
+def get_token(request):
+    # Tokens close to expiry are refreshed in the background, not in the request
+    provider = get_token_provider(request)
+    if provider is None:
+        return None
+    try:
+        return provider.token()
+    except TokenUnavailable:
+        return None
 
 def remove_user_and_token(request):
-    if 'token_cache' in request.session:
-        del request.session['token_cache']
+    key = request.session.pop('token_cache_key', None)
+    if key is not None:
+        TokenCache.objects.filter(key=key).delete()
+        shared_cache.delete(_cache_key(key))
+        forget_provider(f'delegated:{key}')
 
     if 'user' in request.session:
         del request.session['user']
@@ -0,0 +1,78 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import hashlib
+import time
+from dateutil import parser
+from django.conf import settings
+from django.core.cache import cache
+from tutorial.graph.calendar import get_calendar_view_delta, DeltaTokenExpired
+
+# Only the fields the calendar page renders are kept in the cache
+EVENT_FIELDS = ('subject', 'organizer', 'start', 'end', 'changeKey')
+
+def _cache_key(user_email, start, end, timezone):
+    # Windows time zone names contain spaces and emails may be long, neither
+    # is a valid memcached key, so the window is hashed
+    window = hashlib.sha1(f'{user_email}|{timezone}|{start}|{end}'.encode()).hexdigest()
+    return f'calendar:{window}'
+
+def _compact_event(event):
+    compact = {field: event.get(field) for field in EVENT_FIELDS}
+    # Convert the ISO 8601 date times to datetime objects once, when the
+    # event enters the cache, instead of on every page load
+    compact['start'] = dict(compact['start'] or {})
+    compact['end'] = dict(compact['end'] or {})
+    if compact['start'].get('dateTime'):
+        compact['start']['dateTime'] = parser.parse(compact['start']['dateTime'])
+    if compact['end'].get('dateTime'):
+        compact['end']['dateTime'] = parser.parse(compact['end']['dateTime'])
+    return compact
+
+def _apply_changes(events, changes):
+    for change in changes:
+        event_id = change.get('id')
+        if not event_id:
+            continue
+        if '@removed' in change:
+            events.pop(event_id, None)
+            continue
+        cached = events.get(event_id)
+        # Unchanged events keep their already parsed copy
+        if cached and change.get('changeKey') and cached['changeKey'] == change['changeKey']:
+            continue
+        events[event_id] = _compact_event(change)
+
+def get_cached_calendar_events(token, user_email, start, end, timezone, force_refresh=False):
+    """
+    Return the events of a calendar window, sorted by start time.
+
+    The window is cached per user. Loads within CALENDAR_CACHE_TTL seconds are
+    served straight from the cache, later loads replay the stored calendarView
+    deltaLink so only changed events are pulled from Graph.
+    """
+    key = _cache_key(user_email, start, end, timezone)
+    entry = cache.get(key)
+    now = time.time()
+
+    if entry and not force_refresh and now - entry['synced_at'] < settings.CALENDAR_CACHE_TTL:
+        return entry['sorted']
+
+    events = entry['events'] if entry else {}
+    delta_link = entry['delta_link'] if entry else None
+    try:
+        changes, delta_link = get_calendar_view_delta(token, start, end, timezone, delta_link)
+    except DeltaTokenExpired:
+        # Sync state was dropped by Graph, start over with a full sync
+        events = {}
+        changes, delta_link = get_calendar_view_delta(token, start, end, timezone)
+
+    _apply_changes(events, changes)
+    entry = {
+        'events': events,
+        'sorted': sorted(events.values(), key=lambda e: e['start']['dateTime']),
+        'delta_link': delta_link,
+        'synced_at': now,
+    }
+    cache.set(key, entry, settings.CALENDAR_CACHE_TIMEOUT)
+    return entry['sorted']
@@ -0,0 +1,139 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""
+Graph call and database query accounting per view or job.
+
+`track(name)` counts the Graph calls (per method and endpoint template,
+retries excluded, coalesced waiters excluded) and the SQL queries made
+inside the block, including Graph calls from prefetch threads that copy
+the context. On exit:
+
+- an endpoint or identical SQL statement used more than
+  CALL_REPEAT_THRESHOLD times is logged as a likely N+1 pattern;
+- the totals are checked against CALL_BUDGETS[name]. Over-budget blocks
+  are logged, or raise BudgetExceeded when CALL_BUDGETS_STRICT is set.
+
+CallBudgetMiddleware tracks every view under its URL name and run_job
+every job as 'job:<kind>'. Tests and benchmarks pin a budget with
+
+    with call_budget(graph=len(attendees) + 6, db=40):
+        client.post('/auto-schedule-meeting', ...)
+"""
+
+import json
+import logging
+import threading
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.db import connections
+from tutorial import metrics
+
+logger = logging.getLogger('tutorial.graph')
+
+# Usages of the enclosing track() blocks, innermost last
+_usages = ContextVar('call_usages', default=())
+
+class BudgetExceeded(AssertionError):
+    """A view, job or test block made more Graph calls or queries than its budget allows."""
+
+class CallUsage:
+    def __init__(self, name):
+        self.name = name
+        self.graph = Counter()
+        self.queries = Counter()
+        self._lock = threading.Lock()
+
+    @property
+    def graph_calls(self):
+        return sum(self.graph.values())
+
+    @property
+    def db_queries(self):
+        return sum(self.queries.values())
+
+    def _count_query(self, execute, sql, params, many, context):
+        with self._lock:
+            self.queries[sql] += 1
+        return execute(sql, params, many, context)
+
+    def repeated(self, threshold=None):
+        """[(kind, what, count)] of the endpoints and statements used more than `threshold` times."""
+        threshold = settings.CALL_REPEAT_THRESHOLD if threshold is None else threshold
+        with self._lock:
+            return ([('graph', endpoint, count) for endpoint, count in self.graph.most_common() if count > threshold] +
+                    [('db', sql, count) for sql, count in self.queries.most_common() if count > threshold])
+
+    def over_budget(self, budget):
+        """Descriptions of the limits in {'graph': n, 'db': n} this usage exceeds."""
+        totals = {'graph': self.graph_calls, 'db': self.db_queries}
+        units = {'graph': 'Graph calls', 'db': 'queries'}
+        return [f'{totals[kind]} {units[kind]}, budget {limit}'
+                for kind, limit in (budget or {}).items() if limit is not None and totals[kind] > limit]
+
+def record_graph_call(method, url):
+    """Count one Graph call for every enclosing track() block."""
+    usages = _usages.get()
+    if not usages:
+        return
+    endpoint = f'{method} {metrics.endpoint_template(url)}'
+    for usage in usages:
+        with usage._lock:
+            usage.graph[endpoint] += 1
+
+def _report(usage):
+    for kind, what, count in usage.repeated():
+        metrics.record_repeated(usage.name, kind, count)
+        logger.warning(json.dumps({
+            'event': 'repeated_calls',
+            'operation': usage.name,
+            'kind': kind,
+            'target': what,
+            'count': count,
+        }))
+    logger.info(json.dumps({
+        'event': 'call_usage',
+        'operation': usage.name,
+        'graph_calls': usage.graph_calls,
+        'db_queries': usage.db_queries,
+    }))
+
+@contextmanager
+def track(name):
+    """Count the Graph calls and queries of the block; yields the CallUsage."""
+    usage = CallUsage(name)
+    token = _usages.set(_usages.get() + (usage,))
+    failed = False
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(usage._count_query))
+            yield usage
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        _usages.reset(token)
+        _report(usage)
+        # An error is more interesting than the budget of the failed attempt
+        if not failed:
+            check(usage, settings.CALL_BUDGETS.get(usage.name), settings.CALL_BUDGETS_STRICT)
+
+def check(usage, budget, strict):
+    exceeded = usage.over_budget(budget)
+    if not exceeded:
+        return
+    metrics.record_budget_exceeded(usage.name)
+    message = f"{usage.name} is over its call budget: {', '.join(exceeded)}"
+    if strict:
+        raise BudgetExceeded(message)
+    logger.warning(message)
+
+@contextmanager
+def call_budget(graph=None, db=None, name='call_budget'):
+    """For tests: raise BudgetExceeded when the block makes more than `graph` calls or `db` queries."""
+    with track(name) as usage:
+        yield usage
+    check(usage, {'graph': graph, 'db': db}, strict=True)
@@ -0,0 +1,185 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""
+Queries behind the TaskNotification dashboard API.
+
+Listing uses keyset pagination on id, so every page is an index range scan
+however deep the client pages. A page is first resolved to its
+(id, updated_at) keys, which gives the ETag / Last-Modified validators
+without loading the rows; the rows are only fetched when the client's copy
+is stale.
+
+The change feed walks (updated_at, id) from an opaque cursor and reports
+removed notifications from the DeletedTaskNotification tombstones.
+"""
+
+import hashlib
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.utils import timezone
+from tutorial.models import TaskNotification, DeletedTaskNotification
+
+FIELDS = (
+    'id', 'uuid', 'config_id', 'sheet_name', 'row', 'task', 'owner_name', 'owner_email',
+    'teams_group_name', 'field_address', 'reason', 'replied', 'msg_id', 'updated_at',
+)
+
+# Rows changed within this window are left for the next feed call, so a
+# transaction committing a slightly older updated_at is not skipped
+FEED_LAG = timedelta(seconds=2)
+
+_TRUE = {'1', 'true', 'yes'}
+_FALSE = {'0', 'false', 'no'}
+
+def _config_filter(queryset, value):
+    if value == 'none':
+        return queryset.filter(config__isnull=True)
+    if not value.isdigit():
+        raise ValueError("config must be a SharePointClientConfig id or 'none'")
+    return queryset.filter(config_id=int(value))
+
+def filter_notifications(params):
+    """TaskNotification queryset for the config, sheet, owner, replied and reason filters."""
+    queryset = TaskNotification.objects.all()
+    if params.get('config'):
+        queryset = _config_filter(queryset, params['config'])
+    if params.get('sheet'):
+        queryset = queryset.filter(sheet_name=params['sheet'])
+    if params.get('owner'):
+        queryset = queryset.filter(owner_email__iexact=params['owner'])
+    if params.get('reason'):
+        queryset = queryset.filter(reason=params['reason'])
+    replied = params.get('replied', '').lower()
+    if replied in _TRUE:
+        queryset = queryset.filter(replied=True)
+    elif replied in _FALSE:
+        queryset = queryset.filter(replied=False)
+    elif replied:
+        raise ValueError('replied must be true or false')
+    return queryset
+
+def page_size(params):
+    limit = params.get('limit', settings.DASHBOARD_PAGE_SIZE)
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        raise ValueError('limit must be an integer')
+    return max(1, min(limit, settings.DASHBOARD_MAX_PAGE_SIZE))
+
+def serialize(row):
+    row = dict(row)
+    row['uuid'] = str(row['uuid'])
+    row['updated_at'] = row['updated_at'].isoformat()
+    row['messages'] = len(row.pop('msg_id'))
+    return row
+
+def _rows(ids):
+    rows = TaskNotification.objects.filter(id__in=ids).order_by('id').values(*FIELDS)
+    return [serialize(row) for row in rows]
+
+def list_page(queryset, after=0, limit=None):
+    """
+    Resolve one page of `queryset` after id `after`.
+
+    Returns a dict with the page's ids, the next `after` value (None on the
+    last page), an ETag and the Last-Modified timestamp.
+    """
+    limit = limit or settings.DASHBOARD_PAGE_SIZE
+    keys = list(queryset.filter(id__gt=after).order_by('id').values_list('id', 'updated_at')[:limit + 1])
+    has_more = len(keys) > limit
+    keys = keys[:limit]
+
+    digest = hashlib.sha1()
+    for pk, updated_at in keys:
+        digest.update(f'{pk}:{updated_at.timestamp()};'.encode())
+    return {
+        'ids': [pk for pk, _ in keys],
+        'next': keys[-1][0] if has_more else None,
+        'etag': f'"{digest.hexdigest()}"',
+        'last_modified': int(max(updated_at for _, updated_at in keys).timestamp()) if keys else None,
+    }
+
+def page_payload(page):
+    return {'results': _rows(page['ids']), 'next': page['next']}
+
+# Changes and removals share one feed ordered by (timestamp, kind, id): at
+# the same timestamp changes come before tombstones, each in id order
+CHANGE, REMOVAL = 0, 1
+
+def encode_cursor(moment, kind, pk):
+    micros = int(moment.timestamp() * 1_000_000)
+    return f'{micros}-r{pk}' if kind == REMOVAL else f'{micros}-{pk}'
+
+def decode_cursor(cursor):
+    """(moment, kind, pk) of a cursor from encode_cursor()."""
+    try:
+        micros, pk = cursor.split('-')
+        moment = datetime.fromtimestamp(int(micros) / 1_000_000, tz=dt_timezone.utc)
+        if pk.startswith('r'):
+            return moment, REMOVAL, int(pk[1:])
+        return moment, CHANGE, int(pk)
+    except (ValueError, OverflowError):
+        raise ValueError('Malformed cursor')
+
+def _after(queryset, field, moment, kind, pk, own_kind):
+    # Entries past the cursor position (moment, kind, pk) in feed order
+    later = queryset.filter(**{f'{field}__gt': moment})
+    if kind < own_kind:
+        return later | queryset.filter(**{field: moment})
+    if kind == own_kind:
+        return later | queryset.filter(**{field: moment, 'id__gt': pk})
+    return later
+
+def change_feed(config=None, cursor=None, limit=None):
+    """
+    Notifications changed and removed since `cursor` (all of them without one).
+
+    Returns a dict with 'changes', 'removed' (ids), the next 'cursor' and
+    'more' when another call would return further changes or removals; both
+    count towards `limit`. A cursor older than DASHBOARD_FEED_RETENTION
+    yields {'reset': True}: the tombstones it would need are gone and the
+    client has to resync from scratch.
+    """
+    limit = limit or settings.DASHBOARD_PAGE_SIZE
+    now = timezone.now()
+    queryset = TaskNotification.objects.all()
+    tombstones = DeletedTaskNotification.objects.all()
+    if config:
+        queryset = _config_filter(queryset, config)
+        tombstones = _config_filter(tombstones, config)
+
+    if cursor:
+        since = decode_cursor(cursor)
+        if since[0] < now - timedelta(seconds=settings.DASHBOARD_FEED_RETENTION):
+            return {'reset': True}
+        queryset = _after(queryset, 'updated_at', *since, CHANGE)
+        tombstones = _after(tombstones, 'deleted_at', *since, REMOVAL)
+    else:
+        since = None
+
+    horizon = now - FEED_LAG
+    changed = queryset.filter(updated_at__lte=horizon).order_by('updated_at', 'id')
+    removed = tombstones.filter(deleted_at__lte=horizon).order_by('deleted_at', 'id')
+    # (timestamp, kind, id, notification id) of both streams, merged
+    entries = sorted(
+        [(moment, CHANGE, pk, pk) for pk, moment in changed.values_list('id', 'updated_at')[:limit + 1]] +
+        [(moment, REMOVAL, pk, notification_id) for pk, moment, notification_id
+         in removed.values_list('id', 'deleted_at', 'notification_id')[:limit + 1]])
+    more = len(entries) > limit
+    entries = entries[:limit]
+
+    if more or (entries and entries[-1][0] == horizon):
+        until = entries[-1][:3]
+    elif since is None or since[0] < horizon:
+        until = (horizon, CHANGE, 0)
+    else:
+        until = since
+
+    return {
+        'changes': _rows([entry[3] for entry in entries if entry[1] == CHANGE]),
+        'removed': [entry[3] for entry in entries if entry[1] == REMOVAL],
+        'cursor': encode_cursor(*until),
+        'more': more,
+        'reset': False,
+    }
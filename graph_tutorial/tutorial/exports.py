@@ -0,0 +1,125 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""
+Streaming CSV / XLSX exports of TaskNotification and AutoScheduleMeeting.
+
+Rows are read with values_list().iterator() and written one at a time, so
+an export holds a single chunk of rows in memory however large the table.
+CSV is streamed straight into the response. XLSX is a zip archive whose
+sheet openpyxl (write_only mode) spools to disk before packing it, so it
+can't be streamed as it is generated: the workbook is written to a
+temporary file which is then streamed from disk. That costs disk and time
+before the first byte, so XLSX exports are capped at EXPORT_XLSX_MAX_ROWS
+rows; larger tables have to use CSV.
+"""
+
+import csv
+import json
+import tempfile
+from datetime import datetime, timezone as dt_timezone
+from uuid import UUID
+from django.conf import settings
+from tutorial.models import AutoScheduleMeeting, TaskNotification
+
+# Rows fetched per database round trip
+EXPORT_CHUNK_SIZE = 2000
+
+# (field, column title)
+NOTIFICATION_COLUMNS = [
+    ('uuid', 'UUID'),
+    ('config_id', 'Config'),
+    ('sheet_name', 'Sheet'),
+    ('row', 'Row'),
+    ('task', 'Task'),
+    ('owner_name', 'Owner'),
+    ('owner_email', 'Owner email'),
+    ('teams_group_name', 'Teams group'),
+    ('field_address', 'Cell'),
+    ('reason', 'Reason'),
+    ('msg_id', 'Messages'),
+    ('replied', 'Replied'),
+]
+
+MEETING_COLUMNS = [
+    ('uuid', 'UUID'),
+    ('title', 'Title'),
+    ('status', 'Status'),
+    ('host_email', 'Host'),
+    ('attendees', 'Attendees'),
+    ('duration', 'Duration (min)'),
+    ('start_time', 'Window start'),
+    ('end_time', 'Window end'),
+    ('selected_time', 'Selected time'),
+    ('current_try', 'Tries'),
+    ('time_zone', 'Time zone'),
+    ('created_at', 'Created'),
+    ('updated_at', 'Updated'),
+]
+
+def _cell(value):
+    # Flatten the values CSV and Excel can't take as they are
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, datetime):
+        # Excel has no time zones, export UTC
+        if value.tzinfo is not None:
+            value = value.astimezone(dt_timezone.utc).replace(tzinfo=None)
+        return value
+    if isinstance(value, dict) and 'start' in value and 'end' in value:
+        return f"{value['start']} - {value['end']}"
+    if isinstance(value, list):
+        return ';'.join(str(item) for item in value)
+    if isinstance(value, dict):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+def rows(queryset, columns):
+    """Yield the export rows of `queryset`, a chunk of rows at a time."""
+    fields = [field for field, _ in columns]
+    for row in queryset.values_list(*fields).iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield [_cell(value) for value in row]
+
+def notifications(config_id=None):
+    queryset = TaskNotification.objects.order_by('id')
+    if config_id is not None:
+        queryset = queryset.filter(config_id=config_id)
+    return queryset
+
+def meetings(host_email):
+    return AutoScheduleMeeting.objects.filter(host_email=host_email).order_by('id')
+
+def xlsx_too_large(queryset):
+    """True when `queryset` has more rows than an XLSX export may hold."""
+    # One row past the cap is enough to tell, no need to count the whole table
+    return queryset[settings.EXPORT_XLSX_MAX_ROWS:settings.EXPORT_XLSX_MAX_ROWS + 1].exists()
+
+class _Echo:
+    """File-like object whose write() hands the line back instead of storing it."""
+    def write(self, value):
+        return value
+
+def stream_csv(columns, rows):
+    """Yield the CSV export line by line."""
+    writer = csv.writer(_Echo())
+    # BOM so Excel opens the UTF-8 file with the right encoding
+    yield '\ufeff' + writer.writerow([title for _, title in columns])
+    for row in rows:
+        yield writer.writerow(row)
+
+def write_xlsx(columns, rows, sheet_title='Export'):
+    """
+    Write the export to an anonymous temporary file and return it rewound,
+    ready to be streamed. The file is removed when closed.
+    """
+    from openpyxl import Workbook
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(sheet_title)
+    sheet.append([title for _, title in columns])
+    for row in rows:
+        sheet.append(row)
+
+    output = tempfile.TemporaryFile()
+    workbook.save(output)
+    output.seek(0)
+    return output
@@ -0,0 +1,13 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""
+Microsoft Graph helpers, split so each caller only loads what it uses:
+
+    core        graph_request, the shared session, user lookups
+    resilience  deadlines and per endpoint family circuit breakers
+    calendar    calendar view / delta, getSchedule, events
+    teams       chats, meeting cards, GraphTeamsClient
+    sharepoint  GraphSharePointClient (pandas etc. loaded on first use)
+    timezones   Windows -> IANA time zone names
+"""
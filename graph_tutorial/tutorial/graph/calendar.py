@@ -0,0 +1,249 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""Calendar, free/busy and event helpers."""
+
+import json
+import logging
+import requests
+from django.utils.dateparse import parse_datetime
+from typing import TYPE_CHECKING, List, Dict, Any
+from tutorial.graph.core import GRAPH_URL, GraphPages, graph_request
+if TYPE_CHECKING:
+    from tutorial.models import AutoScheduleMeeting
+
+logger = logging.getLogger(__name__)
+
+def get_calendar_events(token, start, end, timezone):
+    # Set headers
+    headers = {
+        'Authorization': f'Bearer {token}',
+        'Prefer': f'outlook.timezone="{timezone}"'
+    }
+
+    # Configure query parameters to
+    # modify the results
+    query_params = {
+        'startDateTime': start,
+        'endDateTime': end,
+        '$select': 'subject,organizer,start,end',
+        '$orderby': 'start/dateTime',
+        '$top': '50'
+    }
+
+    # Send GET to /me/events and follow @odata.nextLink so weeks with
+    # more than 50 events are returned in full
+    try:
+        events = list(GraphPages(f'{GRAPH_URL}/me/calendarview', headers, params=query_params, what='events'))
+    except requests.HTTPError as e:
+        # Return the error payload as-is, like the single page call did
+        return e.response.json()
+
+    # Return the JSON result
+    return {'value': events}
+
+class DeltaTokenExpired(Exception):
+    """The stored calendarView deltaLink is no longer accepted by Graph."""
+
+def get_calendar_view_delta(token, start, end, timezone, delta_link=None):
+    """
+    Run a calendarView delta round for the given window.
+
+    Without delta_link a full sync of the window is performed, otherwise only
+    the changes since the round that produced delta_link are returned.
+    Removed events come back as {'id': ..., '@removed': {...}}.
+
+    Returns:
+        tuple: (list of event dicts, new delta link)
+    """
+    headers = {
+        'Authorization': f'Bearer {token}',
+        'Prefer': f'outlook.timezone="{timezone}", odata.maxpagesize=50'
+    }
+
+    if delta_link:
+        url, params = delta_link, None
+    else:
+        url = f'{GRAPH_URL}/me/calendarView/delta'
+        params = {
+            'startDateTime': start,
+            'endDateTime': end,
+        }
+
+    pages = GraphPages(url, headers, params=params, what='calendar changes')
+    try:
+        events = list(pages)
+    except requests.HTTPError as e:
+        res = e.response
+        if res.status_code == 410 or (res.status_code == 400 and 'syncStateNotFound' in res.text):
+            raise DeltaTokenExpired(res.text)
+        raise Exception(f"Calendar delta failed: {res.status_code} {res.text}")
+    return events, pages.delta_link
+
+def get_meeting_times_slots(token: str, meeting: 'AutoScheduleMeeting', timezone: str = 'UTC') -> List[Dict[str, Any]]:
+    headers = {
+        'Authorization': f'Bearer {token}',
+        'Content-Type': 'application/json',
+        'Prefer': f'outlook.timezone="{timezone}"'
+    }
+    attendees_list = json.loads(meeting.attendees)  # 將 JSON 字符串轉換為列表
+    attendees_list.append(meeting.host_email)
+
+    body = {
+        "attendees": [
+            {
+                "emailAddress": { "address": email },
+                "type": "Required"
+            } for email in attendees_list  # 確保將 JSON 字符串轉換為列表
+        ],
+        "timeConstraint": {
+            "timeslots": [
+                {
+                    "start": {
+                        "dateTime": meeting.start_time.replace(tzinfo=None).isoformat(),
+                        "timeZone": timezone
+                    },
+                    "end": {
+                        "dateTime": meeting.end_time.replace(tzinfo=None).isoformat(),
+                        "timeZone": timezone
+                    }
+                }
+            ]
+        },
+        "meetingDuration": f"PT{meeting.duration}M"
+    }
+
+    response = graph_request('POST', f'{GRAPH_URL}/me/findMeetingTimes', headers=headers, json=body)
+
+    if response.status_code != 200:
+        raise Exception(f"Microsoft Graph API Error: {response.status_code} {response.text}")
+
+    data = response.json()
+
+    # Check if there are no available time slots
+    if not data.get("meetingTimeSuggestions"):
+        raise Exception("No available meeting time slots found in the response.")
+
+    meeting_times = []
+    for suggestion in data.get("meetingTimeSuggestions", []):
+        slot = suggestion["meetingTimeSlot"]
+        start_dt = parse_datetime(slot["start"]["dateTime"]).isoformat()
+        end_dt = parse_datetime(slot["end"]["dateTime"]).isoformat()
+        meeting_times.append({
+            "confidence": suggestion["confidence"],
+            "attendeeAvailability": suggestion["attendeeAvailability"],
+            "start": start_dt,
+            "end": end_dt
+        })
+
+
+    return meeting_times
+
+# getSchedule accepts a limited number of schedules per request
+SCHEDULE_BATCH_SIZE = 20
+
+def get_schedules(token, emails, start, end, timezone='UTC', interval=15):
+    """
+    Fetch free/busy for many users with /me/calendar/getSchedule.
+
+    Args:
+        emails (list): SMTP addresses, requested in batches of SCHEDULE_BATCH_SIZE.
+        start, end (str): ISO 8601 local date times in `timezone`.
+        interval (int): availabilityView slot size in minutes.
+
+    Returns:
+        dict: {email: {'view': availabilityView string, 'working_hours': workingHours}}.
+              The view has one digit per slot (0 free, 1 tentative, 2 busy,
+              3 oof, 4 working elsewhere); workingHours is Graph's
+              {daysOfWeek, startTime, endTime, timeZone}. Either is None when
+              Graph could not resolve the schedule.
+    """
+    headers = {
+        'Authorization': f'Bearer {token}',
+        'Content-Type': 'application/json',
+        'Prefer': f'outlook.timezone="{timezone}"'
+    }
+
+    schedules = {}
+    for i in range(0, len(emails), SCHEDULE_BATCH_SIZE):
+        batch = emails[i:i + SCHEDULE_BATCH_SIZE]
+        # scheduleId may come back in a different case than requested
+        requested = {email.lower(): email for email in batch}
+        body = {
+            "schedules": batch,
+            "startTime": {"dateTime": start, "timeZone": timezone},
+            "endTime": {"dateTime": end, "timeZone": timezone},
+            "availabilityViewInterval": interval
+        }
+        response = graph_request('POST', f'{GRAPH_URL}/me/calendar/getSchedule', headers=headers, json=body)
+        if response.status_code != 200:
+            raise Exception(f"Microsoft Graph API Error: {response.status_code} {response.text}")
+
+        for schedule in response.json().get('value', []):
+            email = requested.get(schedule['scheduleId'].lower(), schedule['scheduleId'])
+            failed = 'error' in schedule
+            schedules[email] = {
+                'view': None if failed else schedule.get('availabilityView'),
+                'working_hours': None if failed else schedule.get('workingHours'),
+            }
+
+    return schedules
+
+def get_schedule(token, emails, start, end, timezone='UTC', interval=15):
+    """{email: availabilityView string or None}, see get_schedules."""
+    schedules = get_schedules(token, emails, start, end, timezone, interval)
+    return {email: schedule['view'] for email, schedule in schedules.items()}
+
+def create_event(token, subject, start, end, attendees=None, body=None, timezone='UTC'):
+    # Create an event object
+    # https://docs.microsoft.com/graph/api/resources/event?view=graph-rest-1.0
+    new_event = {
+        'subject': subject,
+        'start': {
+            'dateTime': start,
+            'timeZone': timezone
+        },
+        'end': {
+            'dateTime': end,
+            'timeZone': timezone
+        },
+        'location': {
+            'displayName': "Teams 線上會議",
+        },
+        'isOnlineMeeting': True,
+        'onlineMeetingProvider': "teamsForBusiness",
+    }
+
+    if attendees:
+        attendee_list = []
+        for email in attendees:
+            # Create an attendee object
+            # https://docs.microsoft.com/graph/api/resources/attendee?view=graph-rest-1.0
+            attendee_list.append({
+                'type': 'required',
+                'emailAddress': { 'address': email }
+            })
+
+        new_event['attendees'] = attendee_list
+
+    if body:
+        # Create an itemBody object
+        # https://docs.microsoft.com/graph/api/resources/itembody?view=graph-rest-1.0
+        new_event['body'] = {
+            'contentType': 'text',
+            'content': body
+        }
+
+    # Set headers
+    headers = {
+        'Authorization': f'Bearer {token}',
+        'Content-Type': 'application/json'
+    }
+
+    response = graph_request('POST', f'{GRAPH_URL}/me/events',
+        headers=headers,
+        data=json.dumps(new_event))
+    if response.status_code != 201:
+        logger.error("Failed to create event: %s %s", response.status_code, response.text)
+
+    return response
@@ -0,0 +1,333 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""
+Graph HTTP core: the shared session, graph_request (retries, single-flight
+and metrics), the GraphPages collection walker and user lookups. Only
+requests and Django are imported here.
+"""
+
+import contextvars
+import hashlib
+import json
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+import requests
+from django.conf import settings
+from tutorial import call_budget, metrics
+from tutorial.graph import resilience
+
+GRAPH_URL = 'https://graph.microsoft.com/v1.0'
+
+logger = logging.getLogger(__name__)
+
+# Throttling and transient gateway errors worth retrying. A 503/504 may come
+# back after the request took effect, so only idempotent methods retry them;
+# a throttled (429) request was rejected and is safe to send again.
+RETRY_STATUSES = (429, 503, 504)
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE')
+
+_session = requests.Session()
+
+class _Flight:
+    """One in-flight GET whose response is shared with identical concurrent calls."""
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+def _flight_key(method, url, kwargs):
+    # Only reads are shared. The key covers the token, URL, query, the other
+    # headers (Prefer changes the payload) and any body; it is hashed so
+    # tokens are not kept around as dict keys.
+    if method != 'GET' or not settings.GRAPH_SINGLE_FLIGHT:
+        return None
+    request = {key: value for key, value in kwargs.items() if key in ('headers', 'params', 'json', 'data')}
+    return hashlib.sha256(json.dumps([url, request], sort_keys=True, default=str).encode()).hexdigest()
+
+def graph_request(method, url, **kwargs):
+    """
+    Send a request to Microsoft Graph.
+
+    Every Graph call in this module goes through here so status, latency,
+    response size and retries are recorded per endpoint template (see
+    tutorial.metrics). 429 responses, and 503/504 responses to idempotent
+    methods, are retried up to GRAPH_MAX_RETRIES times, honouring
+    Retry-After. A POST or PATCH answered with 503/504 is returned as is,
+    since the write may already have been applied.
+
+    Every call has connect/read timeouts, shortened to the remaining budget
+    of the current deadline, and goes through its endpoint family's circuit
+    breaker (see tutorial.graph.resilience). Calls that can't be made in
+    time or while the breaker is open raise a resilience.GraphUnavailable.
+
+    Identical GETs issued concurrently in this process (same token, URL,
+    query and headers) share one request: the first caller sends it, the
+    others wait for and receive the same response or exception.
+    """
+    key = _flight_key(method, url, kwargs)
+    if key is None:
+        return _send(method, url, **kwargs)
+
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = _Flight()
+
+    if not leader:
+        if not flight.done.wait(resilience.remaining()):
+            metrics.record_deadline(url)
+            raise resilience.DeadlineExceeded(f"Deadline exceeded waiting for {metrics.endpoint_template(url)}")
+        metrics.record_coalesced(url)
+        if flight.error is not None:
+            raise flight.error
+        return flight.response
+
+    try:
+        flight.response = _send(method, url, **kwargs)
+        return flight.response
+    except BaseException as e:
+        flight.error = e
+        raise
+    finally:
+        with _flights_lock:
+            del _flights[key]
+        flight.done.set()
+
+def _send(method, url, **kwargs):
+    timeout = resilience.timeouts(url)
+    circuit = resilience.breaker(url)
+    try:
+        circuit.before_call()
+    except resilience.CircuitOpen:
+        metrics.record_short_circuit(url)
+        raise
+
+    retry_statuses = RETRY_STATUSES if method.upper() in IDEMPOTENT_METHODS else (429,)
+    retries = 0
+    started = time.perf_counter()
+    ok = False
+    try:
+        while True:
+            try:
+                response = _session.request(method, url, timeout=timeout, **kwargs)
+            except requests.exceptions.RequestException:
+                metrics.record_request(method, url, 'error', time.perf_counter() - started, 0, retries)
+                raise
+
+            if response.status_code not in retry_statuses or retries >= settings.GRAPH_MAX_RETRIES:
+                break
+
+            retry_after = response.headers.get('Retry-After')
+            delay = float(retry_after) if retry_after and retry_after.isdigit() else 2 ** retries
+            left = resilience.remaining()
+            if left is not None and delay >= left:
+                # Waiting would overrun the deadline, hand back the throttled response
+                break
+            if response.status_code == 429:
+                metrics.record_throttle(url, delay)
+            retries += 1
+            time.sleep(delay)
+            timeout = resilience.timeouts(url)
+
+        metrics.record_request(method, url, response.status_code, time.perf_counter() - started,
+                               len(response.content), retries)
+        ok = not resilience.is_failure(response.status_code)
+        return response
+    finally:
+        circuit.record(ok)
+        call_budget.record_graph_call(method, url)
+
+_prefetch_pool = None
+_prefetch_lock = threading.Lock()
+
+def _prefetcher():
+    global _prefetch_pool
+    with _prefetch_lock:
+        if _prefetch_pool is None:
+            _prefetch_pool = ThreadPoolExecutor(max_workers=settings.GRAPH_PREFETCH_WORKERS,
+                                                thread_name_prefix='graph-prefetch')
+    return _prefetch_pool
+
+class GraphPages:
+    """
+    Lazily walk a Graph collection, following @odata.nextLink.
+
+    Iterating yields the items of each page as it arrives. While the caller
+    works through one page the next one is already being fetched on a
+    background thread, so long walks overlap network and processing. A
+    caller that stops early (break/return) makes no further requests beyond
+    the page already in flight.
+
+    Args:
+        url (str): collection URL; nextLinks carry the query string onwards.
+        headers (dict): request headers, sent with every page.
+        params (dict): query parameters of the first request.
+        top (int): $top page size to ask Graph for.
+        max_pages (int): stop after this many pages, setting `truncated`.
+        what (str): what is being listed, for the error message.
+        prefetch (bool): fetch the next page in the background.
+
+    Non-200 pages raise requests.HTTPError. After a complete walk
+    `delta_link` holds the last page's @odata.deltaLink, if any.
+    """
+    def __init__(self, url, headers=None, params=None, top=None, max_pages=None, what='items', prefetch=True):
+        self.url = url
+        self.headers = headers
+        self.params = dict(params or {})
+        if top:
+            self.params['$top'] = top
+        self.max_pages = max_pages
+        self.what = what
+        self.prefetch = prefetch
+        self.pages = 0
+        self.truncated = False
+        self.delta_link = None
+
+    def _get(self, url, params):
+        response = graph_request('GET', url, headers=self.headers, params=params)
+        if response.status_code != 200:
+            raise requests.HTTPError(f"Failed to fetch {self.what}: {response.status_code} {response.text}",
+                                     response=response)
+        return response.json()
+
+    def _fetch(self, url):
+        if not self.prefetch:
+            return url
+        # run in a copy of the context so the request keeps the caller's metrics span
+        context = contextvars.copy_context()
+        return _prefetcher().submit(context.run, self._get, url, None)
+
+    def _result(self, pending):
+        if isinstance(pending, Future):
+            return pending.result()
+        return self._get(pending, None)
+
+    def __iter__(self):
+        self.pages, self.truncated, self.delta_link = 0, False, None
+        pending = None
+        try:
+            data = self._get(self.url, self.params or None)
+            while True:
+                self.pages += 1
+                next_link = data.get('@odata.nextLink')
+                if next_link and self.max_pages and self.pages >= self.max_pages:
+                    logger.warning("Stopped listing %s after %d pages", self.what, self.pages)
+                    self.truncated = True
+                    next_link = None
+                if next_link:
+                    # ask for the next page before handing this one out
+                    pending = self._fetch(next_link)
+                else:
+                    self.delta_link = data.get('@odata.deltaLink')
+                yield from data.get('value', [])
+                if pending is None:
+                    return
+                data, pending = self._result(pending), None
+        finally:
+            if isinstance(pending, Future):
+                pending.cancel()
+            metrics.record_pages(self.url, self.pages)
+
+def get_user(token):
+    # Send GET to /me
+    user = graph_request('GET',
+        f'{GRAPH_URL}/me',
+        headers={
+          'Authorization': f'Bearer {token}'
+        },
+        params={
+          '$select': 'displayName,mail,mailboxSettings,userPrincipalName'
+        })
+    # Return the JSON result
+    return user.json()
+
+def get_users(token, query=None):
+    if not query:
+        return []
+    query = query.strip()
+    if not query:
+        raise ValueError("Query parameter is required")
+
+    filter_query = f"startswith(displayName,'{query}') or startswith(mail,'{query}')"
+    endpoint = f"{GRAPH_URL}/users?$filter={filter_query}&$select=displayName,mail,userPrincipalName"
+
+    headers = {
+        "Authorization": f"Bearer {token}",
+        "Content-Type": "application/json"
+    }
+
+    try:
+        response = graph_request('GET', endpoint, headers=headers)
+        response.raise_for_status()
+        data = response.json()
+
+        if "value" not in data:
+            raise ValueError("Invalid response from Graph API")
+
+        contacts = []
+        for user in data["value"]:
+            email = user.get("mail") or user.get("userPrincipalName")
+            if email:
+                contacts.append({
+                    "name": user.get("displayName", ""),
+                    "email": email
+                })
+
+        return contacts
+
+    except requests.exceptions.RequestException as e:
+        raise RuntimeError(f"Graph API request failed: {e}")
+
+# Addresses per /users lookup; Graph accepts up to 15 values per `in` clause
+USER_LOOKUP_BATCH_SIZE = 15
+
+def get_users_by_email(token, emails):
+    """
+    Resolve many users with /users?$filter=mail in (...) or
+    userPrincipalName in (...), USER_LOOKUP_BATCH_SIZE addresses per request.
+
+    Returns:
+        dict: {email: user} for the addresses Graph has a user for, keyed as
+              given. Unknown addresses are left out.
+
+    Raises:
+        requests.HTTPError: a lookup failed.
+    """
+    headers = {'Authorization': f'Bearer {token}'}
+    emails = list(dict.fromkeys(emails))
+    found = {}
+    for i in range(0, len(emails), USER_LOOKUP_BATCH_SIZE):
+        batch = emails[i:i + USER_LOOKUP_BATCH_SIZE]
+        quoted = ', '.join("'{}'".format(email.replace("'", "''")) for email in batch)
+        response = graph_request('GET', f'{GRAPH_URL}/users', headers=headers, params={
+            '$filter': f'mail in ({quoted}) or userPrincipalName in ({quoted})',
+            '$select': 'id,displayName,mail,userPrincipalName',
+            '$top': str(2 * USER_LOOKUP_BATCH_SIZE),
+        })
+        if response.status_code != 200:
+            raise requests.HTTPError(f"Failed to look up users: {response.status_code} {response.text}",
+                                     response=response)
+        # Graph may answer in another case than requested
+        requested = {email.lower(): email for email in batch}
+        for user in response.json().get('value', []):
+            for address in (user.get('mail'), user.get('userPrincipalName')):
+                email = requested.get((address or '').lower())
+                if email:
+                    found.setdefault(email, user)
+    return found
+
+def get_user_info(token, email):
+    headers = {
+        'Authorization': f'Bearer {token}',
+        'Content-Type': 'application/json',
+    }
+    response = graph_request('GET', f'{GRAPH_URL}/users/{email}', headers = headers)
+    user_data = response.json()
+    return user_data
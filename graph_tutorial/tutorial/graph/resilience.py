@@ -0,0 +1,138 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""
+Deadlines and circuit breakers for Graph calls (used by core.graph_request).
+
+An operation sets a time budget with `deadline(seconds)`; every Graph call
+inside it, including prefetch threads that copy the context, derives its
+connect/read timeouts from what is left and fails with DeadlineExceeded
+once the budget is spent. Nested deadlines can only shorten the budget.
+
+Each endpoint family (chats, users, sites, calendarView...) has a circuit
+breaker. After GRAPH_BREAKER_THRESHOLD consecutive failures (connection
+errors, timeouts, 5xx, 429 after retries) calls to the family fail
+immediately with CircuitOpen for GRAPH_BREAKER_COOLDOWN seconds, then a
+single trial call decides whether it closes again.
+"""
+
+import contextvars
+import functools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+import requests
+from django.conf import settings
+from tutorial import metrics
+
+logger = logging.getLogger(__name__)
+
+class GraphUnavailable(requests.exceptions.RequestException):
+    """Graph was not called or did not answer in time; nothing was sent or received."""
+
+class DeadlineExceeded(GraphUnavailable, requests.exceptions.Timeout):
+    """The operation's time budget ran out."""
+
+class CircuitOpen(GraphUnavailable):
+    """Graph is failing for this endpoint family, the call was not attempted."""
+
+# absolute time.monotonic() the current operation must finish by
+_deadline = contextvars.ContextVar('graph_deadline', default=None)
+
+@contextmanager
+def deadline(seconds):
+    """Run the block with at most `seconds` for its Graph calls."""
+    until = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(until if current is None else min(current, until))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+def with_deadline(seconds):
+    """Decorator form of deadline(); `seconds` may be a settings name."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            budget = getattr(settings, seconds) if isinstance(seconds, str) else seconds
+            with deadline(budget):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def remaining():
+    """Seconds left in the current deadline, None without one."""
+    until = _deadline.get()
+    return None if until is None else until - time.monotonic()
+
+def timeouts(url):
+    """(connect, read) timeouts for the next call, raising DeadlineExceeded when none is left."""
+    connect, read = settings.GRAPH_CONNECT_TIMEOUT, settings.GRAPH_READ_TIMEOUT
+    left = remaining()
+    if left is None:
+        return connect, read
+    if left <= 0:
+        metrics.record_deadline(url)
+        raise DeadlineExceeded(f"Deadline exceeded before calling {metrics.endpoint_template(url)}")
+    return min(connect, left), min(read, left)
+
+def family(url):
+    """
+    Endpoint family a breaker covers: the resource under /me or /users/{id},
+    otherwise the first path segment (/chats/{id}/messages -> chats).
+    """
+    segments = metrics.endpoint_template(url).strip('/').split('/')
+    if segments[0] == 'me' and len(segments) > 1:
+        return segments[1].lower()
+    if segments[0] == 'users' and len(segments) > 2:
+        return segments[2].lower()
+    return segments[0].lower()
+
+class CircuitBreaker:
+    def __init__(self, name):
+        self.name = name
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Raise CircuitOpen unless a call may go out now."""
+        with self._lock:
+            if self.opened_at is None:
+                return
+            if time.monotonic() - self.opened_at < settings.GRAPH_BREAKER_COOLDOWN or self.trial:
+                raise CircuitOpen(f"Graph {self.name} endpoints are failing, retry in a moment")
+            # half open: this call is the trial
+            self.trial = True
+
+    def record(self, ok):
+        """Count the outcome of a call let through by before_call()."""
+        with self._lock:
+            if ok:
+                if self.opened_at is not None:
+                    logger.warning("Circuit for Graph %s closed", self.name)
+                self.failures, self.opened_at, self.trial = 0, None, False
+                return
+            self.failures += 1
+            # a failed trial reopens; calls that started before opening don't extend it
+            if self.trial or (self.opened_at is None and self.failures >= settings.GRAPH_BREAKER_THRESHOLD):
+                logger.warning("Circuit for Graph %s opened after %d failures", self.name, self.failures)
+                metrics.record_circuit_open(self.name)
+                self.opened_at, self.trial = time.monotonic(), False
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+def breaker(url):
+    name = family(url)
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name)
+        return _breakers[name]
+
+def is_failure(status):
+    # Graph degradation, not the caller's mistake (404, 403...)
+    return status == 'error' or status == 429 or status >= 500
@@ -0,0 +1,415 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""
+SharePoint workbook automation. pandas, openpyxl and bs4 are imported
+inside the methods that use them, so importing this module stays cheap.
+"""
+
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone as django_timezone
+from urllib.parse import quote
+from io import BytesIO
+from collections import defaultdict
+from tutorial.models import TaskNotification, DeletedTaskNotification
+from tutorial import metrics
+from tutorial.graph.core import graph_request
+from tutorial.graph.teams import GraphTeamsClient, compact_message
+
+logger = logging.getLogger(__name__)
+
+# sharepoint automation
+# 一份excel 實例一個
+class GraphSharePointClient(GraphTeamsClient):
+    def __init__(self, access_token, path="Feature to do list+Q&A/[19.10] Mx Feature_to do list+ Q&A.xlsx", site_name="NebulaP8group", drive_name="ScrumSprints", domain="unizyx.sharepoint.com", config=None):
+        super().__init__(access_token)
+        # SharePointClientConfig owning this workbook's notifications
+        self.config = config
+        self.path = quote(path)
+        self.domain = domain
+        self.site_name = site_name
+        self.drive_name = drive_name
+        self.site_id = self._get_site_id()
+        self.list_id = self._get_list_id()
+        self.drive_id = self._get_drive_id()
+        self.model = TaskNotification
+        # Called before every write; WorkbookRunner sets it to its lease check
+        # so a worker that lost the workbook stops writing (see WorkbookLease)
+        self.fence = None
+
+        self._rules = None
+
+    @property
+    def rules(self):
+        # 通知條件: the workbook's own rules, or the SHEET_RULES default (see sheet_rules)
+        if self._rules is None:
+            from tutorial import sheet_rules
+            config = self.config
+            self._rules = sheet_rules.compile_rules(
+                config.rules if config is not None and config.rules else settings.SHEET_RULES)
+        return self._rules
+
+    def notifications(self):
+        """TaskNotification rows of this workbook only."""
+        return self.model.objects.filter(config=self.config)
+
+    def _check_fence(self):
+        if self.fence is not None:
+            self.fence()
+
+    def _get(self, url):
+        res = graph_request('GET', url, headers=self.headers)
+        if res.status_code != 200:
+            raise Exception(f"GET failed: {res.status_code} {res.text}")
+        return res.json()
+
+    def _patch(self, url, json_payload):
+        res = graph_request('PATCH', url, headers=self.headers, json=json_payload)
+        if res.status_code != 200:
+            raise Exception(f"PATCH failed: {res.status_code} {res.text}")
+        return res.json()
+
+    def _get_site_id(self):
+        url = f"{self.graph_url}/sites/{self.domain}:/sites/{self.site_name}"
+        self.site_id = self._get(url).get("id")
+        return self.site_id
+
+    def _get_drive_id(self):
+        url = f"{self.graph_url}/sites/{self._get_site_id()}/drives"
+        for drive in self._get(url)["value"]:
+            if drive["name"] == self.drive_name:
+                self._drive_id = drive["id"]
+                return self._drive_id
+        raise Exception(f"Drive {self.drive_name} not found")
+    
+    def _get_list_id(self, drive_name="ScrumSprints"):
+        url = f"{self.graph_url}/sites/{self._get_site_id()}/lists"
+        for lst in self._get(url)["value"]:
+            if lst["displayName"] == drive_name:
+                self._list_id = lst.get("id")
+                return self._list_id
+        raise Exception(f"List with name '{drive_name}' not found")
+
+    # for download file usage
+    def _build_drive_url(self):
+        return f"{self.graph_url}/sites/{self.site_id}/drives/{self.drive_id}/root:/{self.path}"
+
+    # for write file usage
+    def _build_list_url(self):
+        return f"{self.graph_url}/sites/{self.site_id}/lists/{self.list_id}/drive/root:/{self.path}"
+    
+    def _build_excel_range_url(self, sheet, address):
+        return f"{self._build_list_url()}:/workbook/worksheets('{sheet}')/range(address='{address}')"
+    
+    # return a dict with sheet name as key and DataFrame as value
+    def _download_excel_as_df(self, sheet_name=None, file_type="xlsx"):
+        import pandas as pd
+        url = f"{self._build_drive_url()}:/content"
+        res = graph_request('GET', url, headers=self.headers)
+        if res.status_code != 200:
+            raise Exception(f"Download failed: {res.status_code} {res.text}")
+        if file_type == "csv":
+            return pd.read_csv(BytesIO(res.content), sheet_name)
+        elif file_type in ["xls", "xlsx"]:
+            return pd.read_excel(BytesIO(res.content), sheet_name)
+        else:
+            raise ValueError("Unsupported file type")
+
+    def _get_file_size(self):
+        # driveItem metadata only, not the content
+        return self._get(f"{self._build_drive_url()}?$select=size").get("size", 0)
+
+    def _build_worksheet_url(self, sheet):
+        return f"{self._build_list_url()}:/workbook/worksheets('{sheet}')"
+
+    def _list_worksheets(self):
+        url = f"{self._build_list_url()}:/workbook/worksheets?$select=name"
+        return [sheet["name"] for sheet in self._get(url)["value"]]
+
+    def _read_sheet_by_ranges(self, sheet_name):
+        """
+        Read one worksheet through the workbook API, WORKBOOK_RANGE_CHUNK_ROWS
+        rows per request, into the same DataFrame shape pd.read_excel gives
+        (first row as header). Cells are read as their displayed text.
+        """
+        import pandas as pd
+        from openpyxl.utils.cell import coordinate_from_string
+        worksheet_url = self._build_worksheet_url(sheet_name)
+        used = self._get(f"{worksheet_url}/usedRange(valuesOnly=true)?$select=address")
+        # e.g. "automation_test!A1:Q20001", always read from A1 so cell addresses line up
+        last_col, last_row = coordinate_from_string(used["address"].split("!")[-1].split(":")[-1])
+
+        rows = []
+        chunk = settings.WORKBOOK_RANGE_CHUNK_ROWS
+        for first in range(1, last_row + 1, chunk):
+            last = min(first + chunk - 1, last_row)
+            rows.extend(self._get(f"{worksheet_url}/range(address='A{first}:{last_col}{last}')?$select=text")["text"])
+
+        if not rows:
+            return pd.DataFrame()
+        df = pd.DataFrame(rows[1:], columns=rows[0])
+        # Empty cells come back as "", read_excel gives NaN
+        return df.mask(df.eq(""))
+
+    def _read_sheets(self, sheet_name=None):
+        """
+        Sheet(s) as DataFrames, like _download_excel_as_df. Workbooks larger
+        than WORKBOOK_RANGE_THRESHOLD bytes are read range by range instead
+        of downloading the whole file.
+        """
+        if self._get_file_size() < settings.WORKBOOK_RANGE_THRESHOLD:
+            return self._download_excel_as_df(sheet_name=sheet_name)
+        if sheet_name is not None:
+            return self._read_sheet_by_ranges(sheet_name)
+        return {name: self._read_sheet_by_ranges(name) for name in self._list_worksheets()}
+
+    def _write_cell(self, uuid, values):
+        # The PATCH runs in a job worker, which also marks the task replied
+        from tutorial.tasks import enqueue_write_cell
+        task = self.model.objects.only('uuid', 'sheet_name', 'field_address').get(uuid=uuid)
+        url = self._build_excel_range_url(task.sheet_name, task.field_address)
+        self._check_fence()
+        enqueue_write_cell(self.auth, task, url, values)
+        logger.info("Queued update of %s!%s", task.sheet_name, task.field_address)
+    
+    def _create_notify_item(self, context: dict, reason: str, field: str):
+        from tutorial.tasks import enqueue_send_notification
+        user_info = self.get_user_info(context['owner'])
+        # 發送 Teams 通知 (sent by a job worker, which appends the msg_id)
+        payload = self._create_mention_message_payload(
+            context,
+            reason
+        )
+        chat_id = self.get_chat_id_by_name(context["teams_group_name"])
+
+        # 查詢條件
+        lookup = {
+            "config": self.config,
+            "sheet_name": context["sheet_name"],
+            "row": context["row_idx"],
+            "reason": reason
+        }
+
+        # 預設欄位（建新時使用）
+        defaults = {
+            "task": context["task"],
+            "owner_id": user_info["id"],
+            "owner_email": context["owner"],
+            "owner_name": user_info["displayName"],
+            "teams_group_id": chat_id,
+            "teams_group_name": context["teams_group_name"],
+            "field_address": field,
+        }
+
+        self._check_fence()
+        obj, created = self.model.objects.get_or_create(defaults=defaults, **lookup)
+
+        if not created:
+            # 同步更新其餘欄位, only saved (and updated_at bumped) when something changed
+            changed = [key for key, value in defaults.items() if getattr(obj, key) != value]
+            for key in changed:
+                setattr(obj, key, defaults[key])
+            if changed:
+                obj.save(update_fields=changed + ['updated_at'])
+
+        # Answered tasks keep their reply, no need to ask again
+        if not obj.replied:
+            enqueue_send_notification(self.auth, obj, chat_id, payload)
+        return obj.pk
+
+
+    def _process_sheet(self, df, sheet_name):
+        """Upsert the sheet's notifications; returns the ids of those still matching."""
+        from openpyxl.utils import get_column_letter
+        from tutorial import sheet_rules
+        # 一個條件一則通知, all rules evaluated in one pass over the sheet
+        columns, matches = sheet_rules.evaluate(df, self.rules)
+        kept = []
+        for row_idx, reason, reply_col in matches:
+            row = df.iloc[row_idx]
+            context = {
+                "sheet_name": sheet_name,
+                "row_idx": row_idx,
+                "task": row.iloc[columns["Task"]],
+                "owner": row.iloc[columns["Owner"]],
+                "teams_group_name": row.iloc[columns["teams_group_name"]],
+            }
+            col = get_column_letter(reply_col + 1)
+            kept.append(self._create_notify_item(
+                context,
+                reason=reason,
+                field=f"{col}{row_idx + 2}"
+            ))
+        return kept
+
+    def _create_mention_message_payload(self, context, reason):
+        """
+        Create a message payload with a mention for a specific user.
+
+        Args:
+            context (dict): Includes 'owner', 'sheet_name', 'task', etc.
+            reason (str): The reason for the message.
+
+        Returns:
+            dict: The payload for sending the message.
+        """
+        user_info = self.get_user_info(context['owner'])
+
+        # Construct the mention object
+        mention = {
+            "id": 0,  # Must match <at id="0"> in content
+            "mentionText": user_info['displayName'],
+            "mentioned": {
+                "user": {
+                    "id": user_info['id'],
+                    "displayName": user_info['displayName']
+                }
+            }
+        }
+
+        # Construct the message payload
+        payload = {
+            "body": {
+                "contentType": "html",
+                "content": (
+                    f"<div>"
+                    f"<p>👋 <at id=\"0\">{user_info['displayName']}</at>, please reply to this message.</p>"
+                    f"<p>💬 <i>(Your reply will be automatically recorded to SharePoint)</i></p>"
+                    f"<p>📄 <b>Sheet:</b> {context.get('sheet_name', 'N/A')}</p>"
+                    f"<p>📝 <b>Task:</b> {context.get('task', 'N/A')}</p>"
+                    f"<p>⚠️ <b>Reason:</b> {reason}</p>"
+                    f"</div>"
+                )
+            },
+            "mentions": [mention]
+        }
+
+        return payload
+
+
+
+    def _reply_index(self, messages, wanted=None):
+        """
+        Index the replies among ChatMessage records as
+        {(sender id, referenced message id): message}, limited to the keys in
+        `wanted` when given. The first reply in the listing (the newest) wins.
+        """
+        replies = {}
+        for message in messages:
+            if message.content_type != "messageReference":
+                continue
+            key = (message.sender_id, message.reference_id)
+            if wanted is None or key in wanted:
+                replies.setdefault(key, message)
+        return replies
+
+    def _reply_text(self, message):
+        from bs4 import BeautifulSoup
+        soup = BeautifulSoup(message.body or "", "html.parser")
+        return soup.get_text(separator=' ', strip=True)
+
+    def ingest_message(self, chat_id, message):
+        """
+        Match one incoming chat message against the unreplied notifications
+        of the chat and write the reply back to SharePoint.
+
+        Returns:
+            bool: True if the message answered a tracked notification.
+        """
+        replies = self._reply_index([compact_message(message)])
+        if not replies:
+            return False
+        items = (self.notifications()
+                 .filter(teams_group_id=chat_id, replied=False)
+                 .values('uuid', 'owner_id', 'msg_id', 'task'))
+        for item in items:
+            for mid in item['msg_id']:
+                reply = replies.get((item['owner_id'], mid))
+                content = reply and self._reply_text(reply)
+                if content:
+                    self._write_cell(item['uuid'], content)
+                    logger.info("Replied content written for task %s", item['task'])
+                    return True
+        return False
+
+    # routine
+    def scan_routine(self, sheet_name="automation_test"):
+        """
+        Process the specified sheet or all sheets in the Excel file and store the results in the database.
+        inform task owner on temas
+        Args:
+            sheet_name (str or None): The name of the sheet to process. If None, all sheets will be processed.
+        Returns:
+            None
+        """
+        with metrics.span('scan_routine', drive=self.drive_name, path=self.path, sheet=sheet_name):
+            # 每次都重新抓取最新資料: rows still matching are updated in place
+            # (keeping their messages and replies), the others are removed
+            sheets = self._read_sheets(sheet_name=sheet_name)
+
+            if sheet_name is not None:
+                # 處理單一工作表
+                kept = self._process_sheet(sheets, sheet_name)
+            else:
+                # 處理多個工作表
+                kept = []
+                for name, df in sheets.items():
+                    kept.extend(self._process_sheet(df, name))
+            self._delete_notifications(kept, sheet_name)
+
+    def _delete_notifications(self, keep=(), sheet_name=None):
+        """Remove the notifications (of `sheet_name`, or all sheets) whose ids are not in `keep`."""
+        keep = set(keep)
+        scanned = self.notifications()
+        if sheet_name is not None:
+            scanned = scanned.filter(sheet_name=sheet_name)
+        gone = [pk for pk in scanned.values_list('id', flat=True).iterator() if pk not in keep]
+        self._check_fence()
+        # Leave tombstones so dashboard change feeds learn about the removal
+        now = django_timezone.now()
+        DeletedTaskNotification.objects.bulk_create(
+            [DeletedTaskNotification(notification_id=pk, config=self.config, deleted_at=now) for pk in gone],
+            batch_size=1000)
+        for start in range(0, len(gone), 1000):
+            self.model.objects.filter(id__in=gone[start:start + 1000]).delete()
+        DeletedTaskNotification.objects.filter(
+            deleted_at__lt=now - timedelta(seconds=settings.DASHBOARD_FEED_RETENTION)).delete()
+
+    # polling
+    def polling_task_pool(self):
+        with metrics.span('polling_task_pool', drive=self.drive_name, path=self.path):
+            # 1. Load the unreplied records of this workbook
+            notifications = (self.notifications()
+                             .filter(replied=False)
+                             .values('uuid', 'owner_id', 'msg_id', 'task', 'teams_group_id'))
+
+            # 2. Group by chat_id
+            chat_groups = defaultdict(list)
+            # 將每個 item 的完整資訊加入對應的 chat_groups
+            for item in notifications:
+                chat_groups[item.pop('teams_group_id')].append(item)
+
+            # 3. Iterate each chat group and read its messages once, keeping only the replies
+            for chat_id, items in chat_groups.items():
+                wanted = {(item['owner_id'], mid) for item in items for mid in item['msg_id']}
+                try:
+                    replies = self._reply_index(self.list_msg_in_chats(chat_id), wanted)
+                except Exception as e:
+                    logger.warning("Failed to fetch messages for chat %s: %s", chat_id, e)
+                    continue
+
+                # 4. Look up the reply of each owner to each message we sent
+                for item in items:
+                    try:
+                        user_id = item['owner_id']
+                        for mid in item['msg_id']:
+                            reply = replies.get((user_id, mid))
+                            content = reply and self._reply_text(reply)
+                            if content:
+                                self._write_cell(item['uuid'], content)
+                                logger.info("Replied content written for task %s", item['task'])
+                                break  # only process first found reply
+                    except Exception as e:
+                        logger.exception("Error processing task %s: %s", item['task'], e)
@@ -0,0 +1,327 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""Teams chats, meeting cards and GraphTeamsClient."""
+
+import json
+import logging
+from collections import namedtuple
+from typing import TYPE_CHECKING
+from tutorial.graph.core import GRAPH_URL, GraphPages, graph_request
+from tutorial.tokens import as_provider
+if TYPE_CHECKING:
+    from tutorial.models import AutoScheduleMeeting
+
+logger = logging.getLogger(__name__)
+
+# Largest $top Graph accepts on /chats and /chats/{id}/messages
+CHATS_PAGE_SIZE = 50
+MESSAGES_PAGE_SIZE = 50
+
+# The part of a chatMessage that reply matching reads. body is only kept for
+# replies (messageReference attachments), other messages are never parsed.
+ChatMessage = namedtuple('ChatMessage', 'id sender_id reference_id content_type body')
+
+def compact_message(message):
+    """Reduce a chatMessage dict to a ChatMessage."""
+    attachments = message.get('attachments') or []
+    attachment = attachments[0] if attachments else {}
+    content_type = attachment.get('contentType')
+    sender = (message.get('from') or {}).get('user') or {}
+    body = (message.get('body') or {}).get('content') if content_type == 'messageReference' else None
+    return ChatMessage(message.get('id'), sender.get('id'), attachment.get('id'), content_type, body)
+
+def get_all_chats(token):
+    headers = {
+        "Authorization": f"Bearer {token}",
+        "Content-Type": "application/json"
+    }
+    return list(GraphPages(f"{GRAPH_URL}/me/chats", headers, top=CHATS_PAGE_SIZE, what='chats'))
+
+# 一次找全部
+def get_chat_ids(token, user_ids):
+    """
+    Return the oneOnOne chat id shared with each user id (None if there is none).
+
+    Chats are walked once with their members expanded, so the cost does not
+    grow with the number of users looked up.
+    """
+    headers = {
+        'Authorization': f'Bearer {token}',
+        'Content-Type': 'application/json',
+    }
+
+    chat_by_user = {}
+    fetched = False
+    chats = GraphPages(f"{GRAPH_URL}/me/chats", headers, params={'$expand': 'members'},
+                       top=CHATS_PAGE_SIZE, what='chats')
+    for chat in chats:
+        fetched = True
+        if chat.get("chatType") != "oneOnOne":
+            continue
+        for member in chat.get('members', []):
+            # keep the first chat found for a user, like the old lookup
+            chat_by_user.setdefault(member.get('userId'), chat.get('id'))
+
+    if not fetched:
+        raise Exception(f"Failed to get chats")
+
+    return [chat_by_user.get(user_id) for user_id in user_ids]
+
+def create_card_payload(subject, start_time, end_time, tenant_id, uuid, base_response_url='http:/localhost/webhook/response/'):
+    card = {
+        "type": "AdaptiveCard",
+        "version": "1.4",
+        "body": [
+            {
+                "type": "TextBlock",
+                "text": f"📢 會議邀請: {subject}",
+                "weight": "Bolder",
+                "size": "Medium"
+            },
+            {
+                "type": "TextBlock",
+                "text": f"🕒 時間: {start_time} ~ {end_time}"
+            }
+        ],
+        "actions": [
+            {
+                "type": "Action.OpenUrl",
+                "title": "✅ 參加",
+                "url": f"{base_response_url}?tenantId={tenant_id}&uuid={str(uuid)}&response=accepted"
+            },
+            {
+                "type": "Action.OpenUrl",
+                "title": "❌ 不參加",
+                "url": f"{base_response_url}?tenantId={tenant_id}&uuid={str(uuid)}&response=declined"
+            }
+        ]
+    }
+
+    return _card_message(card)
+
+def create_vote_card_payload(subject, slots, tenant_id, uuid, base_response_url='http:/localhost/webhook/response/'):
+    """
+    Card offering several candidate times at once. The vote button opens a
+    page where the attendee ticks every time that works.
+    `slots` are (candidate index, {'start', 'end'}) pairs.
+    """
+    response_url = f"{base_response_url}?tenantId={tenant_id}&uuid={str(uuid)}"
+    card = {
+        "type": "AdaptiveCard",
+        "version": "1.4",
+        "body": [
+            {
+                "type": "TextBlock",
+                "text": f"📢 會議邀請: {subject}",
+                "weight": "Bolder",
+                "size": "Medium"
+            }
+        ] + [
+            {
+                "type": "TextBlock",
+                "text": f"🕒 時間 {number}: {slot['start']} ~ {slot['end']}"
+            }
+            for number, (_, slot) in enumerate(slots, 1)
+        ],
+        "actions": [
+            {
+                "type": "Action.OpenUrl",
+                "title": "🗳️ 選擇可以的時間",
+                "url": f"{response_url}&response=vote"
+            },
+            {
+                "type": "Action.OpenUrl",
+                "title": "❌ 都不行",
+                "url": f"{response_url}&response=declined"
+            }
+        ]
+    }
+    return _card_message(card)
+
+def _card_message(card):
+    return {
+        "body": {
+            "contentType": "html",
+            "content": "This message was sent automatically by the Microsoft Automation Tool. <attachment id=\"1\"></attachment>"
+        },
+        "attachments": [
+            {
+                "id": "1",
+                "contentType": "application/vnd.microsoft.card.adaptive",
+                "content": json.dumps(card)
+            }
+        ]
+    }
+
+
+def send_meeting_card(token, meeting: 'AutoScheduleMeeting', email):
+    """
+    Send the current candidate time (the offered times when voting) of the
+    meeting to one attendee's chat.
+    Raises if the attendee has no chat or Graph rejects the message.
+    """
+    headers = {
+        'Authorization': f'Bearer {token}',
+        'Content-Type': 'application/json',
+    }
+    data = meeting.get_attendee_responses()[email]
+    chat_id = data.get('chat_id')
+    if not chat_id:
+        raise ValueError(f"No chat_id for {email}")
+
+    base_response_url = "https://c84b-60-248-185-20.ngrok-free.app/webhook/response/"
+    if meeting.vote_slots:
+        card_payload = create_vote_card_payload(
+            subject=meeting.title,
+            slots=meeting.get_offered_times(),
+            tenant_id=data.get('tenant_id'),
+            uuid=meeting.uuid,
+            base_response_url=base_response_url
+        )
+    else:
+        candidate = meeting.get_candidate_time()
+        card_payload = create_card_payload(
+            subject=meeting.title,
+            start_time=candidate['start'],
+            end_time=candidate['end'],
+            tenant_id=data.get('tenant_id'),
+            uuid = meeting.uuid,
+            base_response_url=base_response_url
+        )
+
+    url = f"{GRAPH_URL}/chats/{chat_id}/messages"
+    response = graph_request('POST', url, headers=headers, json=card_payload)
+    if response.status_code >= 300:
+        raise Exception(f"Failed to send card to {email} (chat_id: {chat_id}): {response.status_code} - {response.text}")
+    logger.info("Card sent to %s", email)
+
+
+def inform_attendees(token, meeting: 'AutoScheduleMeeting'):
+    for email, data in meeting.get_attendee_responses().items():
+        if not data.get('chat_id'):
+            logger.warning("No chat_id for %s, skipping", email)
+            continue
+        try:
+            send_meeting_card(token, meeting, email)
+        except Exception as e:
+            logger.error("%s", e)
+
+class GraphTeamsClient:
+    def __init__(self, access_token):
+        # A raw token or a tutorial.tokens.TokenProvider, which long running
+        # clients need so their token is renewed
+        self.auth = as_provider(access_token)
+        self.graph_url = GRAPH_URL
+        self.user_info = self.__get_user_info__()      
+        # cached
+        self._user_info_cache = {} 
+        self._chat_id_cache = {}
+
+    @property
+    def token(self):
+        return self.auth.token()
+
+    @property
+    def headers(self):
+        return {
+            'Authorization': f'Bearer {self.token}',
+            'Content-Type': 'application/json',
+        }
+
+    def __get_user_info__(self):
+        user = graph_request('GET', f'{self.graph_url}/me', headers=self.headers)
+        return user.json()
+
+    def get_user_info(self, email):
+        """
+        Given a user email, return the user ID. Uses caching to avoid redundant API calls.
+        """
+        if email in self._user_info_cache:
+            # Return cached user info if available
+            return self._user_info_cache[email]
+
+        url = f"{GRAPH_URL}/users/{email}"
+        response = graph_request('GET', url, headers=self.headers)
+        if response.status_code != 200:
+            raise Exception(f"Failed to get user ID: {response.status_code} {response.text}")
+
+        user_data = response.json()
+        # Cache the user info
+        self._user_info_cache[email] = user_data
+        return user_data
+
+    def get_chat_id_by_name(self, chat_name):
+            """
+            Given a chat name, return the chat ID. Uses caching to avoid redundant API calls.
+            """
+            # Check if the chat ID is already cached
+            if chat_name in self._chat_id_cache:
+                return self._chat_id_cache[chat_name]
+
+            # Returning from the loop stops the walk; without prefetch no page
+            # past the one holding the chat is requested
+            chats = GraphPages(f"{GRAPH_URL}/me/chats", self.headers, top=CHATS_PAGE_SIZE,
+                               what='chats', prefetch=False)
+            for chat in chats:
+                if chat.get("topic") == chat_name:
+                    chat_id = chat.get("id")
+                    # Cache the chat ID
+                    self._chat_id_cache[chat_name] = chat_id
+                    return chat_id
+
+            raise Exception(f"Chat with name '{chat_name}' not found")
+
+    def send_message_to_chat(self, chat_id, message_payload):
+        """
+        Send a message to a specific chat.
+        """
+        url = f"{GRAPH_URL}/chats/{chat_id}/messages"
+        response = graph_request('POST', url, headers=self.headers, json=message_payload)
+        if response.status_code >= 300:
+            raise Exception(f"Failed to send message: {response.status_code} {response.text}")
+        return response.json()['id']
+    # for scrum usage
+    def list_msg_in_chats(self, chat_id, max_pages=None):
+        """
+        Yield the messages of a chat as ChatMessage records, at most
+        max_pages pages of them. Each page is reduced as it arrives, so the
+        full message objects never pile up.
+
+        The chat messages API does not support $select, the whole objects
+        are downloaded either way.
+        """
+        url = f"{GRAPH_URL}/chats/{chat_id}/messages"
+        for message in GraphPages(url, self.headers, top=MESSAGES_PAGE_SIZE, max_pages=max_pages, what='messages'):
+            yield compact_message(message)
+
+    def get_message(self, chat_id, message_id):
+        """
+        Fetch a single message of a chat.
+        """
+        url = f"{GRAPH_URL}/chats/{chat_id}/messages/{message_id}"
+        response = graph_request('GET', url, headers=self.headers)
+        if response.status_code != 200:
+            raise Exception(f"Failed to fetch message: {response.status_code} {response.text}")
+        return response.json()
+
+    # change notifications
+    def create_subscription(self, resource, notification_url, expiration, client_state, change_type="created"):
+        payload = {
+            "changeType": change_type,
+            "notificationUrl": notification_url,
+            "resource": resource,
+            "expirationDateTime": expiration.isoformat(),
+            "clientState": client_state,
+        }
+        response = graph_request('POST', f"{GRAPH_URL}/subscriptions", headers=self.headers, json=payload)
+        if response.status_code != 201:
+            raise Exception(f"Failed to create subscription: {response.status_code} {response.text}")
+        return response.json()
+
+    def renew_subscription(self, subscription_id, expiration):
+        payload = {"expirationDateTime": expiration.isoformat()}
+        response = graph_request('PATCH', f"{GRAPH_URL}/subscriptions/{subscription_id}", headers=self.headers, json=payload)
+        if response.status_code != 200:
+            raise Exception(f"Failed to renew subscription: {response.status_code} {response.text}")
+        return response.json()
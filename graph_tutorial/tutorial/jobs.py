@@ -0,0 +1,229 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""
+Durable job queue stored in the Job table (no external broker).
+
+Producers call enqueue(); workers started by `manage.py run_jobs` claim
+jobs with a conditional UPDATE, so any number of worker processes can share
+the table on SQLite or Postgres. A running job's lease is renewed by a
+heartbeat; the outcome is only written while the worker still holds it.
+Failed jobs are retried with exponential backoff and moved to the 'dead'
+status after max_attempts.
+"""
+
+import logging
+import random
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Exists, F, OuterRef
+from django.utils import timezone
+from tutorial import call_budget, metrics
+from tutorial.graph.resilience import deadline
+from tutorial.models import Job
+from tutorial.tokens import TOKEN_PAYLOAD_KEYS
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = {}
+
+# Jobs an idempotency key is deduplicated against
+LIVE_STATUSES = ('queued', 'running')
+
+def job_handler(kind):
+    """Register the function that runs jobs of `kind`; it receives the payload dict."""
+    def register(func):
+        HANDLERS[kind] = func
+        return func
+    return register
+
+def enqueue(kind, payload, priority=0, idempotency_key=None, max_attempts=5, delay=0):
+    """
+    Queue a job. When a queued or running job with the same idempotency_key
+    exists it is returned instead and nothing new is queued; once that job
+    is done or dead the key can be queued again.
+    """
+    live = Job.objects.filter(idempotency_key=idempotency_key, status__in=LIVE_STATUSES)
+    if idempotency_key:
+        existing = live.first()
+        if existing:
+            return existing
+
+    try:
+        with transaction.atomic():
+            job = Job.objects.create(
+                kind=kind,
+                payload=payload,
+                priority=priority,
+                idempotency_key=idempotency_key,
+                max_attempts=max_attempts,
+                run_at=timezone.now() + timedelta(seconds=delay))
+    except IntegrityError:
+        # Lost the race against another producer with the same key
+        return live.get()
+
+    if settings.JOB_QUEUE_EAGER:
+        _run_eagerly(job)
+    return job
+
+def enqueue_many(kind, payloads, priority=0, max_attempts=5):
+    """
+    Queue one job per {idempotency_key: payload} item with one lookup and
+    one insert, skipping the keys enqueue() would deduplicate.
+
+    Returns:
+        int: number of jobs queued.
+    """
+    if not payloads:
+        return 0
+    live = set(Job.objects.filter(idempotency_key__in=list(payloads), status__in=LIVE_STATUSES)
+               .values_list('idempotency_key', flat=True))
+    now = timezone.now()
+    new = [Job(kind=kind, payload=payload, priority=priority, idempotency_key=key,
+               max_attempts=max_attempts, run_at=now)
+           for key, payload in payloads.items() if key not in live]
+    # Keys another producer queued meanwhile are left to its job
+    Job.objects.bulk_create(new, ignore_conflicts=True)
+
+    if settings.JOB_QUEUE_EAGER:
+        for job in Job.objects.filter(idempotency_key__in=[job.idempotency_key for job in new], status='queued'):
+            _run_eagerly(job)
+    return len(new)
+
+def _run_eagerly(job):
+    # Run in-process right away, failures stay queued for a worker
+    if Job.objects.filter(pk=job.pk, status='queued').update(status='running', locked_by='eager',
+                                                             locked_at=timezone.now(), attempts=1):
+        job.status, job.locked_by, job.attempts = 'running', 'eager', 1
+        run_job(job)
+
+def _requeue_stale(now):
+    # Jobs whose worker stopped heartbeating become claimable again
+    Job.objects.filter(
+        status='running',
+        locked_at__lt=now - timedelta(seconds=settings.JOB_LEASE_TIMEOUT)
+    ).update(status='queued', locked_by='', locked_at=None)
+
+def claim(worker_id, batch=10):
+    """Atomically take the next runnable job for this worker, or None."""
+    now = timezone.now()
+    _requeue_stale(now)
+    candidates = (Job.objects
+                  .filter(status='queued', run_at__lte=now)
+                  .order_by('-priority', 'run_at', 'id')
+                  .values_list('id', flat=True)[:batch])
+    for job_id in candidates:
+        taken = Job.objects.filter(pk=job_id, status='queued').update(
+            status='running', locked_by=worker_id, locked_at=now, attempts=F('attempts') + 1)
+        if taken:
+            return Job.objects.get(pk=job_id)
+    return None
+
+def _backoff(attempts):
+    base = settings.JOB_RETRY_BACKOFF * (2 ** (attempts - 1))
+    return min(base, 3600) * random.uniform(0.8, 1.2)
+
+def _without_token(payload):
+    # Access tokens are only kept while the job may still run
+    return {key: value for key, value in payload.items() if key not in TOKEN_PAYLOAD_KEYS}
+
+def _leased(job):
+    # The job's row, as long as the worker that claimed it still holds the lease
+    return Job.objects.filter(pk=job.pk, status='running', locked_by=job.locked_by)
+
+@contextmanager
+def _heartbeat(job):
+    """Renew the job's lease every JOB_LEASE_TIMEOUT / 3 seconds while its handler runs."""
+    stop = threading.Event()
+
+    def beat():
+        try:
+            while not stop.wait(settings.JOB_LEASE_TIMEOUT / 3):
+                if not _leased(job).update(locked_at=timezone.now()):
+                    logger.warning("Job %s (%s) lost its lease while running", job.id, job.kind)
+                    return
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=beat, name=f'job-{job.id}-heartbeat', daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+def _finish(job, **fields):
+    if _leased(job).update(locked_by='', locked_at=None, updated_at=timezone.now(), **fields):
+        return True
+    # Taken over as stale meanwhile, the new owner records its own outcome
+    logger.warning("Job %s (%s) lost its lease, dropping the outcome of attempt %s", job.id, job.kind, job.attempts)
+    return False
+
+def run_job(job):
+    """
+    Run a claimed job and record the outcome. Returns True on success, False
+    when the job failed or its lease was lost before the outcome was written.
+    """
+    handler = HANDLERS.get(job.kind)
+    try:
+        if handler is None:
+            raise LookupError(f"No handler registered for job kind '{job.kind}'")
+        # Give up on Graph well before the lease would run out should the heartbeat stall
+        with _heartbeat(job), \
+                deadline(settings.JOB_LEASE_TIMEOUT / 2), \
+                metrics.span(f'job:{job.kind}', job_id=job.id, attempt=job.attempts), \
+                call_budget.track(f'job:{job.kind}'):
+            handler(job.payload)
+    except Exception:
+        error = traceback.format_exc()
+        if job.attempts >= job.max_attempts:
+            if _finish(job, status='dead', last_error=error, payload=_without_token(job.payload)):
+                logger.error("Job %s (%s) is dead after %s attempts: %s", job.id, job.kind, job.attempts, error)
+        else:
+            delay = _backoff(max(job.attempts, 1))
+            if _finish(job, status='queued', last_error=error, run_at=timezone.now() + timedelta(seconds=delay)):
+                logger.warning("Job %s (%s) failed, retrying in %.0fs", job.id, job.kind, delay)
+        return False
+
+    return _finish(job, status='done', last_error='', payload=_without_token(job.payload))
+
+def work(worker_id, stop=None, idle_sleep=1.0, until_empty=False):
+    """
+    Claim and run jobs until `stop()` returns True, or until no runnable job
+    is left when until_empty is set.
+    """
+    # Handlers register themselves on import
+    import tutorial.tasks  # noqa: F401
+
+    processed = 0
+    while not (stop and stop()):
+        job = claim(worker_id)
+        if job is None:
+            if until_empty:
+                break
+            time.sleep(idle_sleep)
+            continue
+        run_job(job)
+        processed += 1
+    return processed
+
+def requeue_dead(kind=None):
+    """
+    Give dead jobs a fresh set of attempts, except those whose idempotency key
+    was queued again meanwhile.
+    """
+    requeued = Job.objects.filter(status__in=LIVE_STATUSES, idempotency_key__isnull=False)
+    # Of several dead jobs sharing a key only the latest one is queued
+    newer = Job.objects.filter(status='dead', idempotency_key=OuterRef('idempotency_key'), pk__gt=OuterRef('pk'))
+    dead = (Job.objects.filter(status='dead')
+            .exclude(idempotency_key__in=requeued.values('idempotency_key'))
+            .exclude(Exists(newer)))
+    if kind:
+        dead = dead.filter(kind=kind)
+    return dead.update(status='queued', attempts=0, run_at=timezone.now(), updated_at=timezone.now())
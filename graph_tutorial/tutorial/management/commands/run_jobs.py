@@ -0,0 +1,48 @@
+import multiprocessing
+import os
+import socket
+from django.core.management.base import BaseCommand
+from tutorial import jobs
+
+
+def _worker(worker_id):
+    # Spawned processes start without Django configured
+    import django
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'graph_tutorial.settings')
+    django.setup()
+    from tutorial import jobs as worker_jobs
+    worker_jobs.work(worker_id)
+
+
+class Command(BaseCommand):
+    help = "Work the job queue (Teams cards, meeting invites, workbook write-backs)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1, help='Number of worker processes')
+        parser.add_argument('--until-empty', action='store_true', help='Exit once no runnable job is left')
+        parser.add_argument('--requeue-dead', action='store_true', help='Queue dead jobs again and exit')
+        parser.add_argument('--kind', help='Only requeue dead jobs of this kind')
+
+    def handle(self, *args, **options):
+        if options['requeue_dead']:
+            count = jobs.requeue_dead(options['kind'])
+            self.stdout.write(f"{count} dead jobs queued again")
+            return
+
+        prefix = f"{socket.gethostname()}:{os.getpid()}"
+        if options['workers'] <= 1 or options['until_empty']:
+            processed = jobs.work(prefix, until_empty=options['until_empty'])
+            self.stdout.write(f"{processed} jobs processed")
+            return
+
+        context = multiprocessing.get_context('spawn')
+        processes = [context.Process(target=_worker, args=(f"{prefix}:{n}",), daemon=True)
+                     for n in range(options['workers'])]
+        for process in processes:
+            process.start()
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            for process in processes:
+                process.terminate()
@@ -0,0 +1,72 @@
+import multiprocessing
+import os
+import socket
+import time
+from django.core.management.base import BaseCommand, CommandError
+from tutorial.tokens import auth_payload, payload_provider, provider_for
+from tutorial.workbook_runner import WorkbookPool
+
+
+def _run_pool(auth, worker_id, sheet_name, tick, once=False):
+    pool = WorkbookPool(auth, worker_id, sheet_name)
+    try:
+        while True:
+            pool.tick()
+            if once:
+                return
+            time.sleep(tick)
+    finally:
+        # Hand the workbooks over right away instead of waiting for the leases to expire
+        pool.shutdown()
+
+
+def _worker(auth, worker_id, sheet_name, tick):
+    # Spawned processes start without Django configured
+    import django
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'graph_tutorial.settings')
+    django.setup()
+    try:
+        _run_pool(payload_provider(auth), worker_id, sheet_name, tick)
+    except KeyboardInterrupt:
+        pass
+
+
+class Command(BaseCommand):
+    help = ("Run scan_routine and reply tracking for the active SharePointClientConfigs. "
+            "Workbooks are leased, so several workers (processes or nodes) split them without overlap.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--app-only', action='store_true',
+                            help='Use app-only tokens (client credentials, needs app_authority in oauth_settings.yml)')
+        parser.add_argument('--user', help='Use the stored sign-in of this user, refreshed as needed')
+        parser.add_argument('--token', default=os.environ.get('GRAPH_ACCESS_TOKEN'),
+                            help='A fixed Graph access token, not refreshed (default: $GRAPH_ACCESS_TOKEN)')
+        parser.add_argument('--sheet', default='automation_test', help='Sheet to scan in every workbook')
+        parser.add_argument('--tick', type=float, default=1.0, help='Seconds between scheduling passes')
+        parser.add_argument('--workers', type=int, default=1, help='Number of worker processes on this node')
+        parser.add_argument('--once', action='store_true', help='Run a single pass and exit')
+
+    def handle(self, *args, **options):
+        # --app-only and --user override a token coming from the environment
+        token = None if options['app_only'] or options['user'] else options['token']
+        try:
+            auth = provider_for(token=token, user=options['user'], app_only=options['app_only'])
+        except ValueError as e:
+            raise CommandError(e)
+
+        prefix = f"{socket.gethostname()}:{os.getpid()}"
+        if options['workers'] <= 1 or options['once']:
+            _run_pool(auth, prefix, options['sheet'], options['tick'], once=options['once'])
+            return
+
+        context = multiprocessing.get_context('spawn')
+        processes = [context.Process(target=_worker, args=(auth_payload(auth), f"{prefix}:{n}", options['sheet'], options['tick']))
+                     for n in range(options['workers'])]
+        for process in processes:
+            process.start()
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            for process in processes:
+                process.join()
@@ -0,0 +1,50 @@
+import json
+import os
+from django.core.management.base import BaseCommand, CommandError
+from tutorial.graph.core import get_user
+from tutorial.graph.timezones import get_iana_from_windows
+from tutorial.tasks import enqueue_inform_attendees
+from tutorial.tokens import provider_for
+from tutorial.scheduling import PlanningFailed, UnknownAttendees, parse_meeting_spec, schedule_meetings_bulk
+
+
+class Command(BaseCommand):
+    help = "Schedule many meetings at once from a JSON file of meeting specs"
+
+    def add_arguments(self, parser):
+        parser.add_argument('specs', help='JSON file: a list of {title, description, duration, start_time, end_time, attendees[, vote_slots]}')
+        parser.add_argument('--user', help='Host whose stored sign-in is used, refreshed as needed')
+        parser.add_argument('--token', default=os.environ.get('GRAPH_ACCESS_TOKEN'),
+                            help='A fixed Graph access token of the host (default: $GRAPH_ACCESS_TOKEN)')
+        parser.add_argument('--no-inform', action='store_true', help='Only plan and store, do not send cards')
+
+    def handle(self, *args, **options):
+        if not (options['user'] or options['token']):
+            raise CommandError('A host is required (--user, --token or $GRAPH_ACCESS_TOKEN)')
+        try:
+            auth = provider_for(token=None if options['user'] else options['token'], user=options['user'])
+        except ValueError as e:
+            raise CommandError(e)
+        token = auth.token()
+
+        user = get_user(token)
+        host_email = user.get('mail') or user.get('userPrincipalName')
+        time_zone = get_iana_from_windows(user.get('mailboxSettings', {}).get('timeZone', 'UTC'))
+
+        with open(options['specs'], encoding='utf8') as f:
+            raw_specs = json.load(f)
+        try:
+            specs = [parse_meeting_spec(raw, time_zone) for raw in raw_specs]
+        except ValueError as e:
+            raise CommandError(f'Invalid meeting spec: {e}')
+
+        try:
+            meetings = schedule_meetings_bulk(token, specs, host_email, time_zone)
+        except (UnknownAttendees, PlanningFailed) as e:
+            raise CommandError(e)
+        for meeting in meetings:
+            if meeting.status == 'waiting' and not options['no_inform']:
+                enqueue_inform_attendees(auth, meeting)
+            candidate = meeting.get_candidate_time()
+            when = f"{candidate['start']} - {candidate['end']}" if candidate else 'no free slot'
+            self.stdout.write(f"{meeting.uuid} {meeting.status:8} {meeting.title}: {when}")
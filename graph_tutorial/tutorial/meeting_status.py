@@ -0,0 +1,100 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""
+The JSON payload the meeting progress page polls every few seconds.
+
+Payloads are cached per meeting under its current version together with
+an ETag, so repeated polls of an unchanged meeting are answered from the
+cache (or with 304) after reading only the meeting's version, without
+loading the meeting or touching MSAL. An entry is served only while its
+version is the one in the database: the cache may be per process, and a
+response recorded through another process changes the version, so the
+next poll loads the meeting and runs settle_meeting on it. Every write of
+the meeting also replaces the local entry with a version marker, see
+AutoScheduleMeeting.forget_status().
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from tutorial.models import AutoScheduleMeeting
+
+STATUS_CLASSES = {
+    'pending': 'warning',
+    'accepted': 'success',
+    'declined': 'danger',
+    'tentative': 'info'
+}
+
+STATUS_TEXTS = {
+    'pending': 'Waiting for response',
+    'accepted': 'Accepted',
+    'declined': 'Declined',
+    'tentative': 'Tentative'
+}
+
+MEETING_MESSAGES = {
+    'pending': 'Initializng...',
+    'waiting': 'Waiting...',
+    'done': 'Meeting scheduled successfully!',
+    'failed': 'Meeting scheduling failed'
+}
+
+MEETING_CLASSES = {
+    'pending': 'info',
+    'waiting': 'warning',
+    'done': 'success',
+    'failed': 'danger'
+}
+
+def _status_text(meeting, response, offered):
+    if meeting.vote_slots and response['status'] == 'accepted':
+        return f"Available for {bin(response.get('votes', 0)).count('1')} of {offered} times"
+    return STATUS_TEXTS.get(response['status'], '未知')
+
+def build_payload(meeting):
+    offered = len(meeting.get_offered_times())
+    attendees = []
+    for email, response in meeting.get_attendee_responses().items():
+        attendees.append({
+            'email': email,
+            'status': response['status'],
+            'status_class': STATUS_CLASSES.get(response['status'], 'secondary'),
+            'status_text': _status_text(meeting, response, offered),
+            'response_time': response.get('response_time')
+        })
+
+    return {
+        'status': meeting.status,
+        'status_message': MEETING_MESSAGES.get(meeting.status, 'unkown status'),
+        'status_class': MEETING_CLASSES.get(meeting.status, 'secondary'),
+        'attendees': attendees,
+        'selected_time': meeting.selected_time if meeting.selected_time else None
+    }
+
+def cached_status(meeting_uuid):
+    """
+    The cached {'version', 'etag', 'payload'} of a meeting, None when it has
+    to be rebuilt (or the meeting doesn't exist). The payload was stored
+    after settle_meeting ran on that version, so serving it skips nothing.
+    """
+    entry = cache.get(AutoScheduleMeeting.status_cache_key(meeting_uuid))
+    if not entry or 'payload' not in entry:
+        return None
+    current = (AutoScheduleMeeting.objects.filter(uuid=meeting_uuid)
+               .values_list('version', flat=True).first())
+    return entry if current == entry['version'] else None
+
+def store_status(meeting):
+    """Build and cache the payload of `meeting` as loaded; returns the entry."""
+    entry = {
+        'version': meeting.version,
+        'etag': f'"{meeting.uuid}-{meeting.version}"',
+        'payload': build_payload(meeting),
+    }
+    key = AutoScheduleMeeting.status_cache_key(meeting.uuid)
+    current = cache.get(key)
+    # A newer write happened since the meeting was read, leave its marker
+    if not current or current['version'] <= meeting.version:
+        cache.set(key, entry, settings.MEETING_STATUS_CACHE_TIMEOUT)
+    return entry
@@ -0,0 +1,213 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""
+In-process metrics for Graph calls and long running operations.
+
+Counters and histograms are kept per process and rendered in the
+Prometheus text exposition format by views.metrics. Every Graph request
+and every span is also written as one JSON line to the 'tutorial.graph'
+logger, so multi-process deployments can aggregate from logs as well.
+"""
+
+import json
+import logging
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from urllib.parse import urlsplit
+
+logger = logging.getLogger('tutorial.graph')
+
+# Name of the span the current code runs in, attached to every Graph call
+current_operation = ContextVar('current_operation', default=None)
+
+DURATION_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+PAGE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 500)
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels, amount=1):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        for key, value in sorted(self.values.items()):
+            lines.append(f'{self.name}{_format_labels(key)} {value}')
+        return lines
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=DURATION_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = buckets
+        self.values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            counts, total = self.values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[bisect_left(self.buckets, value)] += 1
+            self.values[key] = (counts, total + value)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        for key, (counts, total) in sorted(self.values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{_format_labels(key + (("le", str(bound)),))} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(key)} {total}')
+            lines.append(f'{self.name}_count{_format_labels(key)} {cumulative}')
+        return lines
+
+def _format_labels(key):
+    if not key:
+        return ''
+    pairs = ','.join('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"')) for k, v in key)
+    return '{' + pairs + '}'
+
+graph_requests = Counter('graph_requests_total', 'Graph requests by endpoint template, method and status')
+graph_request_duration = Histogram('graph_request_duration_seconds', 'Graph request latency including retries')
+graph_response_bytes = Counter('graph_response_bytes_total', 'Bytes received from Graph')
+graph_retries = Counter('graph_retries_total', 'Graph requests retried after throttling or a transient error')
+graph_throttled = Counter('graph_throttled_total', 'Graph responses with status 429')
+graph_coalesced = Counter('graph_coalesced_total', 'Graph GETs answered by an identical request already in flight')
+graph_deadline_exceeded = Counter('graph_deadline_exceeded_total', 'Graph calls abandoned because the operation ran out of time')
+graph_circuit_opened = Counter('graph_circuit_opened_total', 'Circuit breaker openings per Graph endpoint family')
+graph_short_circuited = Counter('graph_short_circuited_total', 'Graph calls refused by an open circuit breaker')
+repeated_calls = Counter('repeated_calls_total', 'Views and jobs that repeated one Graph endpoint or SQL statement (likely N+1)')
+call_budget_exceeded = Counter('call_budget_exceeded_total', 'Views and jobs over their CALL_BUDGETS entry')
+graph_pages = Histogram('graph_pages_per_walk', 'Pages fetched by one @odata.nextLink walk', PAGE_BUCKETS)
+operation_duration = Histogram('operation_duration_seconds', 'Duration of instrumented operations')
+
+REGISTRY = [graph_requests, graph_request_duration, graph_response_bytes, graph_retries,
+            graph_throttled, graph_coalesced, graph_deadline_exceeded, graph_circuit_opened,
+            graph_short_circuited, repeated_calls, call_budget_exceeded, graph_pages, operation_duration]
+
+def render_metrics():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+# Path segments made of letters only are Graph resource names, anything
+# else (ids, emails, chat thread ids, site paths) becomes a placeholder
+_STATIC_SEGMENT = re.compile(r"[A-Za-z$.]+")
+_FUNCTION_SEGMENT = re.compile(r"([A-Za-z]+)\(.*\)")
+_ITEM_PATH = re.compile(r"root:/.*?(:|$)")
+_SITE_PATH = re.compile(r"sites/[^/]+:/sites/[^/]+")
+
+def endpoint_template(url):
+    """
+    Reduce a Graph URL to a low-cardinality template, e.g.
+    /chats/19:abc@thread.v2/messages?$top=50 -> /chats/{id}/messages
+    """
+    path = urlsplit(url).path
+    if path.startswith('/v1.0'):
+        path = path[len('/v1.0'):]
+    path = _SITE_PATH.sub('sites/{site}', path)
+    path = _ITEM_PATH.sub(lambda m: 'root:{path}' + m.group(1), path)
+
+    segments = []
+    for segment in path.strip('/').split('/'):
+        function = _FUNCTION_SEGMENT.fullmatch(segment)
+        if function:
+            segments.append(f'{function.group(1)}(...)')
+        elif _STATIC_SEGMENT.fullmatch(segment) or segment.startswith(('{', 'root:')):
+            segments.append(segment)
+        else:
+            segments.append('{id}')
+    return '/' + '/'.join(segments)
+
+def record_request(method, url, status, duration, size, retries):
+    endpoint = endpoint_template(url)
+    graph_requests.inc({'endpoint': endpoint, 'method': method, 'status': status})
+    graph_request_duration.observe({'endpoint': endpoint, 'method': method}, duration)
+    graph_response_bytes.inc({'endpoint': endpoint, 'method': method}, size)
+    if retries:
+        graph_retries.inc({'endpoint': endpoint, 'method': method}, retries)
+    logger.info(json.dumps({
+        'event': 'graph_request',
+        'operation': current_operation.get(),
+        'endpoint': endpoint,
+        'method': method,
+        'status': status,
+        'duration_ms': round(duration * 1000, 1),
+        'bytes': size,
+        'retries': retries,
+    }))
+
+def record_throttle(url, retry_after):
+    graph_throttled.inc({'endpoint': endpoint_template(url)})
+    logger.warning(json.dumps({
+        'event': 'graph_throttled',
+        'operation': current_operation.get(),
+        'endpoint': endpoint_template(url),
+        'retry_after': retry_after,
+    }))
+
+def record_coalesced(url):
+    graph_coalesced.inc({'endpoint': endpoint_template(url)})
+
+def record_deadline(url):
+    graph_deadline_exceeded.inc({'endpoint': endpoint_template(url)})
+
+def record_circuit_open(family):
+    graph_circuit_opened.inc({'family': family})
+
+def record_short_circuit(url):
+    graph_short_circuited.inc({'endpoint': endpoint_template(url)})
+
+def record_repeated(operation, kind, count):
+    repeated_calls.inc({'operation': operation, 'kind': kind})
+
+def record_budget_exceeded(operation):
+    call_budget_exceeded.inc({'operation': operation})
+
+def record_pages(url, pages):
+    endpoint = endpoint_template(url)
+    graph_pages.observe({'endpoint': endpoint}, pages)
+    logger.info(json.dumps({
+        'event': 'graph_paged_walk',
+        'operation': current_operation.get(),
+        'endpoint': endpoint,
+        'pages': pages,
+    }))
+
+@contextmanager
+def span(name, **fields):
+    """
+    Time an operation such as schedule_meeting or scan_routine.
+    Graph calls made inside the block are tagged with its name.
+    """
+    token = current_operation.set(name)
+    started = time.perf_counter()
+    outcome = 'ok'
+    try:
+        yield
+    except BaseException:
+        outcome = 'error'
+        raise
+    finally:
+        duration = time.perf_counter() - started
+        current_operation.reset(token)
+        operation_duration.observe({'operation': name, 'outcome': outcome}, duration)
+        logger.info(json.dumps({
+            'event': 'span',
+            'operation': name,
+            'outcome': outcome,
+            'duration_ms': round(duration * 1000, 1),
+            **fields,
+        }, default=str))
@@ -0,0 +1,54 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import logging
+import requests
+from django.conf import settings
+from django.http import HttpResponse
+from tutorial import call_budget
+from tutorial.graph.resilience import GraphUnavailable
+
+logger = logging.getLogger(__name__)
+
+class GraphUnavailableMiddleware:
+    """
+    Answer 503 when a view gives up on Graph (deadline, open circuit,
+    timeout or connection error) instead of a generic 500, so clients and
+    load balancers know to come back later.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_exception(self, request, exception):
+        if not isinstance(exception, (GraphUnavailable, requests.exceptions.Timeout,
+                                      requests.exceptions.ConnectionError)):
+            return None
+        logger.warning("Graph unavailable for %s: %s", request.path, exception)
+        response = HttpResponse("Microsoft Graph is not responding right now, please try again shortly.",
+                                status=503, content_type='text/plain; charset=utf-8')
+        response['Retry-After'] = str(settings.GRAPH_BREAKER_COOLDOWN)
+        return response
+
+class CallBudgetMiddleware:
+    """
+    Count the Graph calls and queries of every request under its view's URL
+    name, flag likely N+1 patterns and check CALL_BUDGETS (see
+    tutorial.call_budget).
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with call_budget.track(request.path) as usage:
+            request.call_usage = usage
+            return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # Budgets are keyed by URL name, known once the URL is resolved
+        usage = getattr(request, 'call_usage', None)
+        if usage is not None:
+            usage.name = request.resolver_match.url_name or view_func.__name__
+        return None
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.23 on 2026-10-19 09:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tutorial', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SharePointClientConfig',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('drive_name', models.CharField(max_length=200)),
+                ('file_path', models.CharField(max_length=500)),
+                ('routine_interval', models.IntegerField(default=1000)),
+                ('polling_interval', models.IntegerField(default=100)),
+                ('is_active', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='autoschedulemeeting',
+            name='availability',
+            field=models.JSONField(blank=True, help_text="Free/busy snapshot used to rank candidates locally: {'start': iso, 'interval': minutes, 'views': {email: availabilityView}}", null=True),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.23 on 2026-10-19 09:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tutorial', '0002_meeting_availability'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChatSubscription',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subscription_id', models.CharField(max_length=100, unique=True)),
+                ('chat_id', models.CharField(db_index=True, max_length=255)),
+                ('client_state', models.CharField(help_text='Secret echoed back by Graph in every notification', max_length=128)),
+                ('expiration', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ChatMessageNotification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subscription_id', models.CharField(max_length=100)),
+                ('chat_id', models.CharField(max_length=255)),
+                ('message_id', models.CharField(max_length=100)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('processed', models.BooleanField(default=False)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['chat_id', 'processed'], name='tutorial_ch_chat_id_6d082d_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.23 on 2026-10-19 09:15
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tutorial', '0004_job_queue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tasknotification',
+            name='config',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to='tutorial.sharepointclientconfig'),
+        ),
+        migrations.AddIndex(
+            model_name='tasknotification',
+            index=models.Index(fields=['teams_group_id', 'replied'], name='tutorial_ta_teams_g_893d40_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='tasknotification',
+            constraint=models.UniqueConstraint(fields=('config', 'sheet_name', 'row', 'reason'), name='unique_notification_per_config'),
+        ),
+        migrations.AddConstraint(
+            model_name='tasknotification',
+            constraint=models.UniqueConstraint(condition=models.Q(('config__isnull', True)), fields=('sheet_name', 'row', 'reason'), name='unique_notification_without_config'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.23 on 2026-10-19 09:23
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tutorial', '0006_token_cache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeletedTaskNotification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('notification_id', models.BigIntegerField()),
+                ('deleted_at', models.DateTimeField(db_index=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='tasknotification',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='tasknotification',
+            index=models.Index(fields=['config', 'replied'], name='tutorial_ta_config__44d8c1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tasknotification',
+            index=models.Index(fields=['updated_at', 'id'], name='tutorial_ta_updated_4739d4_idx'),
+        ),
+        migrations.AddField(
+            model_name='deletedtasknotification',
+            name='config',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='tutorial.sharepointclientconfig'),
+        ),
+    ]
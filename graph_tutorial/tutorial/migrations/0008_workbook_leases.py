@@ -0,0 +1,31 @@
+# Generated by Django 4.2.23 on 2026-10-19 09:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tutorial', '0007_dashboard_change_feed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SharePointWorker',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('worker_id', models.CharField(max_length=100, unique=True)),
+                ('heartbeat_at', models.DateTimeField(db_index=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='sharepointclientconfig',
+            name='lease_expires',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='sharepointclientconfig',
+            name='lease_owner',
+            field=models.CharField(blank=True, db_index=True, max_length=100),
+        ),
+    ]
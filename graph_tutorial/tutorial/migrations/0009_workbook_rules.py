@@ -0,0 +1,18 @@
+# Generated by Django 4.2.23 on 2026-10-19 09:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tutorial', '0008_workbook_leases'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sharepointclientconfig',
+            name='rules',
+            field=models.JSONField(blank=True, help_text='Notification rules, see tutorial.sheet_rules (empty: settings.SHEET_RULES)', null=True),
+        ),
+    ]
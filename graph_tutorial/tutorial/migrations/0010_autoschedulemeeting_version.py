@@ -0,0 +1,18 @@
+# Generated by Django 4.2.23 on 2026-10-19 09:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tutorial', '0009_workbook_rules'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='autoschedulemeeting',
+            name='version',
+            field=models.PositiveIntegerField(default=0, help_text='Optimistic concurrency counter'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.23 on 2026-10-19 09:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tutorial', '0010_autoschedulemeeting_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='autoschedulemeeting',
+            name='vote_slots',
+            field=models.PositiveSmallIntegerField(default=0, help_text='Candidates offered at once for voting, 0 offers one at a time'),
+        ),
+    ]
@@ -1,5 +1,11 @@
+from django.conf import settings
+from django.core.cache import cache
 from django.db import models
+from django.db.models import F
+from django.utils import timezone
 import json
+import random
+import time
 from datetime import datetime
 import uuid
 
@@ -44,9 +50,78 @@ class AutoScheduleMeeting(models.Model):
     end_time = models.DateTimeField()
     selected_time = models.JSONField(null=True, blank=True)
     time_zone = models.CharField(max_length=50, default='UTC', help_text="Time zone of the meeting")
+    availability = models.JSONField(
+        null=True,
+        blank=True,
+        help_text="Free/busy snapshot used to rank candidates locally: {'start': iso, 'interval': minutes, 'views': {email: availabilityView}}"
+    )
+    vote_slots = models.PositiveSmallIntegerField(
+        default=0,
+        help_text="Candidates offered at once for voting, 0 offers one at a time"
+    )
+    # Bumped by every compare_and_swap(), see there
+    version = models.PositiveIntegerField(default=0, help_text="Optimistic concurrency counter")
+
+    # Attempts before compare_and_swap() gives up
+    CAS_ATTEMPTS = 10
+
+    # Keeps the card and the vote page short
+    MAX_VOTE_SLOTS = 5
+
     def __str__(self):
         return f"Auto Schedule Meeting {self.id} - {self.status}"
 
+    def save(self, *args, **kwargs):
+        # Plain saves move the version on as well, so compare_and_swap() and
+        # the status cache notice them
+        if not self._state.adding:
+            self.version += 1
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'version'}
+        super().save(*args, **kwargs)
+        self.forget_status()
+
+    @staticmethod
+    def status_cache_key(meeting_uuid):
+        return f'meeting_status:{meeting_uuid}'
+
+    def forget_status(self):
+        """
+        Drop the cached meeting_status payload (tutorial.meeting_status).
+        A marker with the new version is left instead of deleting the key,
+        so a poll that read the old row can't store its payload afterwards.
+        """
+        cache.set(self.status_cache_key(self.uuid), {'version': self.version}, settings.MEETING_STATUS_CACHE_TIMEOUT)
+
+    def compare_and_swap(self, change, fields):
+        """
+        Apply `change(meeting)` and store `fields` only if nobody else wrote
+        the meeting in between (UPDATE ... WHERE version = N). On a conflict
+        the meeting is reloaded and `change` runs again on the fresh state,
+        so it must decide from the meeting alone. When `change` returns a
+        falsy value nothing is written. Returns what `change` returned.
+
+        Responses and status changes arrive from parallel webhooks and page
+        polls; they go through here instead of save() so none is lost.
+        """
+        for attempt in range(self.CAS_ATTEMPTS):
+            result = change(self)
+            if not result:
+                return result
+            now = timezone.now()
+            values = {field: getattr(self, field) for field in fields}
+            written = AutoScheduleMeeting.objects.filter(pk=self.pk, version=self.version).update(
+                version=F('version') + 1, updated_at=now, **values)
+            if written:
+                self.version += 1
+                self.updated_at = now
+                self.forget_status()
+                return result
+            # Writers that lost the same round would collide again right away, spread them out
+            time.sleep(random.uniform(0, 0.005 * (attempt + 1)))
+            self.refresh_from_db()
+        raise RuntimeError(f"Meeting {self.uuid} kept changing, gave up after {self.CAS_ATTEMPTS} attempts")
+
     def set_attendees(self, attendees_list, tenant_ids=None, chat_ids=None):
         """
         設置與會者列表和他們的 tenant ID 及 chat ID
@@ -76,14 +151,17 @@ class AutoScheduleMeeting(models.Model):
 
     def update_attendee_response(self, email, status, tenant_id=None, chat_id=None):
         """
-        更新與會者的回應狀態
+        更新與會者的回應狀態（compare_and_swap，並行的回應不會互相覆蓋）
         :param email: 與會者郵箱
         :param status: 回應狀態
         :param tenant_id: 可選的 tenant ID
         :param chat_id: 可選的 chat ID
+        :return: True 如果 email 是與會者
         """
-        responses = self.get_attendee_responses()
-        if email in responses:
+        def respond(meeting):
+            responses = meeting.get_attendee_responses()
+            if email not in responses:
+                return False
             responses[email].update({
                 'status': status,
                 'response_time': datetime.now().isoformat()
@@ -92,8 +170,9 @@ class AutoScheduleMeeting(models.Model):
                 responses[email]['tenant_id'] = tenant_id
             if chat_id is not None:
                 responses[email]['chat_id'] = chat_id
-            self.attendee_responses = json.dumps(responses)
-            self.save()
+            meeting.attendee_responses = json.dumps(responses)
+            return True
+        return self.compare_and_swap(respond, ['attendee_responses'])
 
     def get_attendee_status(self, email):
         responses = self.get_attendee_responses()
@@ -155,26 +234,84 @@ class AutoScheduleMeeting(models.Model):
             tenant_summary[tenant_id][response['status']] += 1
             
         return tenant_summary
-    def try_next(self):
+    def move_to_next_try(self):
         """
-        更新當前嘗試次數
-        :return: None
+        切換到下一個候選時間並重置所有回應（只改記憶體，不存檔）
+        :return: True
         """
-        if self.current_try >= len(self.candidate_times):
+        step = self.vote_slots or 1
+        if self.current_try + step >= len(self.get_candidate_times()):
             raise ValueError("No more candidate times available.")
-        self.current_try += 1
+        self.current_try += step
         responses = self.get_attendee_responses()
         for email in responses:
             responses[email]['status'] = 'pending'
             responses[email]['response_time'] = None
+            responses[email].pop('votes', None)
         self.attendee_responses = json.dumps(responses)
-        self.save()
+        return True
+
+    def try_next(self):
+        """
+        更新當前嘗試次數
+        :return: None
+        """
+        self.compare_and_swap(AutoScheduleMeeting.move_to_next_try, ['current_try', 'attendee_responses'])
     def get_candidate_time(self):
         """
         獲取當前嘗試的候選時間
         :return: 包含 'start' 和 'end' 的字典，或 None 如果沒有更多候選時間
         """
-        return self.get_candidate_times()[self.current_try] if self.current_try < len(self.candidate_times) else None
+        candidate_times = self.get_candidate_times()
+        return candidate_times[self.current_try] if self.current_try < len(candidate_times) else None
+
+    def get_offered_times(self):
+        """
+        投票模式下同時提供的候選時間（current_try 起的 vote_slots 個）
+        :return: [(candidate index, {'start', 'end'}), ...]
+        """
+        candidate_times = self.get_candidate_times()
+        end = self.current_try + (self.vote_slots or 1)
+        return list(enumerate(candidate_times))[self.current_try:end]
+
+    def vote(self, email, slots):
+        """
+        記錄與會者可以的時間（compare_and_swap），取代之前的投票
+        The answer is kept as a 'votes' bitmask, bit i = candidate
+        current_try + i; no slots means none of the offered times works.
+        :param slots: candidate indexes the attendee picked
+        :return: False if email isn't an attendee or a slot is no longer offered
+        """
+        def record(meeting):
+            responses = meeting.get_attendee_responses()
+            offered = [index for index, _ in meeting.get_offered_times()]
+            if email not in responses or any(slot not in offered for slot in slots):
+                return False
+            votes = 0
+            for slot in slots:
+                votes |= 1 << (slot - meeting.current_try)
+            responses[email].update({
+                'status': 'accepted' if votes else 'declined',
+                'response_time': datetime.now().isoformat(),
+                'votes': votes,
+            })
+            meeting.attendee_responses = json.dumps(responses)
+            return True
+        return self.compare_and_swap(record, ['attendee_responses'])
+
+    def vote_tally(self):
+        """
+        :return: (bitmask of the offered slots every answer so far allows,
+                  number of attendees still pending)
+        """
+        common = (1 << len(self.get_offered_times())) - 1
+        pending = 0
+        for response in self.get_attendee_responses().values():
+            if response['status'] == 'pending':
+                pending += 1
+            else:
+                common &= response.get('votes', 0)
+        return common, pending
        
 
     class Meta:
@@ -195,16 +332,129 @@ class TaskNotification(models.Model):
     reason = models.CharField(max_length=255)
     msg_id = models.JSONField(default=list)
     replied = models.BooleanField(default=False)
+    # 哪一份 excel 產生的通知 (None: client created without a config)
+    config = models.ForeignKey('SharePointClientConfig', null=True, blank=True,
+                               on_delete=models.CASCADE, related_name='notifications')
+    # Drives the dashboard change feed; bump it in queryset.update() calls too
+    updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['config', 'sheet_name', 'row', 'reason'],
+                                    name='unique_notification_per_config'),
+            # NULLs never collide in a unique index, cover config-less rows separately
+            models.UniqueConstraint(fields=['sheet_name', 'row', 'reason'],
+                                    condition=models.Q(config__isnull=True),
+                                    name='unique_notification_without_config'),
+        ]
+        indexes = [
+            models.Index(fields=['teams_group_id', 'replied']),
+            models.Index(fields=['config', 'replied']),
+            models.Index(fields=['updated_at', 'id']),
+        ]
 
     def __str__(self):
         return f"{self.sheet_name} - Row {self.row}: {self.task}"
 
 
+class DeletedTaskNotification(models.Model):
+    """Tombstone of a removed TaskNotification, reported by the dashboard change feed."""
+    notification_id = models.BigIntegerField()
+    config = models.ForeignKey('SharePointClientConfig', null=True, blank=True, on_delete=models.CASCADE)
+    deleted_at = models.DateTimeField(db_index=True)
+
+
 class SharePointClientConfig(models.Model):
     drive_name = models.CharField(max_length=200)
     file_path = models.CharField(max_length=500)
     routine_interval = models.IntegerField(default=1000)  # milliseconds or seconds
     polling_interval = models.IntegerField(default=100)
     is_active = models.BooleanField(default=False)
-    created_at = models.DateTimeField(auto_now_add=True)
\ No newline at end of file
+    created_at = models.DateTimeField(auto_now_add=True)
+    rules = models.JSONField(null=True, blank=True, help_text="Notification rules, see tutorial.sheet_rules "
+                                                              "(empty: settings.SHEET_RULES)")
+    # run_sharepoint_clients worker currently driving this workbook, see WorkbookPool
+    lease_owner = models.CharField(max_length=100, blank=True, db_index=True)
+    lease_expires = models.DateTimeField(null=True, blank=True)
+
+
+class SharePointWorker(models.Model):
+    """Heartbeat of a run_sharepoint_clients worker, used to split workbooks evenly."""
+    worker_id = models.CharField(max_length=100, unique=True)
+    heartbeat_at = models.DateTimeField(db_index=True)
+
+class TokenCache(models.Model):
+    """Serialized MSAL token cache of one signed-in session, see auth_helper."""
+    key = models.CharField(max_length=64, unique=True)
+    data = models.TextField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Token cache {self.key}"
+
+
+class ChatSubscription(models.Model):
+    """A Graph change-notification subscription on the messages of one tracked chat."""
+    subscription_id = models.CharField(max_length=100, unique=True)
+    chat_id = models.CharField(max_length=255, db_index=True)
+    client_state = models.CharField(max_length=128, help_text="Secret echoed back by Graph in every notification")
+    expiration = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Subscription {self.subscription_id} on {self.chat_id}"
+
+
+class ChatMessageNotification(models.Model):
+    """
+    Inbox of validated change notifications, written by the webhook view and
+    drained by the process that owns the Graph token for the chat.
+    """
+    subscription_id = models.CharField(max_length=100)
+    chat_id = models.CharField(max_length=255)
+    message_id = models.CharField(max_length=100)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['chat_id', 'processed']),
+        ]
+
+
+class Job(models.Model):
+    """A durable unit of background work, see tutorial.jobs."""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('dead', 'Dead'),
+    ]
+
+    kind = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    priority = models.IntegerField(default=0, help_text="Higher runs first")
+    idempotency_key = models.CharField(max_length=255, null=True, blank=True,
+                                       help_text="At most one queued or running job per key")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=5)
+    run_at = models.DateTimeField(help_text="Not picked up before this time (used for backoff)")
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_at', 'priority']),
+        ]
+        constraints = [
+            # Finished (done/dead) jobs keep their key but don't block a new job
+            models.UniqueConstraint(fields=['idempotency_key'], condition=models.Q(status__in=['queued', 'running']),
+                                    name='tutorial_job_live_idempotency_key'),
+        ]
+
+    def __str__(self):
+        return f"Job {self.id} {self.kind} - {self.status}"
@@ -0,0 +1,464 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import json
+import math
+from datetime import datetime, timedelta
+from dateutil import tz, parser
+from django.conf import settings
+from tutorial.graph.calendar import get_schedules
+from tutorial.graph.core import get_users_by_email
+from tutorial.graph.teams import get_chat_ids
+from tutorial.graph.timezones import get_iana_from_windows
+from tutorial.models import AutoScheduleMeeting
+
+# availabilityView codes returned by getSchedule
+FREE, TENTATIVE, BUSY, OOF, ELSEWHERE = 0, 1, 2, 3, 4
+# Not a getSchedule code: outside the attendee's working hours
+OFF_HOURS = 5
+# Codes a meeting can't be placed over; working elsewhere can still meet
+UNAVAILABLE = (BUSY, OOF, OFF_HOURS)
+
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+
+def _minutes(clock):
+    # '08:30:00.0000000' -> 510
+    hours, minutes = clock.split(':')[:2]
+    return int(hours) * 60 + int(minutes)
+
+def _zone_offsets(grid_start, interval, length, from_tz, to_tz):
+    """
+    Minutes to add to each grid cell (naive, in from_tz) to read it in to_tz.
+    The offset only changes at DST transitions, so it is looked up at day
+    boundaries and bisected down to the cell where it changes.
+    """
+    import numpy as np
+
+    def offset(i):
+        cell = grid_start + timedelta(minutes=i * interval)
+        moved = cell.replace(tzinfo=from_tz).astimezone(to_tz).replace(tzinfo=None)
+        return (moved - cell) // timedelta(minutes=1)
+
+    offsets = np.zeros(length, dtype=np.int64)
+    day = max(1440 // interval, 1)
+
+    def fill(lo, hi, at_lo, at_hi):
+        if at_lo == at_hi and hi - lo <= day:
+            offsets[lo:hi + 1] = at_lo
+        elif hi - lo <= 1:
+            offsets[lo], offsets[hi] = at_lo, at_hi
+        else:
+            mid = (lo + hi) // 2
+            at_mid = offset(mid)
+            fill(lo, mid, at_lo, at_mid)
+            fill(mid, hi, at_mid, at_hi)
+
+    if length:
+        fill(0, length - 1, offset(0), offset(length - 1))
+    return offsets
+
+class FreeBusyEngine:
+    """
+    Free/busy of a set of attendees on a fixed time grid.
+
+    Each attendee is a uint8 array with one availabilityView code per
+    `interval` minutes starting at `grid_start` (naive, in the meeting time
+    zone). Availability is fetched from Graph once; candidate slots are then
+    ranked locally, so regenerating candidates costs no further Graph calls.
+    """
+
+    def __init__(self, grid_start, interval, views):
+        self.grid_start = grid_start
+        self.interval = interval
+        self.views = views
+
+    @classmethod
+    def from_graph(cls, token, emails, start, end, timezone='UTC', interval=15):
+        """
+        Pull the attendees' free/busy and working hours in one getSchedule
+        round. Time outside an attendee's working hours is stored as
+        OFF_HOURS, like findMeetingTimes only suggesting working time.
+        """
+        # Align the grid so slot boundaries fall on whole intervals
+        start = start.replace(second=0, microsecond=0)
+        start -= timedelta(minutes=start.minute % interval)
+        length = math.ceil((end - start) / timedelta(minutes=interval))
+
+        schedules = get_schedules(
+            token,
+            list(dict.fromkeys(emails)),
+            start.isoformat(),
+            end.isoformat(),
+            timezone,
+            interval)
+
+        views = {}
+        masks = {}
+        for email in emails:
+            schedule = schedules.get(email) or {}
+            codes = cls._parse_view(schedule.get('view'), length)
+            hours = schedule.get('working_hours') or settings.MEETING_WORKING_HOURS
+            # Most attendees share their working hours, build each mask once
+            key = json.dumps(hours, sort_keys=True)
+            if key not in masks:
+                masks[key] = cls._working_mask(start, interval, length, hours, timezone)
+            codes[~masks[key]] = OFF_HOURS
+            views[email] = codes
+        return cls(start, interval, views)
+
+    @staticmethod
+    def _working_mask(grid_start, interval, length, hours, timezone):
+        """True for the grid cells that lie within `hours` (Graph workingHours)."""
+        import numpy as np
+        meeting_tz = tz.gettz(timezone)
+        zone = (hours.get('timeZone') or {}).get('name')
+        # Custom zones Graph can't name fall back to the meeting time zone
+        hours_tz = (tz.gettz(get_iana_from_windows(zone)) if zone else None) or meeting_tz
+        days = {day.lower() for day in hours.get('daysOfWeek', [])}
+        first, last = _minutes(hours['startTime']), _minutes(hours['endTime'])
+
+        # Minutes since the grid's first midnight, on the working hours' clock
+        minutes = (grid_start.hour * 60 + grid_start.minute + np.arange(length) * interval
+                   + _zone_offsets(grid_start, interval, length, meeting_tz, hours_tz))
+        minute_of_day = minutes % 1440
+        weekday = (grid_start.weekday() + minutes // 1440) % 7
+        working_days = np.array([day in days for day in WEEKDAYS])
+        return working_days[weekday] & (first <= minute_of_day) & (minute_of_day + interval <= last)
+
+    @staticmethod
+    def _parse_view(view, length):
+        # numpy is only loaded once availability is actually ranked
+        import numpy as np
+        if not view:
+            # Unknown schedule: don't block, but rank it below known free time
+            return np.full(length, TENTATIVE, dtype=np.uint8)
+        codes = np.frombuffer(view.encode('ascii'), dtype=np.uint8) - ord('0')
+        if len(codes) < length:
+            codes = np.concatenate([codes, np.full(length - len(codes), TENTATIVE, dtype=np.uint8)])
+        return codes[:length].copy()
+
+    # Persisted on AutoScheduleMeeting.availability as availabilityView strings
+    def to_dict(self):
+        return {
+            'start': self.grid_start.isoformat(),
+            'interval': self.interval,
+            'views': {email: (codes + ord('0')).tobytes().decode('ascii') for email, codes in self.views.items()}
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        views = {}
+        for email, view in data['views'].items():
+            views[email] = cls._parse_view(view, len(view))
+        return cls(datetime.fromisoformat(data['start']), data['interval'], views)
+
+    def subset(self, emails):
+        """A view of the engine restricted to the given attendees."""
+        return FreeBusyEngine(self.grid_start, self.interval,
+                              {email: self.views[email] for email in emails if email in self.views})
+
+    def _index(self, value):
+        if isinstance(value, str):
+            value = datetime.fromisoformat(value)
+        return int((value.replace(tzinfo=None) - self.grid_start) / timedelta(minutes=self.interval))
+
+    def mark_busy(self, emails, start, end):
+        """Block [start, end) for the given attendees, e.g. after they declined it."""
+        first = max(self._index(start), 0)
+        last = self._index(end)
+        for email in emails:
+            if email in self.views:
+                self.views[email][first:last] = BUSY
+
+    def is_free(self, emails, start, end):
+        """True when none of `emails` is unavailable during [start, end)."""
+        import numpy as np
+        first, last = max(self._index(start), 0), self._index(end)
+        return not any(np.isin(self.views[email][first:last], UNAVAILABLE).any()
+                       for email in emails if email in self.views)
+
+    def rank_slots(self, emails, duration, window_start=None, window_end=None, exclude=(), limit=10):
+        """
+        Return up to `limit` slots of `duration` minutes where no attendee is
+        busy, out of office or off work, ranked by the number of tentative
+        attendees, then start time. Slots don't overlap each other nor the
+        `exclude` slots, so a decline moves on to a really different time.
+
+        Slots are dicts shaped like the findMeetingTimes suggestions used by
+        the meeting flow: {'start', 'end', 'confidence', 'attendeeAvailability'}.
+        """
+        import numpy as np
+        emails = [email for email in emails if email in self.views]
+        if not emails:
+            return []
+        width = math.ceil(duration / self.interval)
+        matrix = np.stack([self.views[email] for email in emails])
+
+        # Sliding window sums over the time axis via cumulative sums
+        def window_counts(mask):
+            padded = np.zeros((mask.shape[0], mask.shape[1] + 1), dtype=np.int32)
+            np.cumsum(mask, axis=1, out=padded[:, 1:])
+            return padded[:, width:] - padded[:, :-width]
+
+        if matrix.shape[1] < width:
+            return []
+        busy = window_counts(np.isin(matrix, UNAVAILABLE)) > 0
+        tentative = window_counts(matrix == TENTATIVE) > 0
+        conflicts = busy.sum(axis=0)
+        tentative_count = tentative.sum(axis=0)
+
+        first = 0 if window_start is None else max(self._index(window_start), 0)
+        last = len(conflicts) if window_end is None else min(self._index(window_end) - width + 1, len(conflicts))
+        # Grid cells covered by a slot already picked or excluded
+        taken = np.zeros(matrix.shape[1], dtype=bool)
+        for slot in exclude:
+            taken[max(self._index(slot['start']), 0):max(self._index(slot['end']), 0)] = True
+
+        starts = np.flatnonzero(conflicts[first:last] == 0) + first
+        order = np.lexsort((starts, tentative_count[starts]))
+
+        slots = []
+        for i in starts[order]:
+            i = int(i)
+            if taken[i:i + width].any():
+                continue
+            taken[i:i + width] = True
+            slot_start = self.grid_start + timedelta(minutes=i * self.interval)
+            slots.append({
+                'confidence': 100.0 * (len(emails) - int(tentative_count[i])) / len(emails),
+                'attendeeAvailability': [
+                    {
+                        'attendee': {'emailAddress': {'address': email}},
+                        'availability': 'tentative' if tentative[row, i] else 'free'
+                    } for row, email in enumerate(emails)
+                ],
+                'start': slot_start.isoformat(),
+                'end': (slot_start + timedelta(minutes=duration)).isoformat(),
+            })
+            if len(slots) >= limit:
+                break
+        return slots
+
+def _local_window(meeting):
+    tz_info = tz.gettz(meeting.time_zone)
+    start = meeting.start_time.astimezone(tz_info).replace(tzinfo=None)
+    end = meeting.end_time.astimezone(tz_info).replace(tzinfo=None)
+    return start, end
+
+def plan_meeting(token, meeting, limit=10):
+    """
+    Pull free/busy for the meeting's attendees and host once, store it on the
+    meeting and return the ranked candidate slots.
+    """
+    emails = meeting.get_attendees() + [meeting.host_email]
+    start, end = _local_window(meeting)
+    engine = FreeBusyEngine.from_graph(token, emails, start, end, meeting.time_zone)
+    meeting.availability = engine.to_dict()
+    return engine.rank_slots(emails, meeting.duration, start, end, limit=limit)
+
+# Fields a meeting's scheduling state lives in
+STATE_FIELDS = ['availability', 'candidate_times', 'current_try', 'attendee_responses', 'status', 'selected_time']
+
+def _rejected(meeting, responses, bit):
+    # Attendees whose answer rules out offered slot `bit`
+    if not meeting.vote_slots:
+        return [email for email, data in responses.items() if data['status'] == 'declined']
+    return [email for email, data in responses.items()
+            if data['status'] != 'pending' and not data.get('votes', 0) >> bit & 1]
+
+def _advance(meeting, limit):
+    if meeting.availability:
+        engine = FreeBusyEngine.from_dict(meeting.availability)
+        responses = meeting.get_attendee_responses()
+        for bit, (_, slot) in enumerate(meeting.get_offered_times()):
+            engine.mark_busy(_rejected(meeting, responses, bit), slot['start'], slot['end'])
+        meeting.availability = engine.to_dict()
+
+        # Candidates not offered yet that now clash for somebody are dropped
+        participants = meeting.get_attendees() + [meeting.host_email]
+        step = meeting.vote_slots or 1
+        upcoming = meeting.current_try + step
+        candidates = meeting.get_candidate_times()
+        candidates = candidates[:upcoming] + [
+            slot for slot in candidates[upcoming:] if engine.is_free(participants, slot['start'], slot['end'])]
+
+        # The next window must be complete
+        if upcoming + step > len(candidates):
+            start, end = _local_window(meeting)
+            candidates += engine.rank_slots(
+                participants, meeting.duration, start, end,
+                exclude=candidates, limit=max(limit, step))
+        meeting.set_candidate_times(candidates)
+
+    return meeting.move_to_next_try()
+
+def advance_meeting(meeting, limit=10):
+    """
+    Move the meeting to its next candidate (the next window of vote_slots
+    candidates when voting) after a decline.
+
+    Declined slots are blocked for the attendees who declined them and, once
+    the stored candidates are exhausted, new ones are ranked locally from the
+    stored availability. Raises ValueError when nothing is left.
+    """
+    meeting.compare_and_swap(lambda meeting: _advance(meeting, limit), STATE_FIELDS)
+
+def settle_meeting(meeting, limit=10):
+    """
+    Act on the attendees' answers of a waiting meeting: move on to the next
+    candidate after a decline (failing when none is left) or finish once
+    nobody is pending. When voting, the meeting finishes on the best offered
+    slot everybody voted for, and moves on as soon as the votes so far leave
+    no common slot. The decision is taken again on the fresh state when
+    another request changed the meeting first, so parallel polls act once.
+
+    Returns 'advanced', 'failed', 'done' or None when nothing changed.
+    """
+    def settle(meeting):
+        if meeting.status != 'waiting':
+            return None
+        if meeting.vote_slots:
+            common, pending = meeting.vote_tally()
+            rejected, agreed = not common, common and not pending
+            # Offered slots keep the ranking order, take the first agreed one
+            best = (common & -common).bit_length() - 1
+        else:
+            summary = meeting.get_response_summary()
+            rejected, agreed = summary['declined'] > 0, summary['pending'] == 0
+            best = 0
+        if rejected:
+            try:
+                _advance(meeting, limit)
+                return 'advanced'
+            except ValueError:
+                meeting.status = 'failed'
+                return 'failed'
+        if agreed:
+            meeting.status = 'done'
+            meeting.selected_time = meeting.get_offered_times()[best][1]
+            return 'done'
+        return None
+
+    return meeting.compare_and_swap(settle, STATE_FIELDS)
+
+def parse_vote_slots(value):
+    """
+    Number of candidates a meeting offers at once for voting; empty, 0 and 1
+    mean one at a time (0). Raises ValueError for a non-number.
+    """
+    slots = int(value or 0)
+    return 0 if slots <= 1 else min(slots, AutoScheduleMeeting.MAX_VOTE_SLOTS)
+
+def parse_meeting_spec(raw, time_zone):
+    """
+    Validate one bulk meeting spec (JSON-decoded) and localize its window.
+    Naive start/end times are taken to be in `time_zone`.
+    """
+    missing = [key for key in ('duration', 'start_time', 'end_time', 'attendees') if not raw.get(key)]
+    if missing:
+        raise ValueError(f"Missing fields: {', '.join(missing)}")
+
+    tz_info = tz.gettz(time_zone)
+    spec = dict(raw)
+    for key in ('start_time', 'end_time'):
+        value = parser.parse(raw[key])
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=tz_info)
+        spec[key] = value
+    spec['duration'] = int(raw['duration'])
+    spec['attendees'] = list(raw['attendees'])
+    spec['vote_slots'] = parse_vote_slots(raw.get('vote_slots'))
+    return spec
+
+class UnknownAttendees(ValueError):
+    """Attendees Graph has no user for."""
+    def __init__(self, emails):
+        super().__init__(f"Unknown attendees: {', '.join(emails)}")
+        self.emails = emails
+
+class PlanningFailed(Exception):
+    """Graph could not be asked for users, chats or free/busy."""
+
+def schedule_meetings_bulk(token, specs, host_email, time_zone, limit=10):
+    """
+    Plan and persist many meetings at once.
+
+    Attendees are resolved with batched lookups, oneOnOne chats are looked up
+    once for all of them and free/busy is fetched once for the union of
+    attendees over the union of the requested windows. Meetings are then
+    placed greedily, hardest first, blocking the slots offered in the first
+    round (vote_slots of them in vote mode) for its attendees and the host
+    so later meetings don't overlap them. The availability stored with each
+    meeting includes the holds of the meetings placed before it, so
+    candidates re-checked after a decline avoid those too.
+
+    Args:
+        specs (list): dicts with 'title', 'description', 'duration' (minutes),
+                      'start_time', 'end_time' (aware datetimes), 'attendees'
+                      and optionally 'vote_slots'.
+
+    Returns:
+        list: the created AutoScheduleMeeting objects, in the order of specs.
+              Meetings without a free slot are stored as 'failed'.
+
+    Raises:
+        UnknownAttendees: some attendees are not users of the tenant.
+        PlanningFailed: a Graph lookup failed. Nothing is stored then.
+    """
+    tz_info = tz.gettz(time_zone)
+    emails = list(dict.fromkeys(email for spec in specs for email in spec['attendees']))
+    window_start = min(spec['start_time'] for spec in specs).astimezone(tz_info).replace(tzinfo=None)
+    window_end = max(spec['end_time'] for spec in specs).astimezone(tz_info).replace(tzinfo=None)
+
+    # Every Graph call happens here, before anything is stored
+    try:
+        # 獲取與會者信息 (deduplicated across all meetings)
+        users = get_users_by_email(token, emails)
+        unknown = [email for email in emails if email not in users]
+        if unknown:
+            raise UnknownAttendees(unknown)
+        user_ids = {email: user['id'] for email, user in users.items()}
+        chat_ids = dict(zip(emails, get_chat_ids(token, [user_ids[email] for email in emails])))
+        engine = FreeBusyEngine.from_graph(token, emails + [host_email], window_start, window_end, time_zone)
+    except UnknownAttendees:
+        raise
+    except Exception as e:
+        raise PlanningFailed(f"Microsoft Graph request failed: {e}") from e
+
+    meetings = []
+    for spec in specs:
+        meeting = AutoScheduleMeeting(
+            title=spec.get('title', ''),
+            description=spec.get('description', ''),
+            duration=int(spec['duration']),
+            start_time=spec['start_time'],
+            end_time=spec['end_time'],
+            host_email=host_email,
+            time_zone=time_zone,
+            status='pending',
+            vote_slots=spec.get('vote_slots', 0)
+        )
+        meeting.set_attendees(
+            spec['attendees'],
+            [user_ids[email] for email in spec['attendees']],
+            [chat_ids[email] for email in spec['attendees']])
+        meetings.append(meeting)
+
+    # Place the most constrained meetings first
+    order = sorted(range(len(specs)), key=lambda i: (-len(specs[i]['attendees']), -int(specs[i]['duration'])))
+    for i in order:
+        meeting = meetings[i]
+        participants = meeting.get_attendees() + [host_email]
+        start, end = _local_window(meeting)
+        slots = engine.rank_slots(participants, meeting.duration, start, end, limit=limit)
+        meeting.availability = engine.subset(participants).to_dict()
+        meeting.set_candidate_times(slots)
+        if slots:
+            # Hold every time the first round offers (all of them in vote mode)
+            for slot, _ in zip(slots, range(meeting.vote_slots or 1)):
+                engine.mark_busy(participants, slot['start'], slot['end'])
+            meeting.status = 'waiting'
+        else:
+            meeting.status = 'failed'
+
+    return AutoScheduleMeeting.objects.bulk_create(meetings)
@@ -0,0 +1,199 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""
+Column resolution and notification rules for the sprint workbook sheets.
+
+Columns are located by their header text (see COLUMN_ALIASES); templates
+whose headers don't match fall back to the historical positions in
+DEFAULT_COLUMNS. The mapping is cached per distinct header row.
+
+Rules are plain dicts (settings.SHEET_RULES or SharePointClientConfig.rules)
+compiled once into predicates over whole DataFrame columns, so a sheet is
+evaluated in one vectorized pass however many rules are configured:
+
+    {'kind': 'missing', 'field': 'EST_start_BE', 'reason': '...'}
+    {'kind': 'overdue', 'field': 'due_date_BE', 'unless': 'MR', 'reason': '...'}
+    {'kind': 'over_estimate', 'field': 'spent_days_BE', 'estimate': 'EST_days_BE', 'reason': '...'}
+    {'kind': 'stale', 'field': 'MR', 'since': 'due_date_BE', 'days': 7, 'reason': '...'}
+
+The owner's reply is written to the rule's `reply_to` column (default:
+`field`) of the matching row.
+"""
+
+import logging
+import re
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# column index for the template sheet, used when a header can't be found
+DEFAULT_COLUMNS = {
+    "Task": 4, "Owner": 5, "EST_start_BE": 6, "EST_start_FE": 7,
+    "EST_days_BE": 8, "EST_days_FE": 9, "spent_days_BE": 10,
+    "spent_days_FE": 11, "due_date_BE": 12, "due_date_FE": 13,
+    "Note": 14, "MR": 15, "teams_group_name": 16
+}
+
+# Other header spellings accepted for a column (compared after _normalize)
+COLUMN_ALIASES = {
+    "Owner": ["assignee", "owner email"],
+    "MR": ["merge request"],
+    "teams_group_name": ["teams group", "teams chat", "group name"],
+}
+
+# A row is only considered when these are filled in
+REQUIRED_COLUMNS = ("Task", "Owner", "teams_group_name")
+
+def _normalize(header):
+    return re.sub(r'[^0-9a-z]', '', str(header).lower())
+
+@lru_cache(maxsize=128)
+def resolve_columns(headers):
+    """
+    Map column names to positions for a sheet with the given header row.
+
+    Args:
+        headers (tuple): the sheet's header cells, in order.
+
+    Returns:
+        dict: column name (DEFAULT_COLUMNS names and raw headers) -> 0-based
+        position, for the columns present.
+    """
+    positions = {}
+    for index, header in enumerate(headers):
+        positions.setdefault(_normalize(header), index)
+
+    columns = {}
+    for name, fallback in DEFAULT_COLUMNS.items():
+        for candidate in [name] + COLUMN_ALIASES.get(name, []):
+            if _normalize(candidate) in positions:
+                columns[name] = positions[_normalize(candidate)]
+                break
+        else:
+            if fallback < len(headers):
+                logger.debug("Header %s not found, using column %d", name, fallback)
+                columns[name] = fallback
+    # Rules may also name any other column by its header text
+    for index, header in enumerate(headers):
+        columns.setdefault(header, index)
+    return columns
+
+class _Sheet:
+    """Column accessors over one DataFrame, converting each column at most once."""
+    def __init__(self, df, columns, today):
+        self.df = df
+        self.columns = columns
+        self.today = today
+        self._converted = {}
+
+    def _get(self, name, kind):
+        key = (name, kind)
+        if key not in self._converted:
+            raw = self.df.iloc[:, self.columns[name]]
+            if kind == 'date':
+                value = pd.to_datetime(raw, errors='coerce')
+            elif kind == 'number':
+                value = pd.to_numeric(raw, errors='coerce')
+            else:
+                value = raw.isna() | raw.astype(str).str.strip().eq('')
+            self._converted[key] = value
+        return self._converted[key]
+
+    def blank(self, name):
+        return self._get(name, 'blank').to_numpy()
+
+    def date(self, name):
+        return self._get(name, 'date')
+
+    def number(self, name):
+        return self._get(name, 'number')
+
+def _missing(rule):
+    def predicate(sheet):
+        return sheet.blank(rule['field'])
+    return predicate, [rule['field']]
+
+def _overdue(rule):
+    unless = rule.get('unless')
+    def predicate(sheet):
+        mask = (sheet.date(rule['field']) < sheet.today).to_numpy()
+        if unless:
+            mask = mask & sheet.blank(unless)
+        return mask
+    return predicate, [rule['field']] + ([unless] if unless else [])
+
+def _over_estimate(rule):
+    def predicate(sheet):
+        return (sheet.number(rule['field']) > sheet.number(rule['estimate'])).to_numpy()
+    return predicate, [rule['field'], rule['estimate']]
+
+def _stale(rule):
+    days = pd.Timedelta(days=rule.get('days', 7))
+    def predicate(sheet):
+        overdue = (sheet.date(rule['since']) + days < sheet.today).to_numpy()
+        return ~sheet.blank(rule['field']) & overdue
+    return predicate, [rule['field'], rule['since']]
+
+RULE_KINDS = {
+    'missing': _missing,
+    'overdue': _overdue,
+    'over_estimate': _over_estimate,
+    'stale': _stale,
+}
+
+def compile_rules(rules):
+    """
+    Validate rule dicts and turn them into (reason, reply_to, columns, predicate)
+    tuples. Raises ValueError for unknown kinds or incomplete rules.
+    """
+    compiled = []
+    for rule in rules:
+        kind = rule.get('kind')
+        if kind not in RULE_KINDS:
+            raise ValueError(f"Unknown rule kind '{kind}'")
+        if not rule.get('field') or not rule.get('reason'):
+            raise ValueError(f"Rule {rule} needs a field and a reason")
+        try:
+            predicate, needed = RULE_KINDS[kind](rule)
+        except KeyError as e:
+            raise ValueError(f"Rule {rule} is missing {e}")
+        reply_to = rule.get('reply_to', rule['field'])
+        needed = list(dict.fromkeys(needed + [reply_to]))
+        compiled.append((rule['reason'], reply_to, needed, predicate))
+    return compiled
+
+def evaluate(df, rules, today=None):
+    """
+    Run compiled rules over a sheet.
+
+    Returns:
+        (columns, matches): the resolved column map and a list of
+        (row position, reason, reply column position) in sheet order, or
+        (None, []) when the sheet lacks the required columns.
+    """
+    columns = resolve_columns(tuple(str(header) for header in df.columns))
+    if any(name not in columns for name in REQUIRED_COLUMNS):
+        logger.warning("Sheet has no %s column, skipped", '/'.join(n for n in REQUIRED_COLUMNS if n not in columns))
+        return None, []
+
+    today = pd.Timestamp.today().normalize() if today is None else pd.Timestamp(today)
+    sheet = _Sheet(df, columns, today)
+    eligible = np.ones(len(df), dtype=bool)
+    for name in REQUIRED_COLUMNS:
+        eligible &= ~sheet.blank(name)
+
+    active = [rule for rule in rules if all(name in columns for name in rule[2])]
+    for reason, _, needed, _ in rules:
+        if not all(name in columns for name in needed):
+            logger.warning("Rule '%s' skipped, sheet lacks %s", reason, [n for n in needed if n not in columns])
+    if not active:
+        return columns, []
+
+    # rows x rules, every predicate runs once over whole columns
+    hits = np.column_stack([predicate(sheet) for _, _, _, predicate in active]) & eligible[:, None]
+    rows, rule_idx = np.nonzero(hits)
+    matches = [(int(row), active[r][0], columns[active[r][1]]) for row, r in zip(rows, rule_idx)]
+    return columns, matches
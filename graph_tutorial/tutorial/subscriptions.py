@@ -0,0 +1,151 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import json
+import logging
+import re
+import secrets
+from datetime import timedelta
+from django.utils import timezone
+from tutorial import metrics
+from tutorial.models import ChatSubscription, ChatMessageNotification
+
+logger = logging.getLogger(__name__)
+
+# Subscriptions on chat messages (without resource data) live at most an hour
+SUBSCRIPTION_LIFETIME = timedelta(minutes=55)
+RENEW_BEFORE = timedelta(minutes=15)
+
+# resource looks like chats('19:abc@thread.v2')/messages('1700000000000')
+_RESOURCE = re.compile(r"chats\('([^']+)'\)/messages\('([^']+)'\)")
+
+class SubscriptionManager:
+    """
+    Keeps one "created" subscription on /chats/{id}/messages for every chat
+    the client tracks, renewing them before they expire. Subscriptions of
+    chats that are no longer tracked are simply left to expire; their inbox
+    rows are purged once no live subscription covers the chat.
+    """
+
+    def __init__(self, client, notification_url):
+        self.client = client
+        self.notification_url = notification_url
+
+    def sync(self, chat_ids):
+        chat_ids = set(chat_ids)
+        now = timezone.now()
+        ChatSubscription.objects.filter(expiration__lte=now).exclude(chat_id__in=chat_ids).delete()
+        existing = {sub.chat_id: sub for sub in ChatSubscription.objects.filter(chat_id__in=chat_ids)}
+
+        for chat_id in chat_ids:
+            sub = existing.get(chat_id)
+            try:
+                if sub is None or sub.expiration <= now:
+                    if sub is not None:
+                        sub.delete()
+                    self._create(chat_id, now)
+                elif sub.expiration - now < RENEW_BEFORE:
+                    expiration = now + SUBSCRIPTION_LIFETIME
+                    self.client.renew_subscription(sub.subscription_id, expiration)
+                    sub.expiration = expiration
+                    sub.save(update_fields=['expiration'])
+            except Exception as e:
+                # Polling still covers the chat until the next sync
+                logger.warning("Subscription sync failed for chat %s: %s", chat_id, e)
+        purge_inbox()
+
+    def _create(self, chat_id, now):
+        client_state = secrets.token_urlsafe(32)
+        expiration = now + SUBSCRIPTION_LIFETIME
+        created = self.client.create_subscription(
+            f"/chats/{chat_id}/messages", self.notification_url, expiration, client_state)
+        ChatSubscription.objects.create(
+            subscription_id=created['id'],
+            chat_id=chat_id,
+            client_state=client_state,
+            expiration=expiration)
+
+def _well_formed(notification):
+    return isinstance(notification, dict) and all(
+        isinstance(notification.get(key) or '', str) for key in ('subscriptionId', 'clientState', 'resource'))
+
+def accept_notifications(body):
+    """
+    Validate a change-notification POST body and store its notifications in
+    the inbox. Notifications with an unknown subscription or a wrong
+    clientState are dropped.
+
+    Returns:
+        int: number of notifications accepted.
+
+    Raises:
+        ValueError: the body isn't {"value": [notification, ...]}.
+    """
+    payload = json.loads(body)
+    notifications = payload.get('value', []) if isinstance(payload, dict) else None
+    if not isinstance(notifications, list) or not all(_well_formed(n) for n in notifications):
+        raise ValueError("Expected {'value': [notification, ...]}")
+    subscriptions = {
+        sub.subscription_id: sub for sub in ChatSubscription.objects.filter(
+            subscription_id__in=[n.get('subscriptionId') for n in notifications])
+    }
+
+    inbox = []
+    for notification in notifications:
+        sub = subscriptions.get(notification.get('subscriptionId'))
+        if sub is None or not secrets.compare_digest(sub.client_state, notification.get('clientState') or ''):
+            logger.warning("Rejected notification for subscription %s", notification.get('subscriptionId'))
+            continue
+        match = _RESOURCE.search(notification.get('resource', ''))
+        if not match:
+            continue
+        inbox.append(ChatMessageNotification(
+            subscription_id=sub.subscription_id,
+            chat_id=match.group(1),
+            message_id=match.group(2)))
+
+    ChatMessageNotification.objects.bulk_create(inbox)
+    return len(inbox)
+
+def drain_inbox(client, chat_ids=None):
+    """
+    Fetch the messages announced in the inbox and match them against the
+    client's notifications. Only chats in `chat_ids` are drained when given.
+
+    Returns:
+        int: number of replies written back.
+    """
+    pending = ChatMessageNotification.objects.filter(processed=False)
+    if chat_ids is not None:
+        pending = pending.filter(chat_id__in=set(chat_ids))
+
+    # Our own notification messages also trigger "created" notifications
+    own_messages = set()
+    for msg_ids in client.notifications().filter(replied=False).values_list('msg_id', flat=True):
+        own_messages.update(msg_ids)
+
+    written = 0
+    with metrics.span('drain_inbox'):
+        for notification in pending.order_by('id'):
+            if notification.message_id in own_messages:
+                ChatMessageNotification.objects.filter(pk=notification.pk).update(processed=True)
+                continue
+            try:
+                message = client.get_message(notification.chat_id, notification.message_id)
+                written += client.ingest_message(notification.chat_id, message)
+            except Exception as e:
+                # Left to the reconciliation poll
+                logger.warning("Failed to ingest message %s: %s", notification.message_id, e)
+            ChatMessageNotification.objects.filter(pk=notification.pk).update(processed=True)
+    return written
+
+def purge_inbox(older_than=timedelta(days=1)):
+    """
+    Delete processed notifications older than `older_than`, and every
+    notification of a chat no live subscription covers any more: nobody
+    tracks that chat, so nobody would drain them.
+    """
+    now = timezone.now()
+    ChatMessageNotification.objects.filter(processed=True, received_at__lt=now - older_than).delete()
+    live = ChatSubscription.objects.filter(expiration__gt=now).values('chat_id')
+    ChatMessageNotification.objects.exclude(chat_id__in=live).delete()
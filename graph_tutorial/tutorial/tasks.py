@@ -0,0 +1,114 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""
+Graph side effects run through the job queue (tutorial.jobs).
+
+Views and the SharePoint client call the enqueue_* helpers; the handlers
+below run in `manage.py run_jobs` workers. Every job carries an
+idempotency key so repeated polls or page refreshes don't repeat a side
+effect.
+
+`auth` is a tutorial.tokens.TokenProvider or a raw access token. Jobs
+store the provider's key, so a job that waits or retries past the expiry
+of the token it was queued with still gets a valid one.
+"""
+
+from django.utils import timezone
+from tutorial.graph.core import GRAPH_URL, graph_request
+from tutorial.graph.calendar import create_event
+from tutorial.graph.teams import send_meeting_card
+from tutorial.jobs import enqueue, enqueue_many, job_handler
+from tutorial.models import AutoScheduleMeeting, TaskNotification
+from tutorial.tokens import auth_payload, payload_provider
+
+# Attendees are waiting on these, run them before SharePoint bookkeeping
+MEETING_PRIORITY = 10
+
+def _headers(token):
+    return {
+        'Authorization': f'Bearer {token}',
+        'Content-Type': 'application/json',
+    }
+
+def enqueue_inform_attendees(auth, meeting):
+    """One card job per attendee for the meeting's current candidate time, queued in one insert."""
+    auth = auth_payload(auth)
+    enqueue_many('send_meeting_card', {
+        f'send_meeting_card:{meeting.uuid}:{meeting.current_try}:{email}': {
+            **auth,
+            'meeting_uuid': str(meeting.uuid),
+            'current_try': meeting.current_try,
+            'email': email,
+        } for email, data in meeting.get_attendee_responses().items() if data.get('chat_id')
+    }, priority=MEETING_PRIORITY)
+
+def enqueue_create_event(auth, meeting):
+    enqueue('create_event', {
+        **auth_payload(auth),
+        'meeting_uuid': str(meeting.uuid),
+    }, priority=MEETING_PRIORITY, idempotency_key=f'create_event:{meeting.uuid}')
+
+def enqueue_write_cell(auth, task, url, values):
+    enqueue('write_cell', {
+        **auth_payload(auth),
+        'task_uuid': str(task.uuid),
+        'url': url,
+        'values': values,
+    }, idempotency_key=f'write_cell:{task.uuid}')
+
+def enqueue_send_notification(auth, task, chat_id, message_payload):
+    enqueue('send_notification', {
+        **auth_payload(auth),
+        'task_uuid': str(task.uuid),
+        'chat_id': chat_id,
+        'message': message_payload,
+    }, idempotency_key=f'send_notification:{task.uuid}:{len(task.msg_id)}')
+
+@job_handler('send_meeting_card')
+def send_meeting_card_job(payload):
+    meeting = AutoScheduleMeeting.objects.get(uuid=payload['meeting_uuid'])
+    # The meeting moved on to another candidate or finished meanwhile
+    if meeting.status != 'waiting' or meeting.current_try != payload['current_try']:
+        return
+    send_meeting_card(payload_provider(payload).token(), meeting, payload['email'])
+
+@job_handler('create_event')
+def create_event_job(payload):
+    meeting = AutoScheduleMeeting.objects.get(uuid=payload['meeting_uuid'])
+    attendees_emails = list(meeting.get_attendee_responses().keys())
+    attendees_emails.append(meeting.host_email)
+    response = create_event(
+        payload_provider(payload).token(),
+        meeting.title,
+        meeting.selected_time["start"],
+        meeting.selected_time["end"],
+        attendees_emails,
+        meeting.description,
+        meeting.time_zone
+    )
+    if response.status_code != 201:
+        raise Exception(f"Failed to create event: {response.status_code} {response.text}")
+
+@job_handler('write_cell')
+def write_cell_job(payload):
+    res = graph_request('PATCH', payload['url'], headers=_headers(payload_provider(payload).token()),
+                        json={"values": payload['values']})
+    if res.status_code != 200:
+        raise Exception(f"PATCH failed: {res.status_code} {res.text}")
+    TaskNotification.objects.filter(uuid=payload['task_uuid']).update(replied=True, updated_at=timezone.now())
+
+@job_handler('send_notification')
+def send_notification_job(payload):
+    task = TaskNotification.objects.filter(uuid=payload['task_uuid']).first()
+    if task is None:
+        # Dropped by a newer scan before the message went out
+        return
+    url = f"{GRAPH_URL}/chats/{payload['chat_id']}/messages"
+    response = graph_request('POST', url, headers=_headers(payload_provider(payload).token()), json=payload['message'])
+    if response.status_code >= 300:
+        raise Exception(f"Failed to send message: {response.status_code} {response.text}")
+    msg_id = response.json()['id']
+    if msg_id not in task.msg_id:
+        task.msg_id.append(msg_id)
+        task.save(update_fields=['msg_id', 'updated_at'])
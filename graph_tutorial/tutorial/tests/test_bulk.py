@@ -0,0 +1,74 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import json
+from datetime import datetime
+from unittest import mock
+import requests
+from django.test import TestCase
+from tutorial.models import AutoScheduleMeeting
+from tutorial.scheduling import FreeBusyEngine, PlanningFailed, UnknownAttendees, schedule_meetings_bulk
+
+USERS = {'a@contoso.com': 'id-a', 'b@contoso.com': 'id-b'}
+
+def get_users_by_email(token, emails):
+    return {email: {'id': USERS[email], 'mail': email} for email in emails if email in USERS}
+
+def free_engine(token, emails, start, end, timezone='UTC', interval=15):
+    # Monday 09:00-12:00, everybody free
+    return FreeBusyEngine(datetime(2026, 1, 5, 9, 0), 15,
+                          {email: FreeBusyEngine._parse_view('0' * 12, 12) for email in emails})
+
+def spec(title, attendees, vote_slots=0):
+    return {'title': title, 'duration': 60, 'attendees': attendees, 'vote_slots': vote_slots,
+            'start_time': datetime.fromisoformat('2026-01-05T09:00:00+00:00'),
+            'end_time': datetime.fromisoformat('2026-01-05T12:00:00+00:00')}
+
+@mock.patch('tutorial.scheduling.FreeBusyEngine.from_graph', free_engine)
+@mock.patch('tutorial.scheduling.get_chat_ids', lambda token, user_ids: [f'chat-{i}' for i in user_ids])
+@mock.patch('tutorial.scheduling.get_users_by_email', get_users_by_email)
+class BulkScheduleTests(TestCase):
+
+    def post(self, meetings):
+        session = self.client.session
+        session['user'] = {'is_authenticated': True, 'name': 'Host User',
+                           'email': 'host@contoso.com', 'timeZone': 'UTC'}
+        session.save()
+        with mock.patch('tutorial.views.get_token', return_value='token'):
+            return self.client.post('/api/meetings/bulk/', json.dumps({'meetings': meetings}),
+                                    content_type='application/json')
+
+    def raw(self, attendees):
+        return {'title': 'Sync', 'duration': 60, 'attendees': attendees,
+                'start_time': '2026-01-05T09:00:00', 'end_time': '2026-01-05T12:00:00'}
+
+    def test_meetings_sharing_attendees_do_not_overlap(self):
+        first, second = schedule_meetings_bulk('token', [
+            spec('one', ['a@contoso.com']),
+            spec('two', ['a@contoso.com', 'b@contoso.com'], vote_slots=2),
+        ], 'host@contoso.com', 'UTC')
+
+        self.assertEqual((first.status, second.status), ('waiting', 'waiting'))
+        # The harder meeting goes first and holds both offered times
+        offered = [slot['start'] for slot in second.get_candidate_times()[:2]]
+        self.assertEqual(offered, ['2026-01-05T09:00:00', '2026-01-05T10:00:00'])
+        self.assertEqual(first.get_candidate_time()['start'], '2026-01-05T11:00:00')
+        self.assertEqual(AutoScheduleMeeting.objects.count(), 2)
+
+    def test_unknown_attendees_are_listed(self):
+        with self.assertRaises(UnknownAttendees):
+            schedule_meetings_bulk('token', [spec('one', ['x@contoso.com'])], 'host@contoso.com', 'UTC')
+
+        response = self.post([self.raw(['a@contoso.com', 'x@contoso.com']), self.raw(['y@contoso.com'])])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['attendees'], ['x@contoso.com', 'y@contoso.com'])
+        self.assertFalse(AutoScheduleMeeting.objects.exists())
+
+    def test_graph_failures_store_nothing(self):
+        failure = mock.Mock(side_effect=requests.ConnectionError('connection reset'))
+        with mock.patch('tutorial.scheduling.get_chat_ids', failure):
+            with self.assertRaises(PlanningFailed):
+                schedule_meetings_bulk('token', [spec('one', ['a@contoso.com'])], 'host@contoso.com', 'UTC')
+            response = self.post([self.raw(['a@contoso.com'])])
+        self.assertEqual(response.status_code, 502)
+        self.assertFalse(AutoScheduleMeeting.objects.exists())
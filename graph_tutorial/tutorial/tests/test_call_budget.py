@@ -0,0 +1,74 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import math
+from unittest import mock
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from benchmarks.simulator import GRAPH_HOST, GraphSimulator
+from tutorial.call_budget import BudgetExceeded, call_budget
+from tutorial.graph import core as graph_core
+from tutorial.graph.core import USER_LOOKUP_BATCH_SIZE
+from tutorial.graph.teams import get_chat_ids
+from tutorial.models import AutoScheduleMeeting, Job
+
+TOKEN = 'simulated-token'
+
+
+class CallBudgetTests(TestCase):
+    """Graph calls and queries of the hot paths, against the simulator."""
+
+    def setUp(self):
+        cache.clear()
+        self.sim = GraphSimulator(users=50, chats=200, messages=100, rows=10, page_size=50)
+        self.sim.install(graph_core._session)
+        self.addCleanup(graph_core._session.adapters.pop, GRAPH_HOST)
+
+    def schedule(self, attendees):
+        client = Client()
+        session = client.session
+        session['user'] = {'is_authenticated': True, 'name': 'Host User',
+                           'email': 'host@contoso.com', 'timeZone': 'UTC'}
+        session.save()
+        with mock.patch('tutorial.views.get_token', return_value=TOKEN):
+            return client.post('/auto-schedule-meeting', {
+                'title': 'Sprint planning',
+                'description': 'tests',
+                'duration': '60',
+                'start_time': '2025-01-06T09:00:00',
+                'end_time': '2025-01-10T18:00:00',
+                'attendees': [f'user{i}@contoso.com' for i in range(attendees)],
+            })
+
+    def test_get_chat_ids_walks_the_chats_once(self):
+        pages = math.ceil(200 / 50)
+        for count in (5, 40):
+            with call_budget(graph=pages, db=0) as usage:
+                chat_ids = get_chat_ids(TOKEN, [f'user-{i}' for i in range(count)])
+            self.assertEqual(sum(1 for chat_id in chat_ids if chat_id), count)
+            self.assertEqual(usage.graph_calls, pages)
+
+    @override_settings(CALL_BUDGETS_STRICT=True)
+    def test_schedule_meeting(self):
+        pages = math.ceil(200 / 50)
+        for count in (3, 12):
+            # /me, one user lookup, the chats walk and one getSchedule; the
+            # database sees the session, the meeting and one lookup and one
+            # insert for all card jobs, however many attendees there are
+            with call_budget(graph=pages + 3, db=10) as usage:
+                response = self.schedule(count)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(AutoScheduleMeeting.objects.order_by('-id').first().status, 'waiting')
+            self.assertEqual((usage.graph_calls, usage.db_queries), (pages + 3, 10))
+            self.assertEqual(Job.objects.filter(kind='send_meeting_card').count(), count)
+            Job.objects.all().delete()
+
+    def test_attendees_are_looked_up_in_batches(self):
+        with call_budget() as usage:
+            self.schedule(40)
+        self.assertEqual(usage.graph['GET /users'], math.ceil(40 / USER_LOOKUP_BATCH_SIZE))
+
+    def test_budget_exceeded(self):
+        with self.assertRaises(BudgetExceeded):
+            with call_budget(graph=0):
+                get_chat_ids(TOKEN, ['user-1'])
@@ -0,0 +1,93 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+from datetime import timedelta
+from django.test import TestCase
+from django.utils import timezone
+from tutorial import dashboard
+from tutorial.models import DeletedTaskNotification, TaskNotification
+
+
+class DashboardApiTests(TestCase):
+
+    def setUp(self):
+        session = self.client.session
+        session['user'] = {'is_authenticated': True, 'name': 'Host User',
+                           'email': 'host@contoso.com', 'timeZone': 'UTC'}
+        session.save()
+        self.base = timezone.now() - timedelta(minutes=10)
+
+    def notification(self, row, seconds):
+        notification = TaskNotification.objects.create(
+            sheet_name='tasks', row=row, task=f'Task {row}', owner_id='u1', owner_email='owner@contoso.com',
+            owner_name='Owner', teams_group_id='19:chat', teams_group_name='Team', field_address=f'A{row}',
+            reason='overdue')
+        TaskNotification.objects.filter(pk=notification.pk).update(updated_at=self.base + timedelta(seconds=seconds))
+        return notification.pk
+
+    def tombstone(self, notification_id, seconds):
+        DeletedTaskNotification.objects.create(notification_id=notification_id,
+                                               deleted_at=self.base + timedelta(seconds=seconds))
+
+    def feed(self, **params):
+        response = self.client.get('/api/notifications/changes/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_keyset_pages(self):
+        ids = [self.notification(row, row) for row in range(5)]
+        seen, after = [], 0
+        while after is not None:
+            page = self.client.get('/api/notifications/', {'after': after, 'limit': 2}).json()
+            seen.append([row['id'] for row in page['results']])
+            after = page['next']
+        self.assertEqual(seen, [ids[:2], ids[2:4], ids[4:]])
+
+    def test_unchanged_page_is_not_modified(self):
+        pk = self.notification(1, 0)
+        first = self.client.get('/api/notifications/')
+        etag = first.headers['ETag']
+        self.assertEqual(self.client.get('/api/notifications/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        TaskNotification.objects.get(pk=pk).save()
+        changed = self.client.get('/api/notifications/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed.headers['ETag'], etag)
+
+    def test_cursor_round_trip(self):
+        moment = timezone.now().replace(microsecond=123456)
+        for kind in (dashboard.CHANGE, dashboard.REMOVAL):
+            self.assertEqual(dashboard.decode_cursor(dashboard.encode_cursor(moment, kind, 42)), (moment, kind, 42))
+        for cursor in ('abc', '1-2-3', '12-rx'):
+            self.assertEqual(self.client.get('/api/notifications/changes/', {'cursor': cursor}).status_code, 400)
+
+    def test_changes_and_removals_interleave(self):
+        first = self.notification(1, 0)
+        self.tombstone(901, 1)
+        second = self.notification(2, 1)
+        self.tombstone(902, 2)
+
+        entries, cursor = [], None
+        for _ in range(6):
+            feed = self.feed(limit=1, **({'cursor': cursor} if cursor else {}))
+            entries += [('changed', row['id']) for row in feed['changes']] + [('removed', pk) for pk in feed['removed']]
+            cursor = feed['cursor']
+            if not feed['more']:
+                break
+        # At one timestamp changes come before removals
+        self.assertEqual(entries, [('changed', first), ('changed', second), ('removed', 901), ('removed', 902)])
+        self.assertEqual(self.feed(cursor=cursor)['changes'], [])
+
+    def test_recent_changes_wait_for_the_lag(self):
+        pk = self.notification(1, 0)
+        TaskNotification.objects.filter(pk=pk).update(updated_at=timezone.now())
+        feed = self.feed()
+        self.assertEqual(feed['changes'], [])
+
+        # The cursor stops at the horizon, so the change is picked up once it's older than the lag
+        TaskNotification.objects.filter(pk=pk).update(updated_at=timezone.now() - dashboard.FEED_LAG)
+        self.assertEqual([row['id'] for row in self.feed(cursor=feed['cursor'])['changes']], [pk])
+
+    def test_expired_cursor_resets(self):
+        old = timezone.now() - timedelta(days=2)
+        self.assertEqual(self.feed(cursor=dashboard.encode_cursor(old, dashboard.CHANGE, 1)), {'reset': True})
@@ -0,0 +1,72 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import json
+import threading
+import time
+from unittest import mock
+import requests
+from django.test import SimpleTestCase
+from tutorial.graph import core as graph_core
+
+URL = f'{graph_core.GRAPH_URL}/users/someone@contoso.com'
+
+def response(status, payload):
+    result = requests.Response()
+    result.status_code = status
+    result._content = json.dumps(payload).encode()
+    return result
+
+
+class SingleFlightTests(SimpleTestCase):
+    """Identical concurrent GETs share one request (graph_request)."""
+
+    def burst(self, outcome, count=5):
+        started, release = threading.Event(), threading.Event()
+        sent = []
+        results = [None] * count
+
+        def request(method, url, **kwargs):
+            sent.append(url)
+            started.set()
+            release.wait(5)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        def call(i):
+            try:
+                results[i] = graph_core.graph_request('GET', URL, headers={'Authorization': 'Bearer t'})
+            except Exception as e:
+                results[i] = e
+
+        with mock.patch.object(graph_core._session, 'request', side_effect=request):
+            threads = [threading.Thread(target=call, args=(i,)) for i in range(count)]
+            threads[0].start()
+            started.wait(5)
+            for thread in threads[1:]:
+                thread.start()
+            # Let the followers find the leader's request in flight
+            time.sleep(0.2)
+            release.set()
+            for thread in threads:
+                thread.join()
+        return sent, results
+
+    def test_identical_gets_share_one_request(self):
+        answer = response(200, {'id': 'u1'})
+        sent, results = self.burst(answer)
+        self.assertEqual(len(sent), 1)
+        self.assertTrue(all(result is answer for result in results))
+
+    def test_followers_get_the_leaders_exception(self):
+        error = requests.ConnectionError('connection reset')
+        sent, results = self.burst(error)
+        self.assertEqual(len(sent), 1)
+        self.assertTrue(all(result is error for result in results))
+
+    def test_finished_requests_are_not_reused(self):
+        with mock.patch.object(graph_core._session, 'request', return_value=response(200, {})) as request:
+            graph_core.graph_request('GET', URL)
+            graph_core.graph_request('GET', URL)
+        self.assertEqual(request.call_count, 2)
@@ -0,0 +1,139 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import threading
+import time
+from datetime import timedelta
+from django.db import connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from tutorial import jobs
+from tutorial.models import Job
+
+calls = []
+
+@jobs.job_handler('test_ok')
+def ok_job(payload):
+    calls.append(payload)
+
+@jobs.job_handler('test_slow')
+def slow_job(payload):
+    time.sleep(payload['seconds'])
+    calls.append(Job.objects.get(pk=payload['pk']).locked_at)
+
+@jobs.job_handler('test_fail')
+def failing_job(payload):
+    raise RuntimeError('boom')
+
+def make_runnable(job):
+    # Skip the backoff wait
+    Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+
+
+@override_settings(JOB_QUEUE_EAGER=False)
+class JobQueueTests(TestCase):
+
+    def setUp(self):
+        calls.clear()
+
+    def test_idempotency_key_dedupes_live_jobs_only(self):
+        first = jobs.enqueue('test_ok', {'n': 1}, idempotency_key='key')
+        self.assertEqual(jobs.enqueue('test_ok', {'n': 2}, idempotency_key='key').pk, first.pk)
+
+        jobs.run_job(jobs.claim('w1'))
+        self.assertEqual(Job.objects.get(pk=first.pk).status, 'done')
+        again = jobs.enqueue('test_ok', {'n': 3}, idempotency_key='key')
+        self.assertNotEqual(again.pk, first.pk)
+        self.assertEqual(Job.objects.filter(idempotency_key='key').count(), 2)
+
+    def test_failed_job_backs_off_and_is_retried(self):
+        job = jobs.enqueue('test_fail', {})
+        self.assertFalse(jobs.run_job(jobs.claim('w1')))
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.locked_by), ('queued', 1, ''))
+        self.assertIn('RuntimeError: boom', job.last_error)
+        self.assertGreater(job.run_at, timezone.now())
+        # Not picked up again before the backoff ran out
+        self.assertIsNone(jobs.claim('w1'))
+
+        make_runnable(job)
+        self.assertEqual(jobs.claim('w1').attempts, 2)
+
+    def test_job_is_dead_after_max_attempts(self):
+        job = jobs.enqueue('test_fail', {'token': 'secret', 'n': 1}, idempotency_key='dead', max_attempts=2)
+        for _ in range(2):
+            make_runnable(job)
+            jobs.run_job(jobs.claim('w1'))
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('dead', 2))
+        self.assertEqual(job.payload, {'n': 1})
+        make_runnable(job)
+        self.assertIsNone(jobs.claim('w1'))
+
+        # A dead job doesn't hold its key, and isn't requeued over the new one
+        again = jobs.enqueue('test_fail', {'n': 2}, idempotency_key='dead')
+        self.assertNotEqual(again.pk, job.pk)
+        self.assertEqual(jobs.requeue_dead(), 0)
+        Job.objects.filter(pk=again.pk).update(status='dead')
+        self.assertEqual(jobs.requeue_dead(), 1)
+        self.assertEqual(Job.objects.get(pk=again.pk).status, 'queued')
+
+    @override_settings(JOB_LEASE_TIMEOUT=60)
+    def test_outcome_of_a_lost_lease_is_dropped(self):
+        job = jobs.enqueue('test_ok', {'n': 1})
+        claimed = jobs.claim('w1')
+        # w1 stalls past the lease and w2 takes the job over
+        Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(seconds=61))
+        self.assertEqual(jobs.claim('w2').locked_by, 'w2')
+
+        self.assertFalse(jobs.run_job(claimed))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.locked_by, job.attempts), ('running', 'w2', 2))
+
+
+@override_settings(JOB_QUEUE_EAGER=False)
+class WorkerTests(TransactionTestCase):
+
+    def setUp(self):
+        calls.clear()
+
+    def test_each_job_is_claimed_once(self):
+        for n in range(5):
+            jobs.enqueue('test_ok', {'n': n})
+        barrier = threading.Barrier(8)
+        claimed, errors = [], []
+
+        def worker(i):
+            try:
+                barrier.wait()
+                while True:
+                    job = jobs.claim(f'w{i}')
+                    if job is None:
+                        return
+                    claimed.append(job.pk)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(sorted(claimed), sorted(Job.objects.values_list('pk', flat=True)))
+        self.assertEqual(set(Job.objects.values_list('attempts', flat=True)), {1})
+
+    @override_settings(JOB_LEASE_TIMEOUT=0.3)
+    def test_lease_is_renewed_while_running(self):
+        job = jobs.enqueue('test_slow', {'seconds': 0.35})
+        Job.objects.filter(pk=job.pk).update(payload={'seconds': 0.35, 'pk': job.pk})
+        claimed = jobs.claim('w1')
+
+        self.assertTrue(jobs.run_job(claimed))
+        self.assertGreater(calls[0], claimed.locked_at)
+        self.assertEqual(Job.objects.get(pk=job.pk).status, 'done')
@@ -0,0 +1,70 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import threading
+from datetime import datetime, timezone
+from django.db import connections
+from django.test import TransactionTestCase
+from tutorial.models import AutoScheduleMeeting
+from tutorial.scheduling import FreeBusyEngine, settle_meeting
+
+def make_meeting(emails, candidates=3):
+    """A waiting meeting over `emails` (tenant ids t0, t1, ...) with hourly candidates."""
+    now = datetime.now(timezone.utc)
+    meeting = AutoScheduleMeeting(host_email='host@contoso.com', duration=60, start_time=now, end_time=now,
+                                  status='waiting')
+    meeting.set_attendees(emails, [f't{i}' for i in range(len(emails))], None)
+    engine = FreeBusyEngine(datetime(2026, 1, 5, 8, 0), 15,
+                            {email: FreeBusyEngine._parse_view('0' * 36, 36) for email in emails})
+    meeting.availability = engine.to_dict()
+    meeting.set_candidate_times(engine.rank_slots(emails, 60, limit=candidates))
+    meeting.save()
+    return meeting
+
+
+class CompareAndSwapTests(TransactionTestCase):
+    """Responses and polls landing at the same time (AutoScheduleMeeting.version)."""
+
+    def run_threads(self, count, target):
+        barrier = threading.Barrier(count)
+        errors = []
+
+        def run(i):
+            try:
+                barrier.wait()
+                target(i)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def test_parallel_responses_are_all_kept(self):
+        emails = [f'user{i}@contoso.com' for i in range(20)]
+        meeting = make_meeting(emails)
+        stale = [AutoScheduleMeeting.objects.get(pk=meeting.pk) for _ in emails]
+        self.run_threads(20, lambda i: stale[i].update_attendee_response(emails[i], 'accepted'))
+
+        meeting.refresh_from_db()
+        self.assertEqual(meeting.get_response_summary()['accepted'], 20)
+        self.assertEqual(meeting.version, 20)
+
+    def test_parallel_polls_advance_once(self):
+        emails = [f'user{i}@contoso.com' for i in range(3)]
+        meeting = make_meeting(emails)
+        meeting.update_attendee_response(emails[0], 'declined')
+        stale = [AutoScheduleMeeting.objects.get(pk=meeting.pk) for _ in range(8)]
+        outcomes = []
+        self.run_threads(8, lambda i: outcomes.append(settle_meeting(stale[i])))
+
+        meeting.refresh_from_db()
+        self.assertEqual(outcomes.count('advanced'), 1)
+        self.assertEqual(outcomes.count(None), 7)
+        self.assertEqual(meeting.current_try, 1)
+        self.assertEqual(meeting.get_response_summary()['pending'], 3)
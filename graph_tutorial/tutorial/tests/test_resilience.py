@@ -0,0 +1,119 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import time
+from unittest import mock
+import requests
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+from tutorial.graph import core as graph_core
+from tutorial.graph import resilience
+
+URL = f'{graph_core.GRAPH_URL}/chats/19:abc/messages'
+
+class CircuitBreakerTests(SimpleTestCase):
+
+    def setUp(self):
+        self.circuit = resilience.CircuitBreaker('chats')
+
+    def fail(self, times):
+        for _ in range(times):
+            self.circuit.before_call()
+            self.circuit.record(False)
+
+    def end_cooldown(self):
+        self.circuit.opened_at -= settings.GRAPH_BREAKER_COOLDOWN
+
+    def test_opens_after_threshold_failures(self):
+        self.fail(settings.GRAPH_BREAKER_THRESHOLD - 1)
+        self.circuit.before_call()
+        self.circuit.record(False)
+        with self.assertRaises(resilience.CircuitOpen):
+            self.circuit.before_call()
+
+    def test_success_resets_the_count(self):
+        self.fail(settings.GRAPH_BREAKER_THRESHOLD - 1)
+        self.circuit.before_call()
+        self.circuit.record(True)
+        self.fail(settings.GRAPH_BREAKER_THRESHOLD - 1)
+        self.circuit.before_call()
+
+    def test_half_open_lets_one_trial_through(self):
+        self.fail(settings.GRAPH_BREAKER_THRESHOLD)
+        self.end_cooldown()
+        self.circuit.before_call()
+        # Everyone else waits for the trial's outcome
+        with self.assertRaises(resilience.CircuitOpen):
+            self.circuit.before_call()
+
+    def test_successful_trial_closes(self):
+        self.fail(settings.GRAPH_BREAKER_THRESHOLD)
+        self.end_cooldown()
+        self.circuit.before_call()
+        self.circuit.record(True)
+        self.circuit.before_call()
+        self.circuit.before_call()
+
+    def test_failed_trial_reopens(self):
+        self.fail(settings.GRAPH_BREAKER_THRESHOLD)
+        self.end_cooldown()
+        self.circuit.before_call()
+        self.circuit.record(False)
+        with self.assertRaises(resilience.CircuitOpen):
+            self.circuit.before_call()
+        self.assertFalse(self.circuit.trial)
+
+
+class GraphRequestBreakerTests(SimpleTestCase):
+
+    def setUp(self):
+        resilience._breakers.clear()
+        self.addCleanup(resilience._breakers.clear)
+
+    def test_open_circuit_skips_the_call(self):
+        error = requests.ConnectionError('connection refused')
+        with mock.patch.object(graph_core._session, 'request', side_effect=error) as request:
+            for _ in range(settings.GRAPH_BREAKER_THRESHOLD):
+                with self.assertRaises(requests.ConnectionError):
+                    graph_core.graph_request('POST', URL)
+            with self.assertRaises(resilience.CircuitOpen):
+                graph_core.graph_request('POST', URL)
+        self.assertEqual(request.call_count, settings.GRAPH_BREAKER_THRESHOLD)
+
+    def test_families_have_their_own_breaker(self):
+        self.assertIs(resilience.breaker(URL), resilience.breaker(f'{graph_core.GRAPH_URL}/chats'))
+        self.assertIsNot(resilience.breaker(URL), resilience.breaker(f'{graph_core.GRAPH_URL}/me/calendarView'))
+
+
+@override_settings(GRAPH_CONNECT_TIMEOUT=5, GRAPH_READ_TIMEOUT=30)
+class DeadlineTests(SimpleTestCase):
+
+    def test_no_deadline_uses_the_settings(self):
+        self.assertIsNone(resilience.remaining())
+        self.assertEqual(resilience.timeouts(URL), (5, 30))
+
+    def test_deadline_shortens_the_timeouts(self):
+        with resilience.deadline(2):
+            connect, read = resilience.timeouts(URL)
+        self.assertLessEqual(connect, 2)
+        self.assertLessEqual(read, 2)
+        self.assertGreater(read, 1)
+
+    def test_nested_deadline_cannot_extend(self):
+        with resilience.deadline(1):
+            with resilience.deadline(60):
+                self.assertLessEqual(resilience.remaining(), 1)
+        self.assertIsNone(resilience.remaining())
+
+    def test_spent_deadline_raises(self):
+        with resilience.deadline(0.01):
+            time.sleep(0.02)
+            with self.assertRaises(resilience.DeadlineExceeded):
+                resilience.timeouts(URL)
+
+    def test_spent_deadline_sends_nothing(self):
+        with mock.patch.object(graph_core._session, 'request') as request:
+            with resilience.deadline(0):
+                with self.assertRaises(resilience.DeadlineExceeded):
+                    graph_core.graph_request('GET', URL)
+        request.assert_not_called()
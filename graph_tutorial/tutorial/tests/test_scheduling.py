@@ -0,0 +1,72 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+from datetime import datetime
+from django.test import SimpleTestCase
+from tutorial.scheduling import FreeBusyEngine
+
+MONDAY = datetime(2026, 1, 5, 9, 0)
+WORKWEEK = {'daysOfWeek': ['monday', 'tuesday', 'wednesday', 'thursday', 'friday'],
+            'startTime': '08:00:00.0000000', 'endTime': '17:00:00.0000000'}
+
+def engine(**views):
+    # 15 minute cells from Monday 09:00
+    return FreeBusyEngine(MONDAY, 15, {f'{name}@contoso.com': FreeBusyEngine._parse_view(view, len(view))
+                                       for name, view in views.items()})
+
+def starts(slots):
+    return [slot['start'][11:16] for slot in slots]
+
+
+class RankSlotsTests(SimpleTestCase):
+
+    def test_slots_do_not_overlap(self):
+        free = engine(a='0' * 12, b='0' * 12)
+        self.assertEqual(starts(free.rank_slots(['a@contoso.com', 'b@contoso.com'], 60)),
+                         ['09:00', '10:00', '11:00'])
+        # Nor do they overlap the excluded ones
+        excluded = [{'start': '2026-01-05T09:30:00', 'end': '2026-01-05T10:30:00'}]
+        self.assertEqual(starts(free.rank_slots(['a@contoso.com'], 60, exclude=excluded)), ['10:30'])
+
+    def test_busy_oof_and_off_hours_block(self):
+        # a: busy 09:00-09:30, out of office 10:00-10:15, off work from 12:00
+        views = engine(a='22003000000055', b='44444444444444')
+        slots = views.rank_slots(['a@contoso.com', 'b@contoso.com'], 30)
+        # Working elsewhere (4) doesn't block
+        self.assertEqual(starts(slots), ['09:30', '10:15', '10:45', '11:15'])
+        self.assertFalse(views.is_free(['a@contoso.com'], '2026-01-05T09:45:00', '2026-01-05T10:15:00'))
+        self.assertTrue(views.is_free(['a@contoso.com'], '2026-01-05T09:30:00', '2026-01-05T10:00:00'))
+
+    def test_tentative_ranks_last(self):
+        views = engine(a='11110000')
+        self.assertEqual(starts(views.rank_slots(['a@contoso.com'], 60)), ['10:00', '09:00'])
+
+    def test_declined_slots_are_blocked(self):
+        views = engine(a='0' * 8, b='0' * 8)
+        views.mark_busy(['a@contoso.com'], '2026-01-05T09:00:00', '2026-01-05T10:00:00')
+        self.assertEqual(starts(views.rank_slots(['a@contoso.com', 'b@contoso.com'], 60)), ['10:00'])
+        self.assertEqual(starts(views.rank_slots(['b@contoso.com'], 60)), ['09:00', '10:00'])
+
+
+class WorkingHoursTests(SimpleTestCase):
+
+    def test_mask_in_the_attendees_time_zone(self):
+        hours = dict(WORKWEEK, timeZone={'name': 'Taipei Standard Time'})
+        # Hourly cells from Sunday 23:00 UTC, i.e. Monday 07:00 in Taipei
+        mask = FreeBusyEngine._working_mask(datetime(2026, 1, 4, 23, 0), 60, 48, hours, 'UTC')
+        self.assertEqual([i for i in range(24) if mask[i]], list(range(1, 10)))
+        # Saturday in Taipei starts Friday 16:00 UTC, outside this grid
+        self.assertEqual(int(mask.sum()), 18)
+
+    def test_mask_follows_daylight_saving(self):
+        hours = dict(WORKWEEK, timeZone={'name': 'Pacific Standard Time'})
+        # Friday 2026-03-06 UTC; Los Angeles moves to PDT on Sunday 03-08
+        mask = FreeBusyEngine._working_mask(datetime(2026, 3, 6), 60, 24 * 4, hours, 'UTC')
+        friday, monday = mask[:24], mask[72:]
+        # Thursday 16:00 PST, then Friday 08:00-17:00
+        self.assertEqual([h for h in range(24) if friday[h]], [0] + list(range(16, 24)))
+        self.assertEqual([h for h in range(24) if monday[h]], list(range(15, 24)))
+
+    def test_meeting_time_zone_is_the_default(self):
+        mask = FreeBusyEngine._working_mask(datetime(2026, 1, 5, 7, 30), 30, 22, WORKWEEK, 'Asia/Taipei')
+        self.assertEqual([i for i in range(22) if mask[i]], list(range(1, 19)))
@@ -0,0 +1,74 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import json
+from datetime import timedelta
+from django.test import TestCase
+from django.utils import timezone
+from tutorial.models import ChatMessageNotification, ChatSubscription
+from tutorial.subscriptions import SubscriptionManager
+
+CHAT = '19:abc@thread.v2'
+
+
+class FakeClient:
+    def __init__(self):
+        self.created = []
+
+    def create_subscription(self, resource, notification_url, expiration, client_state):
+        self.created.append(resource)
+        return {'id': f'sub-{len(self.created)}'}
+
+    def renew_subscription(self, subscription_id, expiration):
+        pass
+
+
+class NotificationWebhookTests(TestCase):
+
+    def setUp(self):
+        ChatSubscription.objects.create(subscription_id='sub-1', chat_id=CHAT, client_state='secret',
+                                        expiration=timezone.now() + timedelta(minutes=30))
+
+    def post(self, payload):
+        body = payload if isinstance(payload, str) else json.dumps(payload)
+        return self.client.post('/webhook/notifications/', body, content_type='application/json')
+
+    def notification(self, client_state='secret', message_id='1700000000000'):
+        return {'subscriptionId': 'sub-1', 'clientState': client_state,
+                'resource': f"chats('{CHAT}')/messages('{message_id}')"}
+
+    def test_validation_handshake(self):
+        response = self.client.post('/webhook/notifications/?validationToken=abc')
+        self.assertEqual(response.content, b'abc')
+
+    def test_accepts_only_matching_client_state(self):
+        response = self.post({'value': [self.notification(), self.notification('wrong', '2')]})
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(list(ChatMessageNotification.objects.values_list('message_id', flat=True)),
+                         ['1700000000000'])
+
+    def test_malformed_payloads_are_refused(self):
+        for payload in ('not json', [], {'value': {}}, {'value': ['x']},
+                        {'value': [{'subscriptionId': ['sub-1']}]}, {'value': [{'resource': 1}]}):
+            self.assertEqual(self.post(payload).status_code, 400, payload)
+        self.assertFalse(ChatMessageNotification.objects.exists())
+
+
+class SubscriptionSyncTests(TestCase):
+
+    def test_sync_purges_the_inbox_of_untracked_chats(self):
+        now = timezone.now()
+        ChatSubscription.objects.create(subscription_id='old', chat_id='19:gone@thread.v2', client_state='s',
+                                        expiration=now - timedelta(minutes=1))
+        ChatMessageNotification.objects.create(subscription_id='old', chat_id='19:gone@thread.v2', message_id='1')
+        processed = ChatMessageNotification.objects.create(subscription_id='old', chat_id=CHAT, message_id='2',
+                                                           processed=True)
+        ChatMessageNotification.objects.filter(pk=processed.pk).update(received_at=now - timedelta(days=2))
+        ChatMessageNotification.objects.create(subscription_id='old', chat_id=CHAT, message_id='3')
+
+        client = FakeClient()
+        SubscriptionManager(client, 'https://example.invalid/webhook/notifications/').sync([CHAT])
+
+        self.assertEqual(client.created, [f'/chats/{CHAT}/messages'])
+        self.assertEqual(list(ChatSubscription.objects.values_list('chat_id', flat=True)), [CHAT])
+        self.assertEqual(list(ChatMessageNotification.objects.values_list('message_id', flat=True)), ['3'])
@@ -0,0 +1,116 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import threading
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from tutorial import tokens
+
+LOCMEM = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+class CountingProvider(tokens.TokenProvider):
+    """Hands out token-1, token-2... and records every acquisition."""
+    key = 'test'
+
+    def __init__(self, release=None):
+        super().__init__()
+        self.calls = []
+        self.release = release
+
+    def _acquire(self, force):
+        if self.release:
+            self.release.wait(5)
+        self.calls.append(force)
+        return f'token-{len(self.calls)}', 3600
+
+    def wait_for_refresh(self):
+        deadline = time.time() + 5
+        while self._refreshing and time.time() < deadline:
+            time.sleep(0.01)
+
+class FailingProvider(CountingProvider):
+    def _acquire(self, force):
+        raise tokens.TokenUnavailable('consent revoked')
+
+
+@override_settings(CACHES=LOCMEM)
+class BackgroundRefreshTests(SimpleTestCase):
+
+    def setUp(self):
+        # Tokens published by earlier tests would be picked up instead of acquired
+        cache.clear()
+
+    def test_missing_token_is_acquired_inline(self):
+        provider = CountingProvider()
+        self.assertEqual(provider.token(), 'token-1')
+        self.assertEqual(provider.token(), 'token-1')
+        self.assertEqual(provider.calls, [False])
+
+    def test_expiring_token_is_refreshed_in_the_background(self):
+        release = threading.Event()
+        provider = CountingProvider(release)
+        provider._token = 'old'
+        # Inside the refresh margin but not yet within the expiry skew
+        provider._expires_at = time.time() + (settings.TOKEN_REFRESH_MARGIN + settings.TOKEN_EXPIRY_SKEW) / 2
+
+        # Callers keep the old token while the refresh is running, and only one refresh starts
+        self.assertEqual(provider.token(), 'old')
+        self.assertEqual(provider.token(), 'old')
+        release.set()
+        provider.wait_for_refresh()
+
+        self.assertEqual(provider.calls, [True])
+        self.assertEqual(provider.token(), 'token-1')
+
+    def test_expired_token_is_refreshed_inline(self):
+        provider = CountingProvider()
+        provider._token = 'old'
+        provider._expires_at = time.time() + settings.TOKEN_EXPIRY_SKEW / 2
+        self.assertEqual(provider.token(), 'token-1')
+
+    def test_other_workers_reuse_the_published_token(self):
+        first, second = CountingProvider(), CountingProvider()
+        self.assertEqual(first.token(), 'token-1')
+        self.assertEqual(second.token(), 'token-1')
+        self.assertEqual(second.calls, [])
+
+    def test_failed_background_refresh_keeps_the_token(self):
+        provider = FailingProvider()
+        provider._token = 'old'
+        provider._expires_at = time.time() + settings.TOKEN_REFRESH_MARGIN / 2
+
+        with self.assertLogs('tutorial.tokens', 'WARNING'):
+            self.assertEqual(provider.token(), 'old')
+            provider.wait_for_refresh()
+        self.assertEqual(provider.token(), 'old')
+
+
+class SealedTokenTests(SimpleTestCase):
+
+    def test_static_token_is_sealed(self):
+        payload = tokens.auth_payload('secret-token')
+        self.assertEqual(list(payload), ['sealed_token'])
+        self.assertNotIn('secret-token', payload['sealed_token'])
+        self.assertEqual(tokens.payload_provider(payload).token(), 'secret-token')
+
+    def test_provider_is_carried_by_key(self):
+        self.assertEqual(tokens.auth_payload(tokens.get_provider('app')), {'auth': 'app'})
+        self.assertIs(tokens.payload_provider({'auth': 'app'}), tokens.get_provider('app'))
+
+    def test_tampered_token_is_refused(self):
+        sealed = tokens.auth_payload('secret-token')['sealed_token']
+        tampered = sealed[:-6] + ('A' if sealed[-6] != 'A' else 'B') + sealed[-5:]
+        with self.assertRaises(tokens.TokenUnavailable):
+            tokens.payload_provider({'sealed_token': tampered})
+
+    def test_changed_secret_key_is_refused(self):
+        payload = tokens.auth_payload('secret-token')
+        with override_settings(SECRET_KEY='another-secret-key'):
+            with self.assertRaises(tokens.TokenUnavailable):
+                tokens.payload_provider(payload)
+
+    def test_legacy_and_empty_tokens(self):
+        self.assertEqual(tokens.auth_payload(None), {'token': None})
+        self.assertEqual(tokens.payload_provider({'token': 'raw'}).token(), 'raw')
@@ -0,0 +1,70 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+from datetime import datetime, timezone
+from django.core.cache import cache
+from django.test import TestCase
+from tutorial.models import AutoScheduleMeeting
+from tutorial.scheduling import FreeBusyEngine
+
+
+class VoteTests(TestCase):
+    """Attendees picking every offered time that works for them."""
+
+    def setUp(self):
+        cache.clear()
+        emails = ['a@contoso.com', 'b@contoso.com']
+        now = datetime.now(timezone.utc)
+        self.meeting = AutoScheduleMeeting(host_email='host@contoso.com', duration=60, start_time=now,
+                                           end_time=now, status='waiting', vote_slots=3)
+        self.meeting.set_attendees(emails, ['t0', 't1'], None)
+        engine = FreeBusyEngine(datetime(2026, 1, 5, 8, 0), 15,
+                                {email: FreeBusyEngine._parse_view('0' * 36, 36) for email in emails})
+        self.meeting.availability = engine.to_dict()
+        self.meeting.set_candidate_times(engine.rank_slots(emails, 60, limit=6))
+        self.meeting.save()
+
+    def url(self, tenant, response):
+        return f'/webhook/response/?tenantId={tenant}&uuid={self.meeting.uuid}&response={response}'
+
+    def status(self):
+        return self.client.get(f'/meeting-status/{self.meeting.uuid}/').json()
+
+    def test_common_slot_is_selected(self):
+        page = self.client.get(self.url('t0', 'vote'))
+        self.assertContains(page, 'type="checkbox"', count=3)
+
+        self.assertEqual(self.client.post(self.url('t0', 'vote'), {'slot': [1, 2]}).status_code, 200)
+        self.assertEqual(self.status()['status'], 'waiting')
+        self.assertEqual(self.client.post(self.url('t1', 'vote'), {'slot': [0, 2]}).status_code, 200)
+
+        status = self.status()
+        self.assertEqual(status['status'], 'done')
+        self.assertEqual(status['selected_time'], self.meeting.get_candidate_times()[2])
+
+    def test_no_common_slot_offers_the_next_ones(self):
+        self.client.post(self.url('t0', 'vote'), {'slot': [0]})
+        self.client.post(self.url('t1', 'vote'), {'slot': [1]})
+        self.assertEqual(self.status()['status'], 'waiting')
+
+        self.meeting.refresh_from_db()
+        self.assertEqual([index for index, _ in self.meeting.get_offered_times()], [3, 4, 5])
+        # Votes for times that are no longer offered are refused
+        self.assertEqual(self.client.post(self.url('t0', 'vote'), {'slot': [0]}).status_code, 400)
+
+    def test_declining_every_time(self):
+        self.assertEqual(self.client.get(self.url('t0', 'declined')).status_code, 200)
+        self.status()
+        self.meeting.refresh_from_db()
+        self.assertEqual(self.meeting.current_try, 3)
+
+    def test_invalid_answers_are_refused(self):
+        self.assertEqual(self.client.get(self.url('t0', 'accepted')).status_code, 400)
+        self.assertEqual(self.client.post(self.url('t0', 'vote'), {}).status_code, 400)
+        self.assertEqual(self.client.post(self.url('t0', 'vote'), {'slot': ['x']}).status_code, 400)
+        self.meeting.refresh_from_db()
+        self.assertEqual(self.meeting.get_attendee_responses()['a@contoso.com']['status'], 'pending')
+        # The page's own "none of them" button declines
+        self.assertEqual(self.client.post(self.url('t0', 'vote'), {'none': '1'}).status_code, 200)
+        self.meeting.refresh_from_db()
+        self.assertEqual(self.meeting.get_attendee_responses()['a@contoso.com']['status'], 'declined')
@@ -0,0 +1,58 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+from datetime import timedelta
+from unittest import mock
+from django.test import TestCase
+from django.utils import timezone
+from tutorial.graph_helper import GraphSharePointClient
+from tutorial.models import DeletedTaskNotification, SharePointClientConfig, TaskNotification
+from tutorial.workbook_runner import LeaseLost, WorkbookLease
+
+
+class WorkbookLeaseTests(TestCase):
+
+    def setUp(self):
+        self.config = SharePointClientConfig.objects.create(
+            drive_name='Docs', file_path='tasks.xlsx', is_active=True,
+            lease_owner='w1', lease_expires=timezone.now() + timedelta(seconds=60))
+
+    def client_for(self, lease):
+        # The workbook's Graph ids aren't needed to write notifications
+        with mock.patch.object(GraphSharePointClient, '__get_user_info__', return_value={}), \
+                mock.patch.object(GraphSharePointClient, '_get_site_id', return_value='site'), \
+                mock.patch.object(GraphSharePointClient, '_get_list_id', return_value='list'), \
+                mock.patch.object(GraphSharePointClient, '_get_drive_id', return_value='drive'):
+            client = GraphSharePointClient('token', config=self.config)
+        client.fence = lease
+        return client
+
+    def test_held_lease_is_renewed(self):
+        lease = WorkbookLease(self.config.pk, 'w1', ttl=60)
+        lease()
+        self.config.refresh_from_db()
+        self.assertGreater(self.config.lease_expires, timezone.now() + timedelta(seconds=59))
+        # Trusted for a third of the TTL
+        with self.assertNumQueries(0):
+            lease()
+
+    def test_stale_fence_rejects_writes(self):
+        TaskNotification.objects.create(
+            config=self.config, sheet_name='tasks', row=1, task='Task', owner_id='u1',
+            owner_email='owner@contoso.com', owner_name='Owner', teams_group_id='19:chat',
+            teams_group_name='Team', field_address='A1', reason='overdue')
+        lease = WorkbookLease(self.config.pk, 'w1', ttl=0)
+        client = self.client_for(lease)
+        lease()
+
+        # Another worker took the workbook over meanwhile
+        SharePointClientConfig.objects.filter(pk=self.config.pk).update(lease_owner='w2')
+        with self.assertRaises(LeaseLost):
+            client._delete_notifications(keep=())
+        self.assertEqual(TaskNotification.objects.count(), 1)
+        self.assertFalse(DeletedTaskNotification.objects.exists())
+
+    def test_deactivated_workbook_is_fenced_off(self):
+        SharePointClientConfig.objects.filter(pk=self.config.pk).update(is_active=False)
+        with self.assertRaises(LeaseLost):
+            WorkbookLease(self.config.pk, 'w1', ttl=60)()
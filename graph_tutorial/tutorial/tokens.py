@@ -0,0 +1,258 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+"""
+Access tokens for Graph calls made outside a request.
+
+A TokenProvider hands out the current access token without blocking: once
+the token is within TOKEN_REFRESH_MARGIN seconds of expiry a background
+thread fetches the next one while callers keep using the old one. Only a
+missing or expired token is refreshed inline.
+
+    AppTokenProvider        client credentials (app-only), key 'app'
+    DelegatedTokenProvider  a signed-in user's MSAL cache stored in the
+                            TokenCache table, key 'delegated:<cache key>'
+    StaticTokenProvider     a raw token that is used as it is
+
+Refreshed tokens are published in the Django cache so other workers pick
+them up instead of refreshing again, and the delegated MSAL cache (with its
+rotated refresh token) is written back to TokenCache. Jobs and spawned
+workers carry the provider key (see auth_payload) instead of a token; a
+static token has no key and is carried encrypted with SECRET_KEY.
+"""
+
+import base64
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import cache as shared_cache
+from django.db import connections
+from tutorial.models import TokenCache
+
+logger = logging.getLogger(__name__)
+
+APP_SCOPES = ['https://graph.microsoft.com/.default']
+
+class TokenUnavailable(Exception):
+    """No access token could be acquired (signed out, consent revoked, bad secret...)."""
+
+class TokenProvider:
+    # Identifies the provider across processes, None if it can't be rebuilt from a key
+    key = None
+
+    def __init__(self):
+        self._token = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+        # guards _refreshing only, so checking it never waits for a refresh in progress
+        self._flag_lock = threading.Lock()
+        self._refreshing = False
+
+    def _acquire(self, force):
+        """Fetch a token from the identity platform. Returns (access token, expires in seconds)."""
+        raise NotImplementedError
+
+    def token(self):
+        """The current access token; blocks only when there is no valid one."""
+        now = time.time()
+        if self._token is None or now >= self._expires_at - settings.TOKEN_EXPIRY_SKEW:
+            with self._lock:
+                if self._token is None or time.time() >= self._expires_at - settings.TOKEN_EXPIRY_SKEW:
+                    self._refresh(force=False)
+        elif now >= self._expires_at - settings.TOKEN_REFRESH_MARGIN:
+            self._refresh_in_background()
+        return self._token
+
+    def _shared_key(self):
+        return f'graph_token:{self.key}'
+
+    def _refresh(self, force):
+        if self.key:
+            # Another worker may have refreshed already
+            shared = shared_cache.get(self._shared_key())
+            if shared and shared['expires_at'] - settings.TOKEN_REFRESH_MARGIN > time.time():
+                self._token, self._expires_at = shared['token'], shared['expires_at']
+                return
+
+        token, expires_in = self._acquire(force)
+        self._token, self._expires_at = token, time.time() + expires_in
+        if self.key:
+            shared_cache.set(self._shared_key(), {'token': token, 'expires_at': self._expires_at},
+                             max(int(expires_in), 1))
+        logger.info("Access token for %s refreshed, valid for %ds", self.key or 'static token', expires_in)
+
+    def _refresh_in_background(self):
+        with self._flag_lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._background_refresh, name=f'token-refresh-{self.key}', daemon=True).start()
+
+    def _background_refresh(self):
+        # One worker refreshes, the others read its result from the shared cache
+        lock_key = f'{self._shared_key()}:refreshing'
+        locked = False
+        try:
+            locked = shared_cache.add(lock_key, 1, 60)
+            if locked:
+                with self._lock:
+                    self._refresh(force=True)
+        except Exception as e:
+            # The current token is still valid, token() retries on its next call
+            logger.warning("Background refresh of the %s token failed: %s", self.key, e)
+        finally:
+            if locked:
+                shared_cache.delete(lock_key)
+            self._refreshing = False
+            connections.close_all()
+
+class StaticTokenProvider(TokenProvider):
+    """A token handed in from outside (--token, tests); it is never refreshed."""
+    def __init__(self, token):
+        super().__init__()
+        self._token = token
+
+    def token(self):
+        return self._token
+
+class AppTokenProvider(TokenProvider):
+    """App-only token through the client credentials flow."""
+    key = 'app'
+
+    def _acquire(self, force):
+        from tutorial.auth_helper import get_msal_app, settings as oauth_settings
+        # Client credentials need a tenant, /common only works for delegated sign-in
+        app = get_msal_app(authority=oauth_settings.get('app_authority'))
+        result = app.acquire_token_for_client(scopes=APP_SCOPES)
+        if 'access_token' not in result:
+            raise TokenUnavailable(f"App-only token failed: {result.get('error_description') or result.get('error')}")
+        return result['access_token'], result['expires_in']
+
+class DelegatedTokenProvider(TokenProvider):
+    """Tokens of a signed-in user, refreshed from the MSAL cache stored under `cache_key`."""
+    def __init__(self, cache_key):
+        super().__init__()
+        self.cache_key = cache_key
+        self.key = f'delegated:{cache_key}'
+
+    def _acquire(self, force):
+        import msal
+        from tutorial.auth_helper import get_msal_app, store_token_cache, settings as oauth_settings
+        data = TokenCache.objects.filter(key=self.cache_key).values_list('data', flat=True).first()
+        if not data:
+            raise TokenUnavailable(f"No stored sign-in under {self.cache_key}")
+        cache = msal.SerializableTokenCache()
+        cache.deserialize(data)
+        app = get_msal_app(cache)
+        accounts = app.get_accounts()
+        result = accounts and app.acquire_token_silent(oauth_settings['scopes'], account=accounts[0],
+                                                        force_refresh=force)
+        if not result or 'access_token' not in result:
+            raise TokenUnavailable(f"Stored sign-in {self.cache_key} can no longer be refreshed")
+        # The web session may write the same row, both copies hold a usable refresh token
+        if cache.has_state_changed:
+            store_token_cache(self.cache_key, cache.serialize())
+        return result['access_token'], result['expires_in']
+
+# Providers of this process, so every caller shares one refresh schedule
+_providers = OrderedDict()
+_providers_lock = threading.Lock()
+MAX_PROVIDERS = 1024
+
+def get_provider(key):
+    """The provider for 'app' or 'delegated:<cache key>'."""
+    with _providers_lock:
+        provider = _providers.get(key)
+        if provider is None:
+            if key == 'app':
+                provider = AppTokenProvider()
+            elif key.startswith('delegated:'):
+                provider = DelegatedTokenProvider(key[len('delegated:'):])
+            else:
+                raise ValueError(f"Unknown token provider '{key}'")
+            _providers[key] = provider
+            if len(_providers) > MAX_PROVIDERS:
+                _providers.popitem(last=False)
+        else:
+            _providers.move_to_end(key)
+        return provider
+
+def forget_provider(key):
+    """Drop a provider and its published token, e.g. after the user signed out."""
+    with _providers_lock:
+        _providers.pop(key, None)
+    shared_cache.delete(f'graph_token:{key}')
+
+def as_provider(auth):
+    """Accept a TokenProvider or a raw access token."""
+    if isinstance(auth, TokenProvider):
+        return auth
+    return StaticTokenProvider(auth)
+
+# Payload keys holding a token rather than a provider key, dropped once a job is over
+TOKEN_PAYLOAD_KEYS = ('sealed_token', 'token')
+
+def _fernet():
+    # msal depends on cryptography, so it is always installed
+    from cryptography.fernet import Fernet
+    key = hashlib.sha256(f'tutorial.tokens:{settings.SECRET_KEY}'.encode()).digest()
+    return Fernet(base64.urlsafe_b64encode(key))
+
+def auth_payload(auth):
+    """
+    JSON-safe reference to `auth` for job payloads and worker processes:
+    the provider key, or a static token encrypted with SECRET_KEY so the
+    database never holds it in clear.
+    """
+    provider = as_provider(auth)
+    if provider.key:
+        return {'auth': provider.key}
+    token = provider.token()
+    if token is None:
+        # Nothing to protect (e.g. a poll without a session), the job fails on its own
+        return {'token': None}
+    return {'sealed_token': _fernet().encrypt(token.encode()).decode()}
+
+def payload_provider(payload):
+    """The provider an auth_payload() refers to."""
+    if payload.get('auth'):
+        return get_provider(payload['auth'])
+    if payload.get('sealed_token'):
+        from cryptography.fernet import InvalidToken
+        try:
+            return StaticTokenProvider(_fernet().decrypt(payload['sealed_token'].encode()).decode())
+        except InvalidToken:
+            raise TokenUnavailable("Sealed token can't be decrypted, was SECRET_KEY changed?")
+    # Jobs queued before tokens were sealed
+    return StaticTokenProvider(payload['token'])
+
+def find_token_cache(email):
+    """Key of the most recently updated stored sign-in of `email`, or None."""
+    for key, data in TokenCache.objects.order_by('-updated_at').values_list('key', 'data'):
+        try:
+            accounts = json.loads(data).get('Account', {}).values()
+        except ValueError:
+            continue
+        if any(account.get('username', '').lower() == email.lower() for account in accounts):
+            return key
+    return None
+
+def provider_for(token=None, user=None, app_only=False):
+    """
+    Provider for the management commands' --token / --user / --app-only
+    options. Raises ValueError when none or several are given.
+    """
+    if sum(map(bool, (token, user, app_only))) != 1:
+        raise ValueError('Give exactly one of --token, --user or --app-only')
+    if app_only:
+        return get_provider('app')
+    if user:
+        key = find_token_cache(user)
+        if key is None:
+            raise ValueError(f'{user} has no stored sign-in, sign in to the web app first')
+        return get_provider(f'delegated:{key}')
+    return StaticTokenProvider(token)
@@ -14,7 +14,14 @@ urlpatterns = [
   path('callback', views.callback, name='callback'),
   path('calendar/new', views.new_event, name='newevent'),
   path('auto-schedule-meeting', views.schedule_meeting, name='auto_schedule_meeting'),
+  path('api/meetings/bulk/', views.schedule_meetings, name='schedule_meetings'),
   path('webhook/response/', views.meeting_response, name='meeting_response'),
+  path('webhook/notifications/', views.chat_notifications, name='chat_notifications'),
   path('meeting-status/<uuid:meeting_uuid>/', views.meeting_status, name='meeting_status'),
   path('api/contactors/', views.get_contacts, name='get_contacts'),
+  path('api/notifications/', views.notifications_api, name='notifications_api'),
+  path('api/notifications/changes/', views.notification_changes, name='notification_changes'),
+  path('export/notifications.<str:fmt>', views.export_notifications, name='export_notifications'),
+  path('export/meetings.<str:fmt>', views.export_meetings, name='export_meetings'),
+  path('metrics', views.metrics, name='metrics'),
 ]
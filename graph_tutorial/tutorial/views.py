@@ -2,16 +2,40 @@
 # Licensed under the MIT License.
 from datetime import datetime, timedelta
 from django.shortcuts import render
-from django.http import HttpResponseRedirect, HttpResponseBadRequest, JsonResponse
+from django.http import (HttpResponse, HttpResponseRedirect, HttpResponseBadRequest, HttpResponseForbidden, JsonResponse,
+    StreamingHttpResponse, FileResponse, Http404)
+from django.conf import settings
 from django.urls import reverse
+from django.views.decorators.csrf import csrf_exempt
 from django.contrib import messages
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 from dateutil import tz, parser
 from tutorial.auth_helper import (get_sign_in_flow, get_token_from_code, store_user,
-    remove_user_and_token, get_token)
-from tutorial.graph_helper import get_user, get_iana_from_windows, get_calendar_events, create_event, get_meeting_times_slots, get_user_info, get_chat_ids, get_users, inform_attendees, GraphSharePointClient
+    remove_user_and_token, get_token, get_token_provider)
+from tutorial.graph.core import get_user, get_users, get_users_by_email
+from tutorial.graph.calendar import create_event
+from tutorial.graph.teams import get_chat_ids
+from tutorial.graph.sharepoint import GraphSharePointClient
+from tutorial.graph.timezones import get_iana_from_windows
+from tutorial.graph.resilience import with_deadline
+from tutorial.calendar_cache import get_cached_calendar_events
+from tutorial.subscriptions import accept_notifications
+from tutorial.scheduling import (plan_meeting, settle_meeting, parse_meeting_spec, parse_vote_slots,
+    schedule_meetings_bulk, PlanningFailed, UnknownAttendees)
+from tutorial import metrics as graph_metrics
+from tutorial import exports
+from tutorial import dashboard
+from tutorial import meeting_status as meeting_status_cache
+from tutorial.tasks import enqueue_inform_attendees, enqueue_create_event
 from .models import AutoScheduleMeeting
+import json
 import uuid
-import pandas as pd
+
+def _job_auth(request, token):
+    # Queued jobs get the session's token provider, so they outlive the current token
+    return get_token_provider(request) or token
+
 def initialize_context(request):
     context = {}
 
@@ -39,6 +63,7 @@ def sign_in(request):
     # Redirect to the Azure sign-in page
     return HttpResponseRedirect(flow['auth_uri'])
 
+@with_deadline('GRAPH_VIEW_DEADLINE')
 def callback(request):
     # Make the token request
     result = get_token_from_code(request)
@@ -56,6 +81,7 @@ def sign_out(request):
 
     return HttpResponseRedirect(reverse('home'))
 
+@with_deadline('GRAPH_VIEW_DEADLINE')
 def calendar(request):
     context = initialize_context(request)
     user = context['user']
@@ -86,23 +112,21 @@ def calendar(request):
 
     token = get_token(request)
 
-    events = get_calendar_events(
+    # Served from the per-user window cache, datetimes are already parsed
+    events = get_cached_calendar_events(
         token,
+        user['email'],
         start.isoformat(timespec='seconds'),
         end.isoformat(timespec='seconds'),
-        user['timeZone'])
+        user['timeZone'],
+        force_refresh=bool(request.GET.get('refresh')))
 
     if events:
-        # Convert the ISO 8601 date times to a datetime object
-        # This allows the Django template to format the value nicely
-        for event in events['value']:
-            event['start']['dateTime'] = parser.parse(event['start']['dateTime'])
-            event['end']['dateTime'] = parser.parse(event['end']['dateTime'])
-
-        context['events'] = events['value']
+        context['events'] = events
 
     return render(request, 'tutorial/calendar.html', context)
 
+@with_deadline('GRAPH_VIEW_DEADLINE')
 def new_event(request):
     context = initialize_context(request)
     user = context['user']
@@ -139,12 +163,15 @@ def new_event(request):
           request.POST['ev-body'],
           user['timeZone'])
 
-        # Redirect back to calendar view
-        return HttpResponseRedirect(reverse('calendar'))
+        # Redirect back to calendar view, skipping the cache TTL so the
+        # new event shows up right away
+        return HttpResponseRedirect(f"{reverse('calendar')}?refresh=1")
     else:
         # Render the form
         return render(request, 'tutorial/newevent.html', context)
 
+@with_deadline('GRAPH_VIEW_DEADLINE')
+@graph_metrics.span('schedule_meeting')
 def schedule_meeting(request):
     context = initialize_context(request)
     user = context['user']
@@ -169,7 +196,12 @@ def schedule_meeting(request):
         # 獲取與會者信息
         attendees = request.POST.getlist('attendees')
         token = get_token(request)
-        user_ids = [get_user_info(token, email)['id'] for email in attendees]
+        users = get_users_by_email(token, attendees)
+        unknown = [email for email in attendees if email not in users]
+        if unknown:
+            messages.error(request, f"Unknown attendees: {', '.join(unknown)}")
+            return render(request, 'tutorial/auto_schedule_meeting.html', context)
+        user_ids = [users[email]['id'] for email in attendees]
         chat_ids = get_chat_ids(token, user_ids)
         
         # 創建新的排程記錄
@@ -179,7 +211,8 @@ def schedule_meeting(request):
             duration=int(request.POST.get('duration')),
             start_time=start_time,
             end_time=end_time,
-            status='pending'
+            status='pending',
+            vote_slots=parse_vote_slots(request.POST.get('vote_slots'))
         )
         
         # 設置與會者
@@ -187,9 +220,9 @@ def schedule_meeting(request):
         meeting.host_email = get_user(token)['mail']
         meeting.time_zone = time_zone
 
-        # 嘗試獲取候選時間
+        # 嘗試獲取候選時間 (free/busy is fetched once and ranked locally)
         try:
-            time_slots = get_meeting_times_slots(token, meeting, time_zone)
+            time_slots = plan_meeting(token, meeting)
         except Exception as e:
             messages.error(request, "cannot find available time for meeting for all attendees")
             return render(request, 'tutorial/auto_schedule_meeting.html', context)
@@ -203,13 +236,59 @@ def schedule_meeting(request):
         meeting.status = 'waiting'
         meeting.save()
 
-        inform_attendees(token, meeting)
+        enqueue_inform_attendees(_job_auth(request, token), meeting)
         context['meeting'] = meeting
         return render(request, 'tutorial/auto_schedule_meeting_progress.html', context)
 
     return render(request, 'tutorial/auto_schedule_meeting.html', context)
 
 
+@with_deadline('GRAPH_BULK_DEADLINE')
+@graph_metrics.span('schedule_meetings')
+def schedule_meetings(request):
+    """
+    Bulk version of schedule_meeting.
+    POST a JSON body {"meetings": [{title, description, duration, start_time, end_time, attendees}, ...]};
+    an optional vote_slots offers that many candidates at once.
+    """
+    context = initialize_context(request)
+    user = context['user']
+    if not user['is_authenticated']:
+        return JsonResponse({'error': 'Not signed in'}, status=401)
+    if request.method != 'POST':
+        return JsonResponse({'error': 'POST required'}, status=405)
+
+    time_zone = get_iana_from_windows(user['timeZone'])
+    try:
+        raw_specs = json.loads(request.body)['meetings']
+        specs = [parse_meeting_spec(raw, time_zone) for raw in raw_specs]
+    except (ValueError, KeyError, TypeError) as e:
+        return JsonResponse({'error': f'Invalid meetings payload: {e}'}, status=400)
+    if not specs:
+        return JsonResponse({'error': 'No meetings given'}, status=400)
+
+    token = get_token(request)
+    try:
+        meetings = schedule_meetings_bulk(token, specs, user['email'], time_zone)
+    except UnknownAttendees as e:
+        return JsonResponse({'error': 'Unknown attendees', 'attendees': e.emails}, status=400)
+    except PlanningFailed as e:
+        return JsonResponse({'error': str(e)}, status=502)
+    for meeting in meetings:
+        if meeting.status == 'waiting':
+            enqueue_inform_attendees(_job_auth(request, token), meeting)
+
+    return JsonResponse({
+        'meetings': [
+            {
+                'uuid': str(meeting.uuid),
+                'title': meeting.title,
+                'status': meeting.status,
+                'candidate_time': meeting.get_candidate_time(),
+            } for meeting in meetings
+        ]
+    })
+
 # 用來處理會議回應的 webhook
 def meeting_response(request):
     tenant_id = request.GET.get('tenantId')
@@ -237,119 +316,89 @@ def meeting_response(request):
     if not matched_email:
         return HttpResponseBadRequest("Attendee not found for tenant")
 
-    # 更新回應
-    meeting.update_attendee_response(matched_email, status=response_status)
-    meeting.save()
+    # 更新回應（投票模式：在投票頁勾選所有可以的時間）
+    if meeting.vote_slots and response_status == 'vote':
+        if request.method != 'POST':
+            return render(request, 'tutorial/vote_slots.html', {
+                'email': matched_email,
+                'meeting': meeting,
+                'slots': meeting.get_offered_times()
+            })
+        try:
+            slots = [int(slot) for slot in request.POST.getlist('slot')]
+        except ValueError:
+            return HttpResponseBadRequest("Invalid slot")
+        # An empty form is a mistake, "none of them" has its own button
+        if not slots and not request.POST.get('none'):
+            return HttpResponseBadRequest("Pick at least one time")
+        if not meeting.vote(matched_email, slots):
+            return HttpResponseBadRequest("These times are no longer offered, please use the latest card")
+        response_status = 'accepted' if slots else 'declined'
+    elif meeting.vote_slots:
+        # Only the card's "none of them" button answers without the vote page
+        if response_status != 'declined':
+            return HttpResponseBadRequest("Invalid response for a vote, please use the latest card")
+        meeting.vote(matched_email, [])
+    else:
+        meeting.update_attendee_response(matched_email, status=response_status)
     return render(request, 'tutorial/auto_close.html', {
         'email': matched_email,
         'response': response_status
     })
 
 
+# Graph change notifications for tracked chats
+@csrf_exempt
+def chat_notifications(request):
+    # Subscription validation: echo the token back as plain text
+    validation_token = request.GET.get('validationToken')
+    if validation_token is not None:
+        return HttpResponse(validation_token, content_type='text/plain')
+
+    if request.method != 'POST':
+        return HttpResponseBadRequest("POST required")
+    try:
+        accept_notifications(request.body)
+    except ValueError:
+        return HttpResponseBadRequest("Invalid notification payload")
+    # Graph expects an answer within a few seconds, the inbox is drained by the worker
+    return HttpResponse(status=202)
+
+
+def _status_response(request, entry):
+    response = get_conditional_response(request, etag=entry['etag'])
+    if response is None:
+        response = JsonResponse(entry['payload'])
+    response.headers['ETag'] = entry['etag']
+    # Let browsers keep the payload but always revalidate it
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+@with_deadline('GRAPH_VIEW_DEADLINE')
 def meeting_status(request, meeting_uuid):
+    # Meetings unchanged since their payload was cached (and settled) are
+    # answered from the cache, see tutorial.meeting_status
+    entry = meeting_status_cache.cached_status(meeting_uuid)
+    if entry:
+        return _status_response(request, entry)
     try:
         meeting = AutoScheduleMeeting.objects.get(uuid=meeting_uuid)
-        token = get_token(request)
-        # 更新會議狀態邏輯
-        if meeting.status == 'waiting':
-            response_summary = meeting.get_response_summary()
-
-            # 如果有與會者拒絕，嘗試下一個候選時間
-            if response_summary['declined'] > 0:
-                try:
-                    # declined_attendees = [email for email, response in meeting.get_attendee_responses().items() if response['status'] == 'declined']
-                    # declined_list = ', '.join(declined_attendees)
-                    # declined_html = ''.join(f"<li>{email}</li>" for email in declined_list)
-                    # msg = (
-                    #     f"<p><strong>⚠️ A participant has <span style='color:red;'>declined</span> the meeting.</strong></p>"
-                    #     f"<p><strong>Declined by:</strong></p>"
-                    #     f"<ul>{declined_html}</ul>"
-                    #     f"<p><strong>Meeting UUID:</strong> <code>{meeting.uuid}</code></p>"
-                    #     f"<p><strong>Declined meeting time:</strong><br>"
-                    #     f"<span style='color:#0078D4;'>{meeting.get_candidate_time()['start']} - {meeting.get_candidate_time()['end']}</span></p>"
-                    # )
-                    # 更新下一段時間並初始化與會者狀態
-                    meeting.try_next()
-                    # inform_attendees(token, meeting, msg)
-                    # 通知與會者
-                    inform_attendees(token, meeting)
-                except ValueError:
-                    # 沒有更多候選時間，標記為失敗
-                    meeting.status = 'failed'
-                meeting.save()
-
-            # 如果所有人都接受，更新狀態為 'done' 並設置選定時間
-            elif response_summary['pending'] == 0 and response_summary['declined'] == 0:
-                meeting.status = 'done'
-                meeting.selected_time = meeting.get_candidate_time()
-                meeting.save()
-                # 寄出會議邀請
-                attendees_emails = [email for email in meeting.get_attendee_responses().keys()]
-                attendees_emails.append(meeting.host_email)
-                res = create_event(
-                    token,
-                    meeting.title,
-                    meeting.selected_time["start"],
-                    meeting.selected_time["end"],
-                    attendees_emails,
-                    meeting.description,
-                    meeting.time_zone
-                )
-
-        # 準備與會者數據
-        attendees = []
-        for email, response in meeting.get_attendee_responses().items():
-            status_class = {
-                'pending': 'warning',
-                'accepted': 'success',
-                'declined': 'danger',
-                'tentative': 'info'
-            }.get(response['status'], 'secondary')
-            
-            status_text = {
-                'pending': 'Waiting for response',
-                'accepted': 'Accepted',
-                'declined': 'Declined',
-                'tentative': 'Tentative'
-            }.get(response['status'], '未知')
-            
-            attendees.append({
-                'email': email,
-                'status': response['status'],
-                'status_class': status_class,
-                'status_text': status_text,
-                'response_time': response.get('response_time')
-            })
-        
-        # 準備狀態消息
-        status_messages = {
-            'pending': 'Initializng...',
-            'waiting': 'Waiting...',
-            'done': 'Meeting scheduled successfully!',
-            'failed': 'Meeting scheduling failed'
-        }
-        
-        status_classes = {
-            'pending': 'info',
-            'waiting': 'warning',
-            'done': 'success',
-            'failed': 'danger'
-        }
-        
-        response_data = {
-            'status': meeting.status,
-            'status_message': status_messages.get(meeting.status, 'unkown status'),
-            'status_class': status_classes.get(meeting.status, 'secondary'),
-            'attendees': attendees,
-            'selected_time': meeting.selected_time if meeting.selected_time else None
-        }
-        
-        return JsonResponse(response_data)
+        # 更新會議狀態邏輯（拒絕 -> 下一個候選時間，全部接受 -> done）
+        outcome = settle_meeting(meeting)
+        if outcome == 'advanced':
+            # 通知與會者
+            enqueue_inform_attendees(_job_auth(request, get_token(request)), meeting)
+        elif outcome == 'done':
+            # 寄出會議邀請
+            enqueue_create_event(_job_auth(request, get_token(request)), meeting)
+
+        return _status_response(request, meeting_status_cache.store_status(meeting))
     except AutoScheduleMeeting.DoesNotExist:
         return JsonResponse({'error': 'Meeting not found'}, status=404)
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
+@with_deadline('GRAPH_VIEW_DEADLINE')
 def get_contacts(request):
     context = initialize_context(request)
     user = context['user']
@@ -366,6 +415,88 @@ def get_contacts(request):
     contacts = get_users(token, query=query)
     return JsonResponse(contacts, safe=False)
 
+def _export_response(fmt, name, columns, queryset):
+    if fmt == 'csv':
+        response = StreamingHttpResponse(exports.stream_csv(columns, exports.rows(queryset, columns)),
+                                         content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="{name}.csv"'
+        return response
+    if fmt == 'xlsx':
+        # XLSX is built on disk before the first byte goes out, keep it bounded
+        if exports.xlsx_too_large(queryset):
+            return HttpResponse(f'More than {settings.EXPORT_XLSX_MAX_ROWS} rows, use the CSV export instead',
+                                status=413, content_type='text/plain; charset=utf-8')
+        return FileResponse(exports.write_xlsx(columns, exports.rows(queryset, columns), sheet_title=name),
+                            as_attachment=True,
+                            filename=f'{name}.xlsx',
+                            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+    raise Http404(f'Unsupported export format: {fmt}')
+
+def export_notifications(request, fmt):
+    """TaskNotification rows as CSV or XLSX, optionally only those of ?config=<id>."""
+    context = initialize_context(request)
+    if not context['user']['is_authenticated']:
+        return HttpResponseRedirect(reverse('signin'))
+    config_id = request.GET.get('config')
+    if config_id is not None and not config_id.isdigit():
+        return HttpResponseBadRequest('config must be a SharePointClientConfig id')
+    queryset = exports.notifications(int(config_id) if config_id else None)
+    return _export_response(fmt, 'notifications', exports.NOTIFICATION_COLUMNS, queryset)
+
+def export_meetings(request, fmt):
+    """The signed-in user's meeting history as CSV or XLSX."""
+    context = initialize_context(request)
+    user = context['user']
+    if not user['is_authenticated']:
+        return HttpResponseRedirect(reverse('signin'))
+    queryset = exports.meetings(user['email'])
+    return _export_response(fmt, 'meetings', exports.MEETING_COLUMNS, queryset)
+
+def notifications_api(request):
+    """
+    Tracked TaskNotifications as JSON, filtered by ?config, sheet, owner,
+    replied and reason. Page with ?after=<next of the previous page>&limit=N;
+    unchanged pages answer If-None-Match / If-Modified-Since with 304.
+    """
+    context = initialize_context(request)
+    if not context['user']['is_authenticated']:
+        return JsonResponse({'error': 'Not signed in'}, status=401)
+    try:
+        queryset = dashboard.filter_notifications(request.GET)
+        after = int(request.GET.get('after', 0))
+        limit = dashboard.page_size(request.GET)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    page = dashboard.list_page(queryset, after, limit)
+    response = get_conditional_response(request, etag=page['etag'], last_modified=page['last_modified'])
+    if response is None:
+        response = JsonResponse(dashboard.page_payload(page))
+    response.headers['ETag'] = page['etag']
+    if page['last_modified'] is not None:
+        response.headers['Last-Modified'] = http_date(page['last_modified'])
+    # Let browsers keep the page but always revalidate it
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def notification_changes(request):
+    """Change feed: notifications changed or removed since ?cursor (optionally per ?config)."""
+    context = initialize_context(request)
+    if not context['user']['is_authenticated']:
+        return JsonResponse({'error': 'Not signed in'}, status=401)
+    try:
+        feed = dashboard.change_feed(config=request.GET.get('config'), cursor=request.GET.get('cursor'),
+                                     limit=dashboard.page_size(request.GET))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse(feed)
+
+def metrics(request):
+    """Graph call and operation metrics of this process, in Prometheus text format."""
+    if settings.METRICS_TOKEN and request.headers.get('Authorization') != f'Bearer {settings.METRICS_TOKEN}':
+        return HttpResponseForbidden()
+    return HttpResponse(graph_metrics.render_metrics(), content_type='text/plain; version=0.0.4')
+
 #我想要以下設計 我是用django
 #     """
 #     handles SharePoint-based reminders using GraphSharePointClient(# 一份excel 實例一個).
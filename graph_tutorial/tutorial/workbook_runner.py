@@ -0,0 +1,218 @@
+# Copyright (c) Microsoft Corporation.
+# Licensed under the MIT License.
+
+import logging
+import math
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from tutorial.graph.sharepoint import GraphSharePointClient
+from tutorial.models import SharePointClientConfig, SharePointWorker
+from tutorial.subscriptions import SubscriptionManager, drain_inbox
+
+logger = logging.getLogger(__name__)
+
+# How often subscriptions are checked for renewal, in seconds
+SUBSCRIPTION_SYNC_INTERVAL = 300
+
+class LeaseLost(Exception):
+    """This worker no longer holds the lease on the workbook it is writing for."""
+
+class WorkbookLease:
+    """
+    Fencing check for one leased workbook, called before every notification
+    write, deletion and job enqueue of its client.
+
+    Heartbeats only run between workbooks, so a long scan or poll could
+    outlive the lease while another worker takes the workbook over. The
+    check renews the lease with a conditional UPDATE on lease_owner and
+    raises LeaseLost when it matches nothing. A successful renewal is
+    trusted for a third of the TTL, so writes in between cost no query.
+    """
+
+    def __init__(self, config_pk, worker_id, ttl):
+        self.config_pk = config_pk
+        self.worker_id = worker_id
+        self.ttl = ttl
+        self.valid_until = None
+
+    def __call__(self):
+        now = timezone.now()
+        if self.valid_until is not None and now < self.valid_until:
+            return
+        renewed = SharePointClientConfig.objects.filter(
+            pk=self.config_pk, lease_owner=self.worker_id, is_active=True).update(
+            lease_expires=now + timedelta(seconds=self.ttl))
+        if not renewed:
+            self.valid_until = None
+            raise LeaseLost(f"Lease on workbook {self.config_pk} lost by {self.worker_id}")
+        self.valid_until = now + timedelta(seconds=self.ttl / 3)
+
+class WorkbookRunner:
+    """
+    Drives one SharePointClientConfig: scan_routine every routine_interval
+    seconds and reply tracking in between.
+
+    With GRAPH_NOTIFICATION_URL set, replies arrive through change
+    notifications and polling_task_pool only runs as a reconciliation pass
+    every max(polling_interval, WEBHOOK_RECONCILE_INTERVAL) seconds.
+    """
+
+    def __init__(self, config, auth, sheet_name="automation_test", lease=None):
+        self.config = config
+        self.sheet_name = sheet_name
+        self.client = GraphSharePointClient(auth, path=config.file_path, drive_name=config.drive_name,
+                                            config=config)
+        # WorkbookLease checked before every write, None when run without leases
+        self.client.fence = lease
+        notification_url = settings.GRAPH_NOTIFICATION_URL
+        self.subscriptions = SubscriptionManager(self.client, notification_url) if notification_url else None
+        self.next_scan = 0
+        self.next_poll = 0
+        self.next_sync = 0
+
+    @property
+    def poll_interval(self):
+        if self.subscriptions:
+            return max(self.config.polling_interval, settings.WEBHOOK_RECONCILE_INTERVAL)
+        return self.config.polling_interval
+
+    def tracked_chats(self):
+        return set(self.client.notifications().filter(replied=False)
+                   .values_list('teams_group_id', flat=True).distinct())
+
+    def _run(self, name, func, *args):
+        try:
+            return func(*args)
+        except LeaseLost:
+            raise
+        except Exception as e:
+            logger.exception("%s failed for %s/%s: %s", name, self.config.drive_name, self.config.file_path, e)
+
+    def tick(self, now=None):
+        now = time.time() if now is None else now
+
+        if now >= self.next_scan:
+            self._run('scan_routine', self.client.scan_routine, self.sheet_name)
+            self.next_scan = now + self.config.routine_interval
+            # New notifications may live in chats without a subscription yet
+            self.next_sync = 0
+
+        if self.subscriptions:
+            if now >= self.next_sync:
+                self._run('subscription sync', self.subscriptions.sync, self.tracked_chats())
+                self.next_sync = now + SUBSCRIPTION_SYNC_INTERVAL
+            self._run('drain_inbox', drain_inbox, self.client, self.tracked_chats())
+
+        if now >= self.next_poll:
+            self._run('polling_task_pool', self.client.polling_task_pool)
+            self.next_poll = now + self.poll_interval
+
+
+class WorkbookPool:
+    """
+    The workbooks one run_sharepoint_clients worker drives.
+
+    Workbooks are handed out through leases on SharePointClientConfig rows:
+    a worker only runs the configs it holds a lease on, renews them with
+    every heartbeat and picks up unleased or expired ones up to its fair
+    share, ceil(active configs / live workers). A worker holding more than
+    its share gives one back per tick, so newly started workers fill up.
+    Within a tick every write is fenced by the workbook's WorkbookLease.
+    """
+
+    def __init__(self, auth, worker_id, sheet_name="automation_test"):
+        # A tutorial.tokens.TokenProvider, shared by the workbooks' clients
+        self.auth = auth
+        self.worker_id = worker_id
+        self.sheet_name = sheet_name
+        self.ttl = settings.WORKBOOK_LEASE_TTL
+        self.runners = {}
+        self.next_heartbeat = 0
+
+    def _lease_expired(self, now):
+        return Q(lease_owner='') | Q(lease_expires__lt=now) | Q(lease_expires__isnull=True)
+
+    def heartbeat(self, now):
+        expires = now + timedelta(seconds=self.ttl)
+        SharePointWorker.objects.update_or_create(worker_id=self.worker_id, defaults={'heartbeat_at': now})
+        SharePointClientConfig.objects.filter(lease_owner=self.worker_id).update(lease_expires=expires)
+        SharePointWorker.objects.filter(heartbeat_at__lt=now - timedelta(seconds=self.ttl)).delete()
+
+    def fair_share(self, now):
+        active = SharePointClientConfig.objects.filter(is_active=True).count()
+        workers = SharePointWorker.objects.filter(heartbeat_at__gte=now - timedelta(seconds=self.ttl)).count()
+        return math.ceil(active / max(workers, 1))
+
+    def acquire(self, now, count):
+        expires = now + timedelta(seconds=self.ttl)
+        free = (SharePointClientConfig.objects
+                .filter(self._lease_expired(now), is_active=True)
+                .order_by('lease_expires', 'pk')
+                .values_list('pk', flat=True)[:count])
+        for pk in free:
+            # Conditional UPDATE: only one worker wins a contested workbook
+            SharePointClientConfig.objects.filter(self._lease_expired(now), pk=pk).update(
+                lease_owner=self.worker_id, lease_expires=expires)
+
+    def release(self, pks=None):
+        leases = SharePointClientConfig.objects.filter(lease_owner=self.worker_id)
+        if pks is not None:
+            leases = leases.filter(pk__in=pks)
+        leases.update(lease_owner='', lease_expires=None)
+
+    def shutdown(self):
+        self.release()
+        SharePointWorker.objects.filter(worker_id=self.worker_id).delete()
+        self.runners.clear()
+
+    def rebalance(self, now):
+        held = list(SharePointClientConfig.objects
+                    .filter(lease_owner=self.worker_id, is_active=True)
+                    .order_by('pk').values_list('pk', flat=True))
+        share = self.fair_share(now)
+        if len(held) < share:
+            self.acquire(now, share - len(held))
+        elif len(held) > share:
+            self.release([held[-1]])
+        # Leases on deactivated workbooks are dropped
+        SharePointClientConfig.objects.filter(lease_owner=self.worker_id, is_active=False).update(
+            lease_owner='', lease_expires=None)
+
+    def tick(self, now=None):
+        wall = time.time() if now is None else now
+        now = timezone.now()
+        if wall >= self.next_heartbeat:
+            self.heartbeat(now)
+            self.rebalance(now)
+            self.next_heartbeat = wall + self.ttl / 3
+
+        # Leases lost to another worker (e.g. after a long stall) are checked every tick
+        configs = {config.pk: config for config in
+                   SharePointClientConfig.objects.filter(lease_owner=self.worker_id, is_active=True)}
+        for pk in set(self.runners) - set(configs):
+            del self.runners[pk]
+        for pk, config in configs.items():
+            if pk not in self.runners:
+                try:
+                    lease = WorkbookLease(pk, self.worker_id, self.ttl)
+                    self.runners[pk] = WorkbookRunner(config, self.auth, self.sheet_name, lease=lease)
+                except Exception as e:
+                    logger.exception("Cannot open %s/%s: %s", config.drive_name, config.file_path, e)
+                    # Let another worker (or a later tick) try it
+                    self.release([pk])
+                    continue
+            self.runners[pk].config = config
+            try:
+                self.runners[pk].tick(wall)
+            except LeaseLost as e:
+                # Another worker owns it now, stop before writing anything else
+                logger.warning("%s, dropping %s/%s", e, config.drive_name, config.file_path)
+                del self.runners[pk]
+                continue
+            # A long scan must not let the other leases lapse
+            if time.time() >= self.next_heartbeat:
+                self.heartbeat(timezone.now())
+                self.next_heartbeat = time.time() + self.ttl / 3